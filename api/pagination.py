@@ -0,0 +1,73 @@
+import base64
+import binascii
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+
+
+class KeysetPagination(BasePagination):
+    cursor_query_param = "cursor"
+    limit_query_param = "limit"
+    ordering_field = "id"
+    default_limit = 100
+    max_limit = 1000
+    invalid_cursor_message = "Invalid cursor"
+
+    def get_limit(self, request):
+        try:
+            limit = int(request.query_params.get(self.limit_query_param, self.default_limit))
+        except (TypeError, ValueError):
+            return self.default_limit
+
+        return max(1, min(limit, self.max_limit))
+
+    def encode_cursor(self, value):
+        return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip("=")
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+
+        if not encoded:
+            return None
+
+        try:
+            padding = "=" * (-len(encoded) % 4)
+            return int(base64.urlsafe_b64decode(encoded + padding).decode())
+        except (binascii.Error, UnicodeDecodeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.limit = self.get_limit(request)
+        after = self.decode_cursor(request)
+
+        # Seek past the last key of the previous page instead of OFFSET, so every
+        # page costs one index range scan no matter how deep the client is.
+        if after is not None:
+            queryset = queryset.filter(**{f"{self.ordering_field}__gt": after})
+
+        page = list(queryset.order_by(self.ordering_field)[: self.limit + 1])
+        has_next = len(page) > self.limit
+        page = page[: self.limit]
+
+        self.next_cursor = (
+            self.encode_cursor(getattr(page[-1], self.ordering_field))
+            if has_next
+            else None
+        )
+        return page
+
+    def get_next_cursor(self):
+        return self.next_cursor
+
+    def get_paginated_response(self, data):
+        return Response({"next": self.get_next_cursor(), "results": data})
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True},
+                "results": schema,
+            },
+        }
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class AuthentificConfig(AppConfig):
+    name = "apps.authentific"
+
+    def ready(self):
+        from .revocation import token_revocations
+
+        token_revocations.check_backend()
@@ -0,0 +1,106 @@
+import threading
+import time
+from collections import OrderedDict
+import jwt
+from django.conf import settings
+from rest_framework.authentication import BaseAuthentication
+from rest_framework.exceptions import AuthenticationFailed
+from apps.users.models import User
+from apps.users.user_cache import user_cache
+from .revocation import token_revocations
+
+
+class VerifiedTokenCache:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+
+    @property
+    def max_size(self):
+        return getattr(settings, "AUTH_TOKEN_CACHE_SIZE", 10000)
+
+
+    @property
+    def ttl(self):
+        return getattr(settings, "AUTH_TOKEN_CACHE_TTL", 300)
+
+
+    def verify(self, token):
+        now = time.time()
+
+        with self._lock:
+            entry = self._entries.get(token)
+
+            if entry is not None:
+                expires_at, payload = entry
+
+                if now < expires_at:
+                    self._entries.move_to_end(token)
+                    return payload
+
+                del self._entries[token]
+
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms = ["HS256"])
+
+        # Never trust a cached payload past the token's own expiry.
+        expires_at = min(now + self.ttl, payload.get("exp", now + self.ttl))
+
+        with self._lock:
+            self._entries[token] = (expires_at, payload)
+            self._entries.move_to_end(token)
+
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last = False)
+
+        return payload
+
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+verified_tokens = VerifiedTokenCache()
+
+
+class JWTAuthentication(BaseAuthentication):
+
+    def authenticate(self, request):
+        auth_header = request.headers.get("Authorization")
+
+        if not auth_header:
+            return None
+
+        try:
+            token = auth_header.split(" ")[1]
+            payload = verified_tokens.verify(token)
+        except (IndexError, jwt.InvalidTokenError):
+            raise AuthenticationFailed("Invalid or expired token")
+
+        if getattr(settings, "AUTH_ROLE_SOURCE", "database") == "claims":
+            user = self.user_from_claims(payload)
+        else:
+            user = user_cache.get(payload.get("id"))
+
+        if user is None:
+            raise AuthenticationFailed("Invalid or expired token")
+
+        return user, payload
+
+
+    @staticmethod
+    def user_from_claims(payload):
+        # Signed claims stand in for the users row; promotions, bans and
+        # inquisitor rotation revoke the tokens that carry stale ones.
+        if token_revocations.is_revoked(payload):
+            return None
+
+        return User(
+            id = payload.get("id"),
+            username = payload.get("username"),
+            email = payload.get("email"),
+            role = payload.get("role"),
+            is_inquisitor = payload.get("inquisitor", False)
+        )
@@ -1,10 +1,219 @@
+import threading
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import get_context
 import bcrypt
+from django.conf import settings
+
+
+OPERATIONS = ("hash", "check")
+LATENCY_SAMPLES = 1000
+
+
+class PasswordHasherBusy(Exception):
+
+    def __init__(self, retry_after = 1):
+        super().__init__("Password hashing is at capacity")
+        self.retry_after = retry_after
+
+
+# Workers run in child processes, so they must stay importable without Django.
+def _hash(plain_password, rounds):
+    started = time.perf_counter()
+    hashed = bcrypt.hashpw(plain_password.encode('utf-8'), bcrypt.gensalt(rounds))
+    return hashed.decode('utf-8'), time.perf_counter() - started
+
+
+def _check(plain_password, hashed_password):
+    started = time.perf_counter()
+    matches = bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return matches, time.perf_counter() - started
+
+
+class PasswordHasher:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pool = None
+        self._pending = 0
+        self._metrics = {operation: self._empty_metrics() for operation in OPERATIONS}
+
+
+    @property
+    def workers(self):
+        return getattr(settings, "PASSWORD_HASH_WORKERS", 2)
+
+
+    @property
+    def max_pending(self):
+        return getattr(settings, "PASSWORD_HASH_MAX_PENDING", 32)
+
+
+    @property
+    def timeout(self):
+        return getattr(settings, "PASSWORD_HASH_TIMEOUT", 10)
+
+
+    @property
+    def rounds(self):
+        return getattr(settings, "BCRYPT_ROUNDS", 12)
+
+
+    @staticmethod
+    def _empty_metrics():
+        return {"count": 0, "rejected": 0, "errors": 0, "samples": deque(maxlen = LATENCY_SAMPLES)}
+
+
+    def _get_pool(self):
+        with self._lock:
+            if self._pool is None:
+                # Spawned children do not inherit the request threads and locks
+                # of a forked server process.
+                self._pool = ProcessPoolExecutor(max_workers = self.workers, mp_context = get_context("spawn"))
+
+            return self._pool
+
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+        pool.shutdown(wait = False, cancel_futures = True)
+
+
+    def _acquire(self, operation):
+        with self._lock:
+            if self._pending >= self.max_pending:
+                self._metrics[operation]["rejected"] += 1
+                raise PasswordHasherBusy()
+
+            self._pending += 1
+
+
+    def _done(self, future = None):
+        with self._lock:
+            self._pending -= 1
+
+
+    def _record(self, operation, total = None, work = None, failed = False):
+        with self._lock:
+            metrics = self._metrics[operation]
+
+            if failed:
+                metrics["errors"] += 1
+            else:
+                metrics["count"] += 1
+                metrics["samples"].append((total, work))
+
+
+    def _call(self, function, args):
+        if not self.workers:
+            try:
+                return function(*args)
+            finally:
+                self._done()
+
+        pool = self._get_pool()
+
+        try:
+            future = pool.submit(function, *args)
+        except Exception as e:
+            # Nothing was queued, so the slot is given back right away.
+            self._done()
+
+            if isinstance(e, BrokenProcessPool):
+                self._reset_pool(pool)
+            raise
+
+        # A timed out job keeps its slot until a worker has actually finished it.
+        future.add_done_callback(self._done)
+
+        try:
+            return future.result(timeout = self.timeout)
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            raise
+
+
+    def _run(self, operation, function, *args):
+        self._acquire(operation)
+        started = time.perf_counter()
+
+        try:
+            result, work = self._call(function, args)
+
+        except TimeoutError:
+            self._record(operation, failed = True)
+            raise PasswordHasherBusy(retry_after = self.timeout)
+
+        except Exception:
+            self._record(operation, failed = True)
+            raise
+
+        self._record(operation, time.perf_counter() - started, work)
+
+        return result
+
+
+    def hash(self, plain_password):
+        return self._run("hash", _hash, plain_password, self.rounds)
+
+
+    def check(self, plain_password, hashed_password):
+        return self._run("check", _check, plain_password, hashed_password)
+
+
+    @staticmethod
+    def _percentile(values, percent):
+        if not values:
+            return None
+
+        values = sorted(values)
+        return round(values[min(len(values) - 1, int(len(values) * percent))] * 1000, 2)
+
+
+    def metrics(self):
+        with self._lock:
+            snapshot = {
+                operation: (dict(metrics), list(metrics["samples"]))
+                for operation, metrics in self._metrics.items()
+            }
+            pending = self._pending
+
+        report = {"workers": self.workers, "max_pending": self.max_pending, "pending": pending}
+
+        # Total time includes waiting for a free worker; work time is bcrypt alone.
+        for operation, (metrics, samples) in snapshot.items():
+            totals = [total for total, _ in samples]
+            works = [work for _, work in samples]
+
+            report[operation] = {
+                "count": metrics["count"],
+                "rejected": metrics["rejected"],
+                "errors": metrics["errors"],
+                "total_p50_ms": self._percentile(totals, 0.5),
+                "total_p95_ms": self._percentile(totals, 0.95),
+                "work_p50_ms": self._percentile(works, 0.5),
+                "work_p95_ms": self._percentile(works, 0.95),
+            }
+
+        return report
+
+
+    def reset_metrics(self):
+        with self._lock:
+            self._metrics = {operation: self._empty_metrics() for operation in OPERATIONS}
+
+
+password_hasher = PasswordHasher()
 
 
 def hash_password(plain_password: str):
-    hashed = bcrypt.hashpw(plain_password.encode('utf-8'), bcrypt.gensalt())
-    return hashed.decode('utf-8')
+    return password_hasher.hash(plain_password)
 
 
 def check_password(plain_password: str, hashed_password: str):
-    return bcrypt.checkpw(plain_password.encode('utf-8'), hashed_password.encode('utf-8'))
+    return password_hasher.check(plain_password, hashed_password)
@@ -0,0 +1,40 @@
+import time
+from django.conf import settings
+from django.core.cache import cache
+from core.cache import require_shared_cache
+
+
+CACHE_KEY = "token_revoked_before:{}"
+
+
+class TokenRevocations:
+
+    @property
+    def ttl(self):
+        # Has to outlive every token issued before a revocation.
+        return getattr(settings, "AUTH_TOKEN_REVOCATION_TTL", 3600)
+
+
+    def check_backend(self):
+        # In claims mode a revocation made by one worker has to reach every
+        # other worker before the token it revokes expires.
+        if getattr(settings, "AUTH_ROLE_SOURCE", "database") == "claims":
+            require_shared_cache("AUTH_ROLE_SOURCE = 'claims'")
+
+
+    def revoke(self, *user_ids):
+        now = time.time()
+        cache.set_many({CACHE_KEY.format(user_id): now for user_id in user_ids}, timeout = self.ttl)
+
+
+    def is_revoked(self, payload):
+        revoked_before = cache.get(CACHE_KEY.format(payload.get("id")))
+
+        if revoked_before is None:
+            return False
+
+        # Tokens issued before iat existed count as the oldest possible.
+        return payload.get("iat", 0) < revoked_before
+
+
+token_revocations = TokenRevocations()
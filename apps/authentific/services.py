@@ -1,11 +1,13 @@
 from .models import User, InvitedUser, UserPromotion
 from .passwords import hash_password, check_password
 import jwt
+import time
 from django.conf import settings
 from datetime import timedelta, datetime
 from enums.roles import Role
 from django.utils import timezone
 from apps.entry_password.models import EntryPassword
+from apps.users.role_population import role_population
 
 
 def generate_jwt(user, lifetime_minutes=60):
@@ -15,6 +17,7 @@ def generate_jwt(user, lifetime_minutes=60):
         "email": user.email,
         "role": user.role,
         "inquisitor" : user.is_inquisitor,
+        "iat": time.time(),
         "exp": timezone.now() + timedelta(minutes = lifetime_minutes),
     }
 
@@ -41,6 +44,7 @@ def register_user(username, email, password):
     )
 
     invited_record.delete()
+    role_population.adjust(Role.MASON.value, 1)
 
     token = generate_jwt(user)
     return user, token
@@ -1,8 +1,9 @@
 from django.urls import path
-from .views import RegisterView, LoginView, EntryView
+from .views import RegisterView, LoginView, EntryView, PasswordHashMetricsView
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('login/', LoginView.as_view(), name='login'),
     path('entry/', EntryView.as_view(), name='entry'),
+    path('password-metrics/', PasswordHashMetricsView.as_view(), name='password-metrics'),
 ]
\ No newline at end of file
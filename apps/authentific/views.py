@@ -2,9 +2,20 @@ from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
 from .serializers import RegisterSerializer, LoginSerializer
-from .services import register_user, authenticate_user, get_entry_pass
+from .services import register_user, authenticate_user
 from core.settings import base
-from .passwords import check_password
+from apps.entry_password.verifier import entry_password_verifier
+from apps.users.permissions import IsGoldMason
+from .authentication import JWTAuthentication
+from .passwords import PasswordHasherBusy, password_hasher
+
+
+def busy_response(error):
+    return Response(
+        {"status": "TOO_MANY_REQUESTS", "notification": "Too many password checks, retry later"},
+        status = status.HTTP_429_TOO_MANY_REQUESTS,
+        headers = {"Retry-After": str(error.retry_after)}
+    )
 
 
 class RegisterView(APIView):
@@ -35,6 +46,9 @@ class RegisterView(APIView):
                 status = status.HTTP_403_FORBIDDEN
             )
 
+        except PasswordHasherBusy as e:
+            return busy_response(e)
+
 
 
 class LoginView(APIView):
@@ -43,10 +57,14 @@ class LoginView(APIView):
         serializer = LoginSerializer(data = request.data)
         serializer.is_valid(raise_exception = True)
 
-        user, token = authenticate_user(
-            serializer.validated_data["email"],
-            serializer.validated_data["password"]
-        )
+        try:
+            user, token = authenticate_user(
+                serializer.validated_data["email"],
+                serializer.validated_data["password"]
+            )
+
+        except PasswordHasherBusy as e:
+            return busy_response(e)
 
         if user:
             return Response(
@@ -72,9 +90,13 @@ class EntryView(APIView):
                 status = status.HTTP_400_BAD_REQUEST
             )
 
-        secret_entry_password = get_entry_pass()
+        try:
+            is_valid = entry_password_verifier.check(secret_password)
+
+        except PasswordHasherBusy as e:
+            return busy_response(e)
 
-        if check_password(secret_password, secret_entry_password):
+        if is_valid:
             return Response(
                 {"status": "OK", "notification": "Entry verified"},
                 status = status.HTTP_200_OK
@@ -83,4 +105,16 @@ class EntryView(APIView):
         return Response(
             {"status": "UNAUTHORIZED", "notification": "Invalid password"},
             status = status.HTTP_401_UNAUTHORIZED
-        )
\ No newline at end of file
+        )
+
+
+
+class PasswordHashMetricsView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsGoldMason]
+
+    def get(self, request):
+        return Response(
+            {"status": "OK", "notification": "Password hashing metrics", "data": password_hasher.metrics()},
+            status = status.HTTP_200_OK
+        )
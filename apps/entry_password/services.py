@@ -1,16 +1,17 @@
-import requests, json
+import json
+from core.sidecar import sidecar
 from coverage.debug import info_header
 from .models import EntryPassword
+from .verifier import entry_password_verifier
 from rest_framework.response import Response
-from django.db import connection
+from django.db import connection, transaction
 from datetime import datetime
 import logging
 
 logging.basicConfig(level=logging.INFO)
 
 def get_new_entry_password():
-    response = requests.get("http://docker_go:8080/entry_password", timeout=2)
-    payload = response.json()
+    payload = sidecar.get_entry_password()
     logging.info("new payload: %s", payload)
     return payload
 
@@ -32,5 +33,7 @@ def save_new_entry_password():
     with connection.cursor() as cursor:
         cursor.execute(query,params)
 
+    transaction.on_commit(entry_password_verifier.invalidate)
+
     logging.info("entry password updated: %s", type(datetime.now().strftime("%Y-%m-%d %H:%M")))
 
@@ -0,0 +1,130 @@
+import hashlib
+import hmac
+import os
+import threading
+import time
+from collections import OrderedDict
+from django.conf import settings
+from django.core.cache import cache
+from apps.authentific.passwords import check_password
+from .models import EntryPassword
+
+
+GENERATION_KEY = "entry_password:generation"
+
+
+class EntryPasswordVerifier:
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._current = None
+        self._memo = OrderedDict()
+        # Memo keys never leave the process, so a per-process key is enough and
+        # a dump of the memo cannot be checked against guesses offline.
+        self._memo_key = os.urandom(32)
+
+
+    @property
+    def generation_ttl(self):
+        return getattr(settings, "ENTRY_PASSWORD_GENERATION_TTL", 60)
+
+
+    @property
+    def memo_ttl(self):
+        return getattr(settings, "ENTRY_PASSWORD_MEMO_TTL", 60)
+
+
+    @property
+    def memo_size(self):
+        return getattr(settings, "ENTRY_PASSWORD_MEMO_SIZE", 1024)
+
+
+    @staticmethod
+    def _generation(row):
+        # last_updated only holds a time of day, so the hash itself tells
+        # rotations at the same time on different days apart.
+        digest = hashlib.sha256(row.entry_password.encode('utf-8')).hexdigest()[:16]
+        return f"{row.last_updated}:{digest}"
+
+
+    def current(self):
+        generation = cache.get(GENERATION_KEY)
+
+        with self._lock:
+            if generation is not None and self._current is not None and self._current[0] == generation:
+                return self._current
+
+        row = EntryPassword.objects.filter().first()
+
+        if row is None:
+            return None
+
+        current = (self._generation(row), row.entry_password)
+
+        # The expiry bounds how long a racing reader can republish an old generation.
+        cache.set(GENERATION_KEY, current[0], timeout = self.generation_ttl)
+
+        with self._lock:
+            self._current = current
+
+        return current
+
+
+    def _memo_digest(self, password, generation):
+        message = f"{generation}\0{password}".encode('utf-8')
+        return hmac.new(self._memo_key, message, hashlib.sha256).digest()
+
+
+    def _remembered(self, digest):
+        with self._lock:
+            expires_at = self._memo.get(digest)
+
+            if expires_at is None:
+                return False
+
+            if time.monotonic() >= expires_at:
+                del self._memo[digest]
+                return False
+
+            self._memo.move_to_end(digest)
+            return True
+
+
+    def _remember(self, digest):
+        with self._lock:
+            self._memo[digest] = time.monotonic() + self.memo_ttl
+            self._memo.move_to_end(digest)
+
+            while len(self._memo) > self.memo_size:
+                self._memo.popitem(last = False)
+
+
+    def check(self, password):
+        current = self.current()
+
+        if current is None:
+            return False
+
+        generation, hashed_password = current
+        digest = self._memo_digest(password, generation)
+
+        if self._remembered(digest):
+            return True
+
+        # Only successes are memoised; wrong guesses always pay for bcrypt.
+        if not check_password(password, hashed_password):
+            return False
+
+        self._remember(digest)
+        return True
+
+
+    def invalidate(self):
+        cache.delete(GENERATION_KEY)
+
+        with self._lock:
+            self._current = None
+            self._memo.clear()
+
+
+entry_password_verifier = EntryPasswordVerifier()
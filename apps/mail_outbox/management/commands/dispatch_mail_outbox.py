@@ -0,0 +1,27 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.mail_outbox.services import mail_dispatcher
+
+
+class Command(BaseCommand):
+    help = "Sends pending outbox mail in batched sidecar calls, optionally forever"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action="store_true", help="Keep polling the outbox")
+        parser.add_argument("--interval", type=float, default=5, help="Seconds between polls")
+
+    def handle(self, *args, **options):
+        while True:
+            report = mail_dispatcher.dispatch()
+            if report["messages"]:
+                self.stdout.write(
+                    self.style.SUCCESS(
+                        f"Sent {report['sent']} of {report['messages']} messages in "
+                        f"{report['calls']} calls ({report['retried']} to retry, "
+                        f"{report['failed']} failed)"
+                    )
+                )
+
+            if not options["loop"]:
+                return
+            time.sleep(options["interval"])
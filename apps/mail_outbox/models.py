@@ -0,0 +1,19 @@
+from django.db import models
+
+
+class OutboxMessage(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    topic = models.TextField()
+    text = models.TextField()
+    email = models.TextField()
+    status = models.CharField(max_length=16)
+    attempts = models.IntegerField(default=0)
+    last_error = models.TextField(null=True)
+    created_at = models.DateTimeField()
+    next_attempt_at = models.DateTimeField()
+    claimed_at = models.DateTimeField(null=True)
+    sent_at = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = "mail_outbox"
+        managed = False
@@ -0,0 +1,211 @@
+import logging
+import random
+import threading
+import time
+from datetime import timedelta
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import F
+from django.utils import timezone
+from core.sidecar import SidecarUnavailable, sidecar
+from enums.mail_outbox import OutboxStatus
+from .models import OutboxMessage
+
+logger = logging.getLogger(__name__)
+
+
+def enqueue_letter(topic, text, target_emails):
+    now = timezone.now()
+    messages = OutboxMessage.objects.bulk_create(
+        [
+            OutboxMessage(
+                topic=topic,
+                text=text,
+                email=email,
+                status=OutboxStatus.PENDING.value,
+                created_at=now,
+                next_attempt_at=now,
+            )
+            for email in dict.fromkeys(target_emails)
+        ]
+    )
+
+    # The dispatcher only sees rows once they are committed.
+    transaction.on_commit(mail_dispatcher.wake)
+    return messages
+
+
+class MailDispatcher:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._running = False
+        self._rerun = False
+
+    @property
+    def batch_size(self):
+        return getattr(settings, "MAIL_OUTBOX_BATCH_SIZE", 500)
+
+    @property
+    def max_recipients(self):
+        return getattr(settings, "MAIL_OUTBOX_MAX_RECIPIENTS", 100)
+
+    @property
+    def max_attempts(self):
+        return getattr(settings, "MAIL_OUTBOX_MAX_ATTEMPTS", 5)
+
+    @property
+    def retry_after(self):
+        return getattr(settings, "MAIL_OUTBOX_RETRY_AFTER", 30)
+
+    @property
+    def stale_after(self):
+        return timedelta(seconds=getattr(settings, "MAIL_OUTBOX_STALE_AFTER", 300))
+
+    @property
+    def linger(self):
+        return getattr(settings, "MAIL_OUTBOX_LINGER", 1)
+
+    def requeue_stale(self):
+        # A dispatcher that died mid-send leaves rows claimed; delivery is at
+        # least once, so they go back to the queue.
+        return OutboxMessage.objects.filter(
+            status=OutboxStatus.SENDING.value,
+            claimed_at__lt=timezone.now() - self.stale_after,
+        ).update(status=OutboxStatus.PENDING.value)
+
+    def claim_batch(self):
+        now = timezone.now()
+
+        with transaction.atomic():
+            messages = list(
+                OutboxMessage.objects.select_for_update(skip_locked=True)
+                .filter(status=OutboxStatus.PENDING.value, next_attempt_at__lte=now)
+                .order_by("id")[: self.batch_size]
+            )
+            OutboxMessage.objects.filter(id__in=[m.id for m in messages]).update(
+                status=OutboxStatus.SENDING.value,
+                claimed_at=now,
+                attempts=F("attempts") + 1,
+            )
+
+        for message in messages:
+            message.attempts += 1
+        return messages
+
+    def group(self, messages):
+        groups = {}
+        for message in messages:
+            groups.setdefault((message.topic, message.text), []).append(message)
+
+        # The sidecar takes a recipient list, so one call covers a whole group.
+        for (topic, text), grouped in groups.items():
+            for start in range(0, len(grouped), self.max_recipients):
+                yield topic, text, grouped[start : start + self.max_recipients]
+
+    def deliver(self, topic, text, messages):
+        payload = {
+            "topic": topic,
+            "text": text,
+            "target_emails": list(dict.fromkeys(m.email for m in messages)),
+        }
+
+        try:
+            response = sidecar.post_json("send_letter", payload)
+        except SidecarUnavailable as e:
+            return str(e)
+
+        if response.status_code != 200:
+            return f"Mailer answered {response.status_code}: {response.text[:500]}"
+        return None
+
+    def mark_sent(self, messages):
+        OutboxMessage.objects.filter(id__in=[m.id for m in messages]).update(
+            status=OutboxStatus.SENT.value, sent_at=timezone.now(), last_error=None
+        )
+
+    def mark_failed(self, messages, error):
+        now = timezone.now()
+        retry, failed = [], []
+        for message in messages:
+            (retry if message.attempts < self.max_attempts else failed).append(message)
+
+        buckets = {}
+        for message in retry:
+            buckets.setdefault(message.attempts, []).append(message.id)
+
+        # Messages with the same attempt count share a backoff, so a failed
+        # group costs one UPDATE per attempt count; the jitter keeps
+        # dispatchers that failed together from retrying in step.
+        for attempts, ids in buckets.items():
+            delay = self.retry_after * 2 ** (attempts - 1)
+            OutboxMessage.objects.filter(id__in=ids).update(
+                status=OutboxStatus.PENDING.value,
+                next_attempt_at=now + timedelta(seconds=random.uniform(delay / 2, delay)),
+                last_error=error,
+            )
+
+        OutboxMessage.objects.filter(id__in=[m.id for m in failed]).update(
+            status=OutboxStatus.FAILED.value, last_error=error
+        )
+        return len(retry), len(failed)
+
+    def dispatch(self):
+        report = {"batches": 0, "messages": 0, "calls": 0, "sent": 0, "retried": 0, "failed": 0}
+        self.requeue_stale()
+
+        while True:
+            messages = self.claim_batch()
+            if not messages:
+                return report
+
+            report["batches"] += 1
+            report["messages"] += len(messages)
+
+            for topic, text, grouped in self.group(messages):
+                report["calls"] += 1
+                error = self.deliver(topic, text, grouped)
+
+                if error is None:
+                    self.mark_sent(grouped)
+                    report["sent"] += len(grouped)
+                    continue
+
+                logger.error(f"Failed to send mail via Go service: {error}")
+                retried, failed = self.mark_failed(grouped, error)
+                report["retried"] += retried
+                report["failed"] += failed
+
+            if len(messages) < self.batch_size:
+                return report
+
+    def wake(self):
+        with self._lock:
+            if self._running:
+                self._rerun = True
+                return
+            self._running = True
+
+        threading.Thread(
+            target=self._run_in_thread, name="mail-dispatcher", daemon=True
+        ).start()
+
+    def _run_in_thread(self):
+        try:
+            while True:
+                # Waiting a moment lets a burst of enqueues share sidecar calls.
+                time.sleep(self.linger)
+                try:
+                    self.dispatch()
+                except Exception as e:
+                    logger.exception(f"Mail dispatch failed: {e}")
+
+                with self._lock:
+                    if not self._rerun:
+                        self._running = False
+                        return
+                    self._rerun = False
+        finally:
+            connections.close_all()
+
+
+mail_dispatcher = MailDispatcher()
@@ -0,0 +1,185 @@
+import math
+import threading
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Count, F, Sum
+from django.db.models.functions import Floor
+from core.cache import CacheGeneration
+from .models import Record
+from .spatial import filter_bbox
+
+
+CACHE_KEY = "record_clusters:{}:{}:{}:{}"
+MAX_ZOOM = 20
+TOP_TYPES = 3
+# A tile is TILE_CELLS x TILE_CELLS cells and is cached as one entry, so a write
+# or a viewport only touches the tiles it overlaps.
+TILE_CELLS = 16
+WORLD = (-180.0, -180.0, 180.0, 180.0)
+
+
+def cell_size(zoom):
+    return 360 / 2**zoom
+
+
+def cell_of(x, y, zoom):
+    size = cell_size(zoom)
+    return math.floor(x / size), math.floor(y / size)
+
+
+def tile_of(cell):
+    return cell[0] // TILE_CELLS, cell[1] // TILE_CELLS
+
+
+class RecordClusterIndex:
+    generation = CacheGeneration("record_clusters:generation")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+
+    @property
+    def timeout(self):
+        return getattr(settings, "RECORD_CLUSTERS_TTL", 300)
+
+    @property
+    def max_tiles(self):
+        return getattr(settings, "RECORD_CLUSTERS_MAX_TILES", 256)
+
+    def _key(self, generation, zoom, tile):
+        return CACHE_KEY.format(generation, zoom, *tile)
+
+    def tiles(self, zoom, bbox):
+        min_x, min_y, max_x, max_y = bbox
+        low_x, low_y = tile_of(cell_of(min_x, min_y, zoom))
+        high_x, high_y = tile_of(cell_of(max_x, max_y, zoom))
+
+        if (high_x - low_x + 1) * (high_y - low_y + 1) > self.max_tiles:
+            raise ValueError(
+                f"bbox is too large for zoom {zoom}, narrow it or zoom out"
+            )
+
+        return [
+            (tile_x, tile_y)
+            for tile_x in range(low_x, high_x + 1)
+            for tile_y in range(low_y, high_y + 1)
+        ]
+
+    def build(self, zoom, tiles, generation=None):
+        generation = self.generation.get() if generation is None else generation
+        size = cell_size(zoom)
+        span = size * TILE_CELLS
+        bbox = (
+            min(tile_x for tile_x, _ in tiles) * span,
+            min(tile_y for _, tile_y in tiles) * span,
+            (max(tile_x for tile_x, _ in tiles) + 1) * span,
+            (max(tile_y for _, tile_y in tiles) + 1) * span,
+        )
+        rows = (
+            filter_bbox(Record.objects.all(), bbox)
+            .annotate(cell_x=Floor(F("x") / size), cell_y=Floor(F("y") / size))
+            .values("cell_x", "cell_y", "type")
+            .annotate(count=Count("id"), sum_x=Sum("x"), sum_y=Sum("y"))
+            .order_by()
+        )
+
+        # tile -> cell -> [count, sum_x, sum_y, {type: count}]; empty tiles are
+        # cached too, so bare stretches of the map are not queried again.
+        built = {tile: {} for tile in tiles}
+        for row in rows:
+            cell_key = (int(row["cell_x"]), int(row["cell_y"]))
+            cells = built.get(tile_of(cell_key))
+            if cells is None:
+                continue
+
+            cell = cells.setdefault(cell_key, [0, 0.0, 0.0, {}])
+            cell[0] += row["count"]
+            cell[1] += row["sum_x"]
+            cell[2] += row["sum_y"]
+            cell[3][row["type"]] = cell[3].get(row["type"], 0) + row["count"]
+
+        cache.set_many(
+            {self._key(generation, zoom, tile): cells for tile, cells in built.items()},
+            timeout=self.timeout,
+        )
+        return built
+
+    def get_cells(self, zoom, bbox=None):
+        generation = self.generation.get()
+        keys = {
+            tile: self._key(generation, zoom, tile)
+            for tile in self.tiles(zoom, bbox or WORLD)
+        }
+        cached = cache.get_many(keys.values())
+
+        tiles = {tile: cached[key] for tile, key in keys.items() if key in cached}
+        missing = [tile for tile in keys if tile not in tiles]
+        if missing:
+            tiles.update(self.build(zoom, missing, generation))
+
+        return {
+            cell_key: cell
+            for cells in tiles.values()
+            for cell_key, cell in cells.items()
+        }
+
+    def add(self, record):
+        generation = self.generation.get()
+        keys = {}
+        for zoom in range(MAX_ZOOM + 1):
+            tile = tile_of(cell_of(record.x, record.y, zoom))
+            keys[self._key(generation, zoom, tile)] = zoom
+
+        # Only the record's own tile on each level is read and patched, and only
+        # when somebody already asked for it. The lock covers this process only,
+        # so concurrent writers in other workers can drop an update until the TTL
+        # rebuilds the tile.
+        with self._lock:
+            cached = cache.get_many(keys.keys())
+            if not cached:
+                return
+
+            for key, cells in cached.items():
+                cell = cells.setdefault(
+                    cell_of(record.x, record.y, keys[key]), [0, 0.0, 0.0, {}]
+                )
+                cell[0] += 1
+                cell[1] += record.x
+                cell[2] += record.y
+                cell[3][record.type] = cell[3].get(record.type, 0) + 1
+
+            cache.set_many(cached, timeout=self.timeout)
+
+    def invalidate(self):
+        self.generation.bump()
+
+    def clusters(self, zoom, bbox=None):
+        cells = self.get_cells(zoom, bbox)
+
+        # Edge tiles stick out of the bbox, so their cells are trimmed.
+        if bbox is not None:
+            min_x, min_y, max_x, max_y = bbox
+            low_x, low_y = cell_of(min_x, min_y, zoom)
+            high_x, high_y = cell_of(max_x, max_y, zoom)
+            cells = {
+                (cx, cy): cell
+                for (cx, cy), cell in cells.items()
+                if low_x <= cx <= high_x and low_y <= cy <= high_y
+            }
+
+        return [
+            {
+                "count": count,
+                "x": sum_x / count,
+                "y": sum_y / count,
+                "top_types": [
+                    {"type": record_type, "count": type_count}
+                    for record_type, type_count in sorted(
+                        types.items(), key=lambda item: (-item[1], item[0])
+                    )[:TOP_TYPES]
+                ],
+            }
+            for _, (count, sum_x, sum_y, types) in sorted(cells.items())
+        ]
+
+
+record_clusters = RecordClusterIndex()
@@ -0,0 +1,89 @@
+import logging
+import os
+import tempfile
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from django.conf import settings
+from PIL import Image, ImageOps
+from .images import get_image_dir
+
+logger = logging.getLogger(__name__)
+
+DERIVATIVE_SIZES = (64, 256, 1024)
+SAVE_OPTIONS = {"JPEG": {"quality": 85, "optimize": True}, "PNG": {"optimize": True}}
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def derivative_name(name, size):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}-{size}{ext}"
+
+
+def derivative_urls(img_path):
+    stem, ext = os.path.splitext(img_path)
+    return {str(size): f"{stem}-{size}{ext}" for size in DERIVATIVE_SIZES}
+
+
+def _save_atomic(image, image_format, target, image_dir):
+    fd, tmp_path = tempfile.mkstemp(dir=image_dir, prefix=".derivative-")
+    try:
+        with os.fdopen(fd, "wb") as tmp:
+            image.save(tmp, format=image_format, **SAVE_OPTIONS.get(image_format, {}))
+
+        os.chmod(tmp_path, 0o644)
+        os.replace(tmp_path, target)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def generate_derivatives(name, image_dir=None):
+    image_dir = image_dir or get_image_dir()
+    created = []
+
+    with Image.open(os.path.join(image_dir, name)) as original:
+        image_format = original.format
+        # Derivatives carry no EXIF, so phone photos are turned upright here the
+        # way browsers turn the original.
+        current = ImageOps.exif_transpose(original)
+
+    # Largest first, each size scaled down from the previous one rather than
+    # from the full original.
+    for size in sorted(DERIVATIVE_SIZES, reverse=True):
+        target = os.path.join(image_dir, derivative_name(name, size))
+
+        current.thumbnail((size, size))
+        if os.path.exists(target):
+            continue
+
+        _save_atomic(current, image_format, target, image_dir)
+        created.append(os.path.basename(target))
+
+    return created
+
+
+def _generate_in_background(name, image_dir):
+    try:
+        generate_derivatives(name, image_dir)
+    except Exception as e:
+        logger.exception(f"Failed to generate derivatives for {name}: {e}")
+
+
+def get_executor():
+    global _executor
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, "RECORD_IMAGE_WORKERS", 2),
+                thread_name_prefix="record-derivatives",
+            )
+        return _executor
+
+
+def schedule_derivatives(name, image_dir=None):
+    return get_executor().submit(
+        _generate_in_background, name, image_dir or get_image_dir()
+    )
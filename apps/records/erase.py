@@ -0,0 +1,232 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from itertools import repeat
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Max
+from django.utils import timezone
+from apps.entry_password.services import save_new_entry_password
+from enums.erase_jobs import EraseJobPhase, EraseJobStatus
+from .clusters import record_clusters
+from .images import get_image_dir
+from .models import EraseJob, Record, RecordActivityUser
+from .services import bump_erase_generation
+
+logger = logging.getLogger(__name__)
+
+ACTIVE_STATUSES = [EraseJobStatus.PENDING.value, EraseJobStatus.RUNNING.value]
+PHASES = [EraseJobPhase.ROWS.value, EraseJobPhase.FILES.value, EraseJobPhase.PASSWORD.value]
+
+
+def get_chunk_size():
+    return getattr(settings, "RECORD_ERASE_CHUNK_SIZE", 1000)
+
+
+def get_stale_after():
+    return timedelta(seconds=getattr(settings, "RECORD_ERASE_STALE_AFTER", 60))
+
+
+def get_active_erase_jobs():
+    return list(EraseJob.objects.filter(status__in=ACTIVE_STATUSES).order_by("id"))
+
+
+def get_erase_job(job_id):
+    # A plain read: jobs whose worker died are picked up by resume_erase_jobs,
+    # not by whoever happens to poll them.
+    return EraseJob.objects.filter(id=job_id).first()
+
+
+def create_erase_job():
+    with transaction.atomic():
+        job = (
+            EraseJob.objects.select_for_update()
+            .filter(status__in=ACTIVE_STATUSES)
+            .order_by("id")
+            .first()
+        )
+        if job is not None:
+            return job
+
+        # Only rows and files that exist now are erased, so uploads made while
+        # the job runs survive it and a resumed job erases the same set.
+        bump_erase_generation()
+        now = timezone.now()
+        max_record_id = Record.objects.aggregate(max_id=Max("id"))["max_id"] or 0
+        return EraseJob.objects.create(
+            status=EraseJobStatus.PENDING.value,
+            phase=EraseJobPhase.ROWS.value,
+            max_record_id=max_record_id,
+            started_at=now,
+            updated_at=now,
+        )
+
+
+def claim_erase_job(job):
+    now = timezone.now()
+
+    # A running job that still heartbeats belongs to a live worker.
+    if (
+        job.status == EraseJobStatus.RUNNING.value
+        and now - job.updated_at < get_stale_after()
+    ):
+        return False
+
+    claimed = EraseJob.objects.filter(
+        id=job.id, status=job.status, updated_at=job.updated_at
+    ).update(status=EraseJobStatus.RUNNING.value, updated_at=now)
+
+    if claimed:
+        job.status = EraseJobStatus.RUNNING.value
+        job.updated_at = now
+    return bool(claimed)
+
+
+def start_erase_job():
+    job = create_erase_job()
+    resume_erase_job(job)
+    return job
+
+
+def resume_erase_job(job):
+    if job.status not in ACTIVE_STATUSES or not claim_erase_job(job):
+        return False
+
+    threading.Thread(
+        target=_run_in_thread, args=(job,), name=f"erase-job-{job.id}", daemon=True
+    ).start()
+    return True
+
+
+def _save_progress(job, **counters):
+    for field, value in counters.items():
+        setattr(job, field, getattr(job, field) + value)
+
+    job.updated_at = timezone.now()
+    job.save(update_fields=[*counters, "updated_at"])
+
+
+def _set_phase(job, phase):
+    job.phase = phase
+    job.updated_at = timezone.now()
+    job.save(update_fields=["phase", "updated_at"])
+
+
+def _delete_in_chunks(job, queryset):
+    chunk_size = get_chunk_size()
+
+    while True:
+        ids = list(queryset.order_by("id").values_list("id", flat=True)[:chunk_size])
+        if not ids:
+            return
+
+        with transaction.atomic():
+            deleted, _ = queryset.model.objects.filter(id__in=ids).delete()
+            _save_progress(job, rows_deleted=deleted)
+
+
+def erase_rows(job):
+    _delete_in_chunks(
+        job, RecordActivityUser.objects.filter(record_id__lte=job.max_record_id)
+    )
+    _delete_in_chunks(job, Record.objects.filter(id__lte=job.max_record_id))
+
+    # The bump in create_erase_job stales tokens taken before the job; this one
+    # stales tokens taken while its chunks were still being deleted.
+    bump_erase_generation()
+    record_clusters.invalidate()
+
+
+def _remove_file(path, cutoff):
+    try:
+        # store_image touches reused files, so anything newer belongs to an
+        # upload made after the job started.
+        if os.stat(path).st_mtime >= cutoff:
+            return None
+        os.remove(path)
+    except FileNotFoundError:
+        return None
+    except OSError as e:
+        logger.warning(f"Failed to delete {path}: {e}")
+        return False
+    return True
+
+
+def _remove_batch(job, pool, batch, cutoff):
+    results = list(pool.map(_remove_file, batch, repeat(cutoff)))
+    _save_progress(
+        job,
+        files_deleted=results.count(True),
+        files_failed=results.count(False),
+    )
+
+
+def erase_files(job):
+    image_dir = get_image_dir()
+    if not os.path.isdir(image_dir):
+        return
+
+    cutoff = job.started_at.timestamp()
+    batch_size = get_chunk_size()
+    batch = []
+
+    with ThreadPoolExecutor(
+        max_workers=getattr(settings, "RECORD_ERASE_WORKERS", 8),
+        thread_name_prefix="erase-files",
+    ) as pool, os.scandir(image_dir) as entries:
+        for entry in entries:
+            if not entry.is_file(follow_symlinks=False):
+                continue
+
+            batch.append(entry.path)
+            if len(batch) >= batch_size:
+                _remove_batch(job, pool, batch, cutoff)
+                batch = []
+
+        if batch:
+            _remove_batch(job, pool, batch, cutoff)
+
+
+def rotate_entry_password(job):
+    try:
+        save_new_entry_password()
+    except Exception as e:
+        logger.exception(f"Entry password trigger failed: {e}")
+
+
+PHASE_HANDLERS = {
+    EraseJobPhase.ROWS.value: erase_rows,
+    EraseJobPhase.FILES.value: erase_files,
+    EraseJobPhase.PASSWORD.value: rotate_entry_password,
+}
+
+
+def run_erase_job(job):
+    try:
+        # Phases are idempotent, so a resumed job restarts its current phase.
+        for phase in PHASES[PHASES.index(job.phase):]:
+            _set_phase(job, phase)
+            PHASE_HANDLERS[phase](job)
+
+        job.status = EraseJobStatus.DONE.value
+        job.phase = EraseJobPhase.DONE.value
+        job.finished_at = job.updated_at = timezone.now()
+        job.save(update_fields=["status", "phase", "finished_at", "updated_at"])
+
+    except Exception as e:
+        logger.exception(f"Erase job {job.id} failed: {e}")
+        job.status = EraseJobStatus.FAILED.value
+        job.error = str(e)
+        job.finished_at = job.updated_at = timezone.now()
+        job.save(update_fields=["status", "error", "finished_at", "updated_at"])
+
+    return job
+
+
+def _run_in_thread(job):
+    try:
+        run_erase_job(job)
+    finally:
+        connections.close_all()
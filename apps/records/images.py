@@ -0,0 +1,140 @@
+import hashlib
+import os
+import struct
+import tempfile
+from django.conf import settings
+
+
+HEADER_SIZE = 32
+
+
+class InvalidImage(ValueError):
+    pass
+
+
+def get_image_dir():
+    return os.path.join(settings.BASE_DIR, "shared", "images")
+
+
+def _png_size(f, header):
+    if header[12:16] != b"IHDR":
+        raise InvalidImage("Corrupt PNG header")
+    return struct.unpack(">II", header[16:24])
+
+
+def _gif_size(f, header):
+    return struct.unpack("<HH", header[6:10])
+
+
+def _webp_size(f, header):
+    chunk = header[12:16]
+    if chunk == b"VP8X":
+        width = int.from_bytes(header[24:27], "little") + 1
+        height = int.from_bytes(header[27:30], "little") + 1
+        return width, height
+    if chunk == b"VP8 ":
+        f.seek(26)
+        width, height = struct.unpack("<HH", f.read(4))
+        return width & 0x3FFF, height & 0x3FFF
+    if chunk == b"VP8L":
+        f.seek(21)
+        bits = int.from_bytes(f.read(4), "little")
+        return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+    raise InvalidImage("Unsupported WebP encoding")
+
+
+def _jpeg_size(f, header):
+    f.seek(2)
+    while True:
+        marker = f.read(2)
+        if len(marker) < 2 or marker[0] != 0xFF:
+            raise InvalidImage("Corrupt JPEG stream")
+
+        code = marker[1]
+        if code == 0xFF:
+            f.seek(-1, os.SEEK_CUR)
+            continue
+        if code in (0xD8, 0x01) or 0xD0 <= code <= 0xD7:
+            continue
+
+        length = struct.unpack(">H", f.read(2))[0]
+
+        # SOF0..SOF15 carry the frame size; C4, C8 and CC share the range but are not frames.
+        if 0xC0 <= code <= 0xCF and code not in (0xC4, 0xC8, 0xCC):
+            height, width = struct.unpack(">xHH", f.read(5))
+            return width, height
+
+        f.seek(length - 2, os.SEEK_CUR)
+
+
+FORMATS = [
+    (lambda h: h.startswith(b"\x89PNG\r\n\x1a\n"), ".png", _png_size),
+    (lambda h: h.startswith(b"\xff\xd8\xff"), ".jpg", _jpeg_size),
+    (lambda h: h[:6] in (b"GIF87a", b"GIF89a"), ".gif", _gif_size),
+    (lambda h: h[:4] == b"RIFF" and h[8:12] == b"WEBP", ".webp", _webp_size),
+]
+
+
+def sniff_image(f):
+    f.seek(0)
+    header = f.read(HEADER_SIZE)
+
+    for matches, ext, read_size in FORMATS:
+        if matches(header):
+            try:
+                width, height = read_size(f, header)
+            except struct.error:
+                raise InvalidImage("Truncated image")
+
+            if not width or not height:
+                raise InvalidImage("Image has no dimensions")
+            return ext, width, height
+
+    raise InvalidImage("Unsupported image format")
+
+
+def store_image(upload, image_dir=None):
+    image_dir = image_dir or get_image_dir()
+    os.makedirs(image_dir, exist_ok=True)
+
+    max_bytes = getattr(settings, "RECORD_IMAGE_MAX_BYTES", 10 * 1024 * 1024)
+    digest = hashlib.sha256()
+    size = 0
+
+    # The temp file lives next to the target so the final rename stays atomic.
+    fd, tmp_path = tempfile.mkstemp(dir=image_dir, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "w+b") as tmp:
+            for chunk in upload.chunks():
+                size += len(chunk)
+                if size > max_bytes:
+                    raise InvalidImage("Image is too large")
+
+                digest.update(chunk)
+                tmp.write(chunk)
+
+            ext, width, height = sniff_image(tmp)
+
+        sha256 = digest.hexdigest()
+        name = f"{sha256}{ext}"
+        path = os.path.join(image_dir, name)
+
+        created = not os.path.exists(path)
+        if created:
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        else:
+            # Marks the file as in use again for erase jobs already in flight.
+            os.utime(path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+    return {
+        "name": name,
+        "sha256": sha256,
+        "size": size,
+        "width": width,
+        "height": height,
+        "created": created,
+    }
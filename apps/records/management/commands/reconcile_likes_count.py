@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from apps.records.services import reconcile_likes_count
+
+
+class Command(BaseCommand):
+    help = "Recounts records.likes_count from record_activity_user and repairs drift"
+
+    def handle(self, *args, **options):
+        repaired = reconcile_likes_count()
+
+        self.stdout.write(self.style.SUCCESS(f"Repaired likes_count of {repaired} records"))
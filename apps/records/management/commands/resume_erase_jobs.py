@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+from apps.records.erase import claim_erase_job, get_active_erase_jobs, run_erase_job
+
+
+class Command(BaseCommand):
+    help = "Finishes erase jobs whose worker stopped before completing them"
+
+    def handle(self, *args, **options):
+        for job in get_active_erase_jobs():
+            if not claim_erase_job(job):
+                self.stdout.write(f"Erase job {job.id} is still running elsewhere")
+                continue
+
+            job = run_erase_job(job)
+            self.stdout.write(
+                self.style.SUCCESS(f"Erase job {job.id} finished with status {job.status}")
+            )
@@ -0,0 +1,134 @@
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from django.views import View
+from .derivatives import DERIVATIVE_SIZES
+from .images import get_image_dir
+
+
+HASHED_NAME = re.compile(r"^(?P<hash>[0-9a-f]{64})(?:-(?P<size>\d+))?(?P<ext>\.\w+)$")
+RANGE_HEADER = re.compile(r"^bytes=(\d*)-(\d*)$")
+BLOCK_SIZE = 64 * 1024
+IMMUTABLE = "public, max-age=31536000, immutable"
+
+
+def parse_range(header, size):
+    match = RANGE_HEADER.match(header.strip())
+    if not match:
+        # Multiple or malformed ranges: serving the whole file is always allowed.
+        return None
+
+    start, end = match.groups()
+    if not start and not end:
+        return None
+
+    if not start:
+        length = int(end)
+        if length == 0:
+            raise ValueError("Unsatisfiable range")
+        return max(size - length, 0), size - 1
+
+    start = int(start)
+    end = min(int(end), size - 1) if end else size - 1
+    if start >= size or start > end:
+        raise ValueError("Unsatisfiable range")
+    return start, end
+
+
+def read_range(path, start, end):
+    with open(path, "rb") as f:
+        f.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            block = f.read(min(BLOCK_SIZE, remaining))
+            if not block:
+                break
+            remaining -= len(block)
+            yield block
+
+
+class MediaView(View):
+    def resolve(self, name):
+        if name != os.path.basename(name) or name.startswith("."):
+            raise Http404("Not found")
+
+        image_dir = get_image_dir()
+        path = os.path.join(image_dir, name)
+        if os.path.isfile(path):
+            return path, True
+
+        # Derivatives are written in the background; until they exist hand out
+        # the original without letting anyone cache it under the derivative URL.
+        match = HASHED_NAME.match(name)
+        if match and match["size"] and int(match["size"]) in DERIVATIVE_SIZES:
+            original = os.path.join(image_dir, f"{match['hash']}{match['ext']}")
+            if os.path.isfile(original):
+                return original, False
+
+        raise Http404("Not found")
+
+    def get(self, request, name):
+        path, exact = self.resolve(name)
+        stat = os.stat(path)
+
+        if HASHED_NAME.match(os.path.basename(path)):
+            etag = f'"{os.path.splitext(os.path.basename(path))[0]}"'
+        else:
+            etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+        last_modified = int(stat.st_mtime)
+
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = self.serve(request, path, stat.st_size, etag)
+
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        response["Cache-Control"] = IMMUTABLE if exact else "public, max-age=60"
+        return response
+
+    def serve(self, request, path, size, etag):
+        content_type = mimetypes.guess_type(path)[0] or "application/octet-stream"
+
+        accel_prefix = getattr(settings, "MEDIA_ACCEL_REDIRECT_PREFIX", None)
+        sendfile_header = getattr(settings, "MEDIA_SENDFILE_HEADER", None)
+
+        # With offload the front server streams the bytes and handles Range itself.
+        if accel_prefix or sendfile_header:
+            response = HttpResponse(content_type=content_type)
+            if accel_prefix:
+                response["X-Accel-Redirect"] = (
+                    f"{accel_prefix.rstrip('/')}/{os.path.basename(path)}"
+                )
+            else:
+                response[sendfile_header] = path
+            return response
+
+        byte_range = None
+        range_header = request.headers.get("Range")
+        if_range = request.headers.get("If-Range")
+        if range_header and (not if_range or if_range == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                response = HttpResponse(status=416)
+                response["Content-Range"] = f"bytes */{size}"
+                return response
+
+        if byte_range is None:
+            response = FileResponse(open(path, "rb"), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(
+                read_range(path, start, end), status=206, content_type=content_type
+            )
+            response["Content-Length"] = str(end - start + 1)
+            response["Content-Range"] = f"bytes {start}-{end}/{size}"
+
+        response["Accept-Ranges"] = "bytes"
+        return response
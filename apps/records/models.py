@@ -9,7 +9,14 @@ class Record(models.Model):
     type = models.CharField(max_length=20)
     description = models.TextField(max_length=20)
     img_path = models.CharField(max_length=1024)
+    img_hash = models.CharField(max_length=64, null=True)
+    img_size = models.BigIntegerField(null=True)
+    img_width = models.IntegerField(null=True)
+    img_height = models.IntegerField(null=True)
     additional_info = models.CharField(max_length=100)
+    likes_count = models.BigIntegerField(default=0)
+    grid_x = models.IntegerField(default=0)
+    grid_y = models.IntegerField(default=0)
 
     class Meta:
         db_table = "records"
@@ -26,3 +33,30 @@ class RecordActivityUser(models.Model):
         db_table = "record_activity_user"
         managed = False
         unique_together = (("user_id", "record_id"),)
+
+
+class EraseJob(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    status = models.CharField(max_length=16)
+    phase = models.CharField(max_length=16)
+    max_record_id = models.BigIntegerField(default=0)
+    rows_deleted = models.BigIntegerField(default=0)
+    files_deleted = models.BigIntegerField(default=0)
+    files_failed = models.BigIntegerField(default=0)
+    error = models.TextField(null=True)
+    started_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    finished_at = models.DateTimeField(null=True)
+
+    class Meta:
+        db_table = "erase_jobs"
+        managed = False
+
+
+class RecordsState(models.Model):
+    id = models.BigAutoField(primary_key=True)
+    erase_generation = models.BigIntegerField(default=0)
+
+    class Meta:
+        db_table = "records_state"
+        managed = False
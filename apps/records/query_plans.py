@@ -0,0 +1,32 @@
+from .models import RecordActivityUser
+from .services import filter_records, get_user_likes
+
+
+def as_sql(queryset):
+    return queryset.query.get_compiler(using=queryset.db).as_sql()
+
+
+def hot_queries():
+    return [
+        (
+            "records: records of a type in a viewport",
+            *as_sql(filter_records(["UFO"], (49.8, 24.0, 49.9, 24.1))),
+        ),
+        (
+            "records: likes of a user on a page",
+            *as_sql(
+                get_user_likes(1)
+                .filter(record_id__in=[1, 2, 3])
+                .values_list("record_id", flat=True)
+            ),
+        ),
+        (
+            # The lookup get_record_by_id runs for a signed-in reader.
+            "records: like of a user on a record",
+            *as_sql(
+                RecordActivityUser.objects.filter(
+                    record_id=1, user_id=1, like_status=True
+                )
+            ),
+        ),
+    ]
@@ -1,5 +1,6 @@
 from rest_framework import serializers
-from .models import Record, RecordActivityUser
+from .models import EraseJob, Record, RecordActivityUser
+from .derivatives import derivative_urls
 
 
 class RecordActivitySerializer(serializers.ModelSerializer):
@@ -14,6 +15,7 @@ class RecordSerializer(serializers.ModelSerializer):
     liked_by_user = serializers.BooleanField(read_only=True, default=False)
 
     img_path = serializers.CharField(read_only=True)
+    img_derivatives = serializers.SerializerMethodField()
     description = serializers.CharField(required=False, allow_blank=True)
     additional_info = serializers.CharField(required=False, allow_blank=True)
 
@@ -27,11 +29,18 @@ class RecordSerializer(serializers.ModelSerializer):
             "type",
             "description",
             "img_path",
+            "img_derivatives",
             "additional_info",
             "likes_count",
             "liked_by_user",
         ]
 
+    def get_img_derivatives(self, obj):
+        # Only uploads stored by hash have derivatives; older records keep the original.
+        if not getattr(obj, "img_hash", None):
+            return {}
+        return derivative_urls(obj.img_path)
+
     def __init__(self, *args, **kwargs):
         fields = kwargs.pop("fields", None)
         super().__init__(*args, **kwargs)
@@ -42,3 +51,20 @@ class RecordSerializer(serializers.ModelSerializer):
 
             for field_name in existing - allowed:
                 self.fields.pop(field_name)
+
+
+class EraseJobSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EraseJob
+        fields = [
+            "id",
+            "status",
+            "phase",
+            "rows_deleted",
+            "files_deleted",
+            "files_failed",
+            "error",
+            "started_at",
+            "updated_at",
+            "finished_at",
+        ]
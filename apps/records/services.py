@@ -1,24 +1,51 @@
-from .models import Record, RecordActivityUser
-from django.db.models import Count
+from .models import Record, RecordActivityUser, RecordsState
+from .spatial import filter_bbox, grid_cell
+from .clusters import record_clusters
+from django.db import IntegrityError, transaction
+from django.db.models import F, OuterRef, Subquery, Count, Value
+from django.db.models.functions import Coalesce
 
 
-def get_all_records():
-    records = list(Record.objects.all())
-    counts_qs = (
-        RecordActivityUser.objects.filter(like_status=True)
-        .values("record_id")
-        .annotate(count=Count("id"))
+def filter_records(record_types=None, bbox=None):
+    records = Record.objects.order_by("id")
+
+    if record_types:
+        records = records.filter(type__in=record_types)
+    if bbox is not None:
+        records = filter_bbox(records, bbox)
+    return records
+
+
+def get_user_likes(user_id):
+    return RecordActivityUser.objects.filter(user_id=user_id, like_status=True)
+
+
+def get_liked_record_ids(user_id, record_ids):
+    # Only the records being shown are looked up, so a page costs the same no
+    # matter how many records the user has liked.
+    return set(
+        get_user_likes(user_id)
+        .filter(record_id__in=record_ids)
+        .values_list("record_id", flat=True)
     )
-    counts = {row["record_id"]: row["count"] for row in counts_qs}
 
+
+def get_all_records(records=None, user_id=None):
+    records = list(Record.objects.all() if records is None else records)
+
+    liked_ids = (
+        get_liked_record_ids(user_id, [r.id for r in records])
+        if user_id is not None and records
+        else set()
+    )
     for r in records:
-        r.likes_count = counts.get(r.id, 0)
-        r.liked_by_user = False
+        r.liked_by_user = r.id in liked_ids
     return records
 
 
 def create_record(data):
-    record = Record.objects.create(**data)
+    record = Record.objects.create(**data, **grid_cell(data["x"], data["y"]))
+    record_clusters.add(record)
     return record
 
 
@@ -28,11 +55,6 @@ def get_record_by_id(record_id, user_id=None):
     except Record.DoesNotExist:
         return None
 
-    count = RecordActivityUser.objects.filter(
-        record_id=record_id, like_status=True
-    ).count()
-    record.likes_count = count
-
     if user_id is not None:
         exists = RecordActivityUser.objects.filter(
             record_id=record_id, user_id=user_id, like_status=True
@@ -44,32 +66,104 @@ def get_record_by_id(record_id, user_id=None):
     return record
 
 
+def get_likes_count(record_id):
+    return (
+        Record.objects.filter(id=record_id)
+        .values_list("likes_count", flat=True)
+        .first()
+        or 0
+    )
+
+
+def change_likes_count(record_id, delta):
+    return Record.objects.filter(id=record_id).update(
+        likes_count=F("likes_count") + delta
+    )
+
+
 def like_record(user_id, record_id):
+    # The insert goes first: a locking read of a row that does not exist yet
+    # takes an InnoDB gap lock, and two such likes then deadlock on their
+    # inserts. A like that already exists lands on the unique key instead.
     try:
-        Record.objects.get(id=record_id)
-    except Record.DoesNotExist:
-        return None
-
-    RecordActivityUser.objects.update_or_create(
-        user_id=user_id,
-        record_id=record_id,
-        defaults={"like_status": True},
+        with transaction.atomic():
+            RecordActivityUser.objects.create(
+                user_id=user_id, record_id=record_id, like_status=True
+            )
+
+            if not change_likes_count(record_id, 1):
+                transaction.set_rollback(True)
+                return None
+
+    except IntegrityError:
+        with transaction.atomic():
+            flipped = RecordActivityUser.objects.filter(
+                user_id=user_id, record_id=record_id, like_status=False
+            ).update(like_status=True)
+
+            if flipped:
+                change_likes_count(record_id, 1)
+
+    # No row here means the insert hit the record foreign key.
+    likes_count = (
+        Record.objects.filter(id=record_id).values_list("likes_count", flat=True).first()
     )
+    if likes_count is None:
+        return None
 
-    likes_count = RecordActivityUser.objects.filter(
-        record_id=record_id, like_status=True
-    ).count()
     return {"likes_count": likes_count, "liked_by_user": True}
 
 
 def unlike_record(user_id, record_id):
-    RecordActivityUser.objects.filter(user_id=user_id, record_id=record_id).delete()
-    likes_count = RecordActivityUser.objects.filter(
-        record_id=record_id, like_status=True
-    ).count()
-    return {"likes_count": likes_count, "liked_by_user": False}
+    with transaction.atomic():
+        activity = (
+            RecordActivityUser.objects.select_for_update()
+            .filter(user_id=user_id, record_id=record_id)
+            .first()
+        )
+
+        if activity is not None:
+            RecordActivityUser.objects.filter(id=activity.id).delete()
+
+            if activity.like_status:
+                change_likes_count(record_id, -1)
+
+    return {"likes_count": get_likes_count(record_id), "liked_by_user": False}
+
+
+def reconcile_likes_count():
+    likes = Coalesce(
+        Subquery(
+            RecordActivityUser.objects.filter(record_id=OuterRef("id"), like_status=True)
+            .values("record_id")
+            .annotate(count=Count("id"))
+            .values("count")
+        ),
+        Value(0),
+    )
+
+    return Record.objects.exclude(likes_count=likes).update(likes_count=likes)
+
+
+def get_erase_generation():
+    return (
+        RecordsState.objects.filter(id=1)
+        .values_list("erase_generation", flat=True)
+        .first()
+        or 0
+    )
+
+
+def bump_erase_generation():
+    # Anything that removes or rewrites existing records breaks snapshot diff chains.
+    RecordsState.objects.filter(id=1).update(erase_generation=F("erase_generation") + 1)
 
 
 def erase_all_records():
-    RecordActivityUser.objects.all().delete()
-    Record.objects.all().delete()
+    # One transaction, so a snapshot token sees either the old generation with
+    # the old rows or the new generation with none of them.
+    with transaction.atomic():
+        bump_erase_generation()
+        RecordActivityUser.objects.all().delete()
+        Record.objects.all().delete()
+    record_clusters.invalidate()
@@ -0,0 +1,49 @@
+import math
+
+
+# Must match the FLOOR(x * 100) backfill in liquibase 00000005_records/00000002.
+GRID_CELLS_PER_UNIT = 100
+MAX_GRID_COLUMNS = 64
+
+
+def grid_cell(x, y):
+    return {
+        "grid_x": math.floor(x * GRID_CELLS_PER_UNIT),
+        "grid_y": math.floor(y * GRID_CELLS_PER_UNIT),
+    }
+
+
+def parse_bbox(value):
+    try:
+        min_x, min_y, max_x, max_y = (float(part) for part in value.split(","))
+    except (AttributeError, ValueError):
+        raise ValueError("bbox must be minx,miny,maxx,maxy")
+
+    if not all(map(math.isfinite, (min_x, min_y, max_x, max_y))):
+        raise ValueError("bbox must be finite numbers")
+
+    if min_x > max_x or min_y > max_y:
+        raise ValueError("bbox min must not exceed max")
+
+    return min_x, min_y, max_x, max_y
+
+
+def filter_bbox(queryset, bbox):
+    min_x, min_y, max_x, max_y = bbox
+    low = grid_cell(min_x, min_y)
+    high = grid_cell(max_x, max_y)
+
+    # Narrow to grid cells first so the (grid_x, grid_y) index drives the scan,
+    # then trim the cell edges with the exact coordinates.
+    if high["grid_x"] - low["grid_x"] < MAX_GRID_COLUMNS:
+        queryset = queryset.filter(
+            grid_x__in=range(low["grid_x"], high["grid_x"] + 1)
+        )
+    else:
+        queryset = queryset.filter(grid_x__range=(low["grid_x"], high["grid_x"]))
+
+    return queryset.filter(
+        grid_y__range=(low["grid_y"], high["grid_y"]),
+        x__range=(min_x, max_x),
+        y__range=(min_y, max_y),
+    )
@@ -1,20 +1,28 @@
 from django.urls import path
 from .views import (
     RecordListView,
+    RecordClusterView,
     RecordCreateView,
     RecordDetailView,
     RecordEraseView,
+    RecordEraseStatusView,
     LikeRecordView,
     UnlikeRecordView,
 )
-from django.conf import settings
-from django.conf.urls.static import static
+from .media import MediaView
 
 urlpatterns = [
     path("all", RecordListView.as_view(), name="records-all"),
+    path("clusters", RecordClusterView.as_view(), name="records-clusters"),
     path("create", RecordCreateView.as_view(), name="records-create"),
     path("<int:record_id>", RecordDetailView.as_view(), name="records-detail"),
     path("erase", RecordEraseView.as_view(), name="records-erase"),
+    path(
+        "erase/<int:job_id>",
+        RecordEraseStatusView.as_view(),
+        name="records-erase-status",
+    ),
     path("<int:record_id>/like/", LikeRecordView.as_view(), name="records-like"),
     path("<int:record_id>/unlike/", UnlikeRecordView.as_view(), name="records-unlike"),
-] + static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+    path("media/<str:name>", MediaView.as_view(), name="records-media"),
+]
@@ -1,30 +1,122 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from .serializers import RecordSerializer
+from .serializers import EraseJobSerializer, RecordSerializer
+from .spatial import parse_bbox
+from .clusters import MAX_ZOOM, record_clusters
+from .images import InvalidImage, store_image
+from .derivatives import schedule_derivatives
+from .erase import get_erase_job, start_erase_job
 from .services import (
+    filter_records,
     get_all_records,
     create_record,
     get_record_by_id,
-    erase_all_records,
     like_record,
     unlike_record,
 )
-import os
-import uuid
 from django.conf import settings
 import jwt
-from apps.entry_password.services import save_new_entry_password
-import requests
+from api.pagination import KeysetPagination
+from apps.authentific.revocation import token_revocations
+
+
+def get_optional_user_id(request):
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return None
+
+    token = auth_header.split(" ")[1]
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except Exception:
+        return None
+
+    return payload.get("id") or payload.get("user_id") or payload.get("sub")
 
 
 class RecordListView(APIView):
+    pagination_class = KeysetPagination
+
     def get(self, request):
-        records = get_all_records()
+        record_types = [
+            record_type
+            for value in request.query_params.getlist("type")
+            for record_type in value.split(",")
+            if record_type
+        ]
+
+        bbox = None
+        if "bbox" in request.query_params:
+            try:
+                bbox = parse_bbox(request.query_params["bbox"])
+            except ValueError as e:
+                return Response(
+                    {"status": "ERROR", "notification": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        records = filter_records(record_types, bbox=bbox)
+
+        # Every listing is paged, so a bare request gets the first default_limit
+        # records and a cursor instead of the whole table.
+        paginator = self.pagination_class()
+        records = paginator.paginate_queryset(records, request, view=self)
+
+        records = get_all_records(records, user_id=get_optional_user_id(request))
         serializer = RecordSerializer(records, many=True)
 
         return Response(
-            {"status": "OK", "notification": "All records", "data": serializer.data},
+            {
+                "status": "OK",
+                "notification": "All records",
+                "data": serializer.data,
+                "next": paginator.get_next_cursor(),
+            },
+            status=status.HTTP_200_OK,
+        )
+
+
+class RecordClusterView(APIView):
+    def get(self, request):
+        try:
+            zoom = int(request.query_params.get("zoom", ""))
+        except ValueError:
+            zoom = None
+
+        if zoom is None or not 0 <= zoom <= MAX_ZOOM:
+            return Response(
+                {
+                    "status": "ERROR",
+                    "notification": f"zoom must be an integer from 0 to {MAX_ZOOM}",
+                },
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        bbox = None
+        if "bbox" in request.query_params:
+            try:
+                bbox = parse_bbox(request.query_params["bbox"])
+            except ValueError as e:
+                return Response(
+                    {"status": "ERROR", "notification": str(e)},
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+
+        try:
+            clusters = record_clusters.clusters(zoom, bbox=bbox)
+        except ValueError as e:
+            return Response(
+                {"status": "ERROR", "notification": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        return Response(
+            {
+                "status": "OK",
+                "notification": "Record clusters",
+                "data": clusters,
+            },
             status=status.HTTP_200_OK,
         )
 
@@ -48,26 +140,28 @@ class RecordCreateView(APIView):
                 {"status": "ERROR", "notification": "Image is required"},
                 status=status.HTTP_400_BAD_REQUEST,
             )
-        image_dir = os.path.join(settings.BASE_DIR, "shared", "images")
-        os.makedirs(image_dir, exist_ok=True)
-
-        ext = os.path.splitext(img.name)[1]
-        unique_name = f"{uuid.uuid4().hex}{ext}"
-        image_path = os.path.join(image_dir, unique_name)
-
-        with open(image_path, "wb+") as dest:
-            for chunk in img.chunks():
-                dest.write(chunk)
+        try:
+            image = store_image(img)
+        except InvalidImage as e:
+            return Response(
+                {"status": "ERROR", "notification": str(e)},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
 
         record_data = serializer.validated_data
         record_data["img_path"] = request.build_absolute_uri(
-            f"{settings.MEDIA_URL}{unique_name}"
+            f"{settings.MEDIA_URL}{image['name']}"
         )
+        record_data["img_hash"] = image["sha256"]
+        record_data["img_size"] = image["size"]
+        record_data["img_width"] = image["width"]
+        record_data["img_height"] = image["height"]
 
         record_data["description"] = record_data.get("description") or "No description"
         record_data["additional_info"] = record_data.get("additional_info") or "N/A"
 
         record = create_record(record_data)
+        schedule_derivatives(image["name"])
 
         return Response(
             {
@@ -81,18 +175,7 @@ class RecordCreateView(APIView):
 
 class RecordDetailView(APIView):
     def get(self, request, record_id):
-        user_id = None
-        auth_header = request.headers.get("Authorization", "")
-        if auth_header.startswith("Bearer "):
-            token = auth_header.split(" ")[1]
-            try:
-                payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-                user_id = (
-                    payload.get("id") or payload.get("user_id") or payload.get("sub")
-                )
-            except Exception:
-                user_id = None
-        record = get_record_by_id(record_id, user_id=user_id)
+        record = get_record_by_id(record_id, user_id=get_optional_user_id(request))
         if not record:
             return Response(
                 {"status": "ERROR", "notification": "Record not found"},
@@ -198,59 +281,82 @@ class UnlikeRecordView(APIView):
         )
 
 
-class RecordEraseView(APIView):
-    def post(self, request):
-        auth_header = request.headers.get("Authorization", "")
-        if not auth_header.startswith("Bearer "):
-            return Response(
-                {"status": "ERROR", "notification": "Missing or invalid token"},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
+def check_eraser(request):
+    auth_header = request.headers.get("Authorization", "")
+    if not auth_header.startswith("Bearer "):
+        return Response(
+            {"status": "ERROR", "notification": "Missing or invalid token"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
 
-        token = auth_header.split(" ")[1]
+    token = auth_header.split(" ")[1]
 
-        try:
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        except jwt.ExpiredSignatureError:
-            return Response(
-                {"status": "ERROR", "notification": "Token expired"},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
-        except jwt.InvalidTokenError:
-            return Response(
-                {"status": "ERROR", "notification": "Invalid token"},
-                status=status.HTTP_401_UNAUTHORIZED,
-            )
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except jwt.ExpiredSignatureError:
+        return Response(
+            {"status": "ERROR", "notification": "Token expired"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
+    except jwt.InvalidTokenError:
+        return Response(
+            {"status": "ERROR", "notification": "Invalid token"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
 
-        role = payload.get("role")
+    if token_revocations.is_revoked(payload):
+        return Response(
+            {"status": "ERROR", "notification": "Token revoked"},
+            status=status.HTTP_401_UNAUTHORIZED,
+        )
 
-        if role not in {"GoldMason", "Architect"}:
-            return Response(
-                {"status": "ERROR", "notification": "Unauthorized"},
-                status=status.HTTP_403_FORBIDDEN,
-            )
+    role = payload.get("role")
 
-        erase_all_records()
+    if role not in {"GoldMason", "Architect"}:
+        return Response(
+            {"status": "ERROR", "notification": "Unauthorized"},
+            status=status.HTTP_403_FORBIDDEN,
+        )
 
-        image_dir = os.path.join(settings.BASE_DIR, "shared", "images")
-        if os.path.exists(image_dir):
-            for filename in os.listdir(image_dir):
-                file_path = os.path.join(image_dir, filename)
-                try:
-                    if os.path.isfile(file_path):
-                        os.remove(file_path)
-                except Exception as e:
-                    print(f"Failed to delete {file_path}: {e}")
+    return None
 
-        else:
-            print(f"Image directory not found: {image_dir}")
 
-        try:
-            save_new_entry_password()
-        except Exception as e:
-            print("Trigger failed:", e)
+class RecordEraseView(APIView):
+    def post(self, request):
+        error = check_eraser(request)
+        if error:
+            return error
+
+        job = start_erase_job()
 
         return Response(
-            {"status": "OK", "notification": "All records erased."},
+            {
+                "status": "OK",
+                "notification": "Erase of all records started.",
+                "data": EraseJobSerializer(job).data,
+            },
+            status=status.HTTP_202_ACCEPTED,
+        )
+
+
+class RecordEraseStatusView(APIView):
+    def get(self, request, job_id):
+        error = check_eraser(request)
+        if error:
+            return error
+
+        job = get_erase_job(job_id)
+        if not job:
+            return Response(
+                {"status": "ERROR", "notification": "Erase job not found"},
+                status=status.HTTP_404_NOT_FOUND,
+            )
+
+        return Response(
+            {
+                "status": "OK",
+                "notification": "Erase job status",
+                "data": EraseJobSerializer(job).data,
+            },
             status=status.HTTP_200_OK,
         )
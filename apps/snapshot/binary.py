@@ -0,0 +1,160 @@
+import json
+import struct
+import zlib
+
+
+# Layout, all little-endian:
+#   header: MAGIC, u16 version, u32 meta length, meta JSON, u32 crc32
+#   blocks: u32 rows (0 ends the stream), columns, u32 crc32 of the block
+# Columns per block: i64 id[], f64 x[], f64 y[], the type dictionary and u16
+# codes, then every text column as u32 lengths[] followed by UTF-8 bytes.
+MAGIC = b"RSNP"
+VERSION = 1
+CONTENT_TYPE = "application/vnd.records-snapshot"
+TEXT_COLUMNS = ["name", "description", "img_path", "additional_info"]
+MAX_BLOCK_ROWS = 1 << 20
+
+U16 = struct.Struct("<H")
+U32 = struct.Struct("<I")
+
+
+class BinarySnapshotError(ValueError):
+    pass
+
+
+def _pack_strings(values):
+    encoded = [value.encode() for value in values]
+    return (
+        struct.pack(f"<{len(encoded)}I", *map(len, encoded)) + b"".join(encoded)
+    )
+
+
+def encode_block(rows):
+    count = len(rows)
+    types = list(dict.fromkeys(row["type"] for row in rows))
+    codes = {record_type: code for code, record_type in enumerate(types)}
+
+    parts = [
+        U32.pack(count),
+        struct.pack(f"<{count}q", *(row["id"] for row in rows)),
+        struct.pack(f"<{count}d", *(row["x"] for row in rows)),
+        struct.pack(f"<{count}d", *(row["y"] for row in rows)),
+        U16.pack(len(types)),
+        _pack_strings(types),
+        struct.pack(f"<{count}H", *(codes[row["type"]] for row in rows)),
+    ]
+    parts.extend(_pack_strings(row[column] for row in rows) for column in TEXT_COLUMNS)
+
+    block = b"".join(parts)
+    return block + U32.pack(zlib.crc32(block))
+
+
+def encode_end():
+    end = U32.pack(0)
+    return end + U32.pack(zlib.crc32(end))
+
+
+def encode_header(meta=None):
+    payload = json.dumps(meta or {}).encode()
+    header = MAGIC + U16.pack(VERSION) + U32.pack(len(payload)) + payload
+    return header + U32.pack(zlib.crc32(header))
+
+
+def encode_records(chunks, meta=None):
+    yield encode_header(meta)
+    for chunk in chunks:
+        if chunk:
+            yield encode_block(chunk)
+    yield encode_end()
+
+
+class _Reader:
+    def __init__(self, stream):
+        self.stream = stream
+        self.crc = 0
+
+    def read_raw(self, size):
+        data = b""
+        while len(data) < size:
+            part = self.stream.read(size - len(data))
+            if not part:
+                raise BinarySnapshotError("Unexpected end of binary snapshot")
+            data += part
+        return data
+
+    def read(self, size):
+        data = self.read_raw(size)
+        self.crc = zlib.crc32(data, self.crc)
+        return data
+
+    def unpack(self, fmt, count):
+        item = struct.calcsize(fmt)
+        return struct.unpack(f"<{count}{fmt}", self.read(item * count))
+
+    def strings(self, count):
+        lengths = self.unpack("I", count)
+        data = self.read(sum(lengths))
+        values, offset = [], 0
+        for length in lengths:
+            values.append(data[offset:offset + length].decode())
+            offset += length
+        return values
+
+    def check(self, what):
+        (stored,) = U32.unpack(self.read_raw(U32.size))
+        if stored != self.crc:
+            raise BinarySnapshotError(f"Checksum mismatch in {what}")
+        self.crc = 0
+
+
+def decode_header(reader):
+    if reader.read(len(MAGIC)) != MAGIC:
+        raise BinarySnapshotError("Not a binary records snapshot")
+
+    (version,) = reader.unpack("H", 1)
+    if version != VERSION:
+        raise BinarySnapshotError(f"Unsupported binary snapshot version {version}")
+
+    (length,) = reader.unpack("I", 1)
+    payload = reader.read(length)
+    reader.check("header")
+
+    return json.loads(payload)
+
+
+def decode_records(stream):
+    reader = _Reader(stream)
+    meta = decode_header(reader)
+    if meta:
+        yield {"snapshot": meta}
+
+    block = 0
+    while True:
+        (count,) = reader.unpack("I", 1)
+        if count == 0:
+            reader.check(f"block {block}")
+            return
+        if count > MAX_BLOCK_ROWS:
+            raise BinarySnapshotError(f"Block {block} claims {count} rows")
+
+        ids = reader.unpack("q", count)
+        xs = reader.unpack("d", count)
+        ys = reader.unpack("d", count)
+        (type_count,) = reader.unpack("H", 1)
+        types = reader.strings(type_count)
+        codes = reader.unpack("H", count)
+        texts = {column: reader.strings(count) for column in TEXT_COLUMNS}
+
+        # Rows are only handed out once the whole block checks out.
+        reader.check(f"block {block}")
+
+        if max(codes) >= len(types):
+            raise BinarySnapshotError(f"Unknown type code in block {block}")
+
+        for i in range(count):
+            row = {"id": ids[i], "x": xs[i], "y": ys[i], "type": types[codes[i]]}
+            for column in TEXT_COLUMNS:
+                row[column] = texts[column][i]
+            yield row
+
+        block += 1
@@ -0,0 +1,92 @@
+import gzip
+import io
+import json
+import random
+import time
+from django.core.management.base import BaseCommand
+from apps.snapshot import binary
+from apps.snapshot.services import (
+    encode_json_array,
+    encode_ndjson,
+    iter_batches,
+    iter_binary,
+    iter_json_array,
+    iter_ndjson,
+)
+
+
+TYPES = ["UFO", "Ghost", "Anomaly", "Portal", "Cryptid"]
+
+
+def make_rows(count, seed):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i,
+            "name": f"Record {i}",
+            "x": rng.uniform(44.0, 52.0),
+            "y": rng.uniform(22.0, 40.0),
+            "type": rng.choice(TYPES),
+            "description": "Seen near the old mill",
+            "img_path": f"http://localhost/media/{rng.getrandbits(256):064x}.png",
+            "additional_info": "N/A",
+        }
+        for i in range(1, count + 1)
+    ]
+
+
+class Command(BaseCommand):
+    help = "Compares size and speed of the JSON, NDJSON and binary snapshot formats"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--rows", type=int, default=100_000)
+        parser.add_argument("--chunk-size", type=int, default=1000)
+        parser.add_argument("--seed", type=int, default=1)
+
+    def handle(self, *args, **options):
+        rows = make_rows(options["rows"], options["seed"])
+        chunks = list(iter_batches(rows, options["chunk_size"]))
+
+        formats = [
+            (
+                "json (legacy, indented)",
+                lambda: [json.dumps(rows, indent=2, ensure_ascii=False).encode()],
+                lambda data: json.loads(data),
+            ),
+            (
+                "json (streamed array)",
+                lambda: encode_json_array(chunks),
+                lambda data: list(iter_json_array(io.BytesIO(data))),
+            ),
+            (
+                "ndjson",
+                lambda: encode_ndjson(chunks),
+                lambda data: list(iter_ndjson(io.BytesIO(data))),
+            ),
+            (
+                "binary",
+                lambda: binary.encode_records(chunks),
+                lambda data: list(iter_binary(io.BytesIO(data))),
+            ),
+        ]
+
+        self.stdout.write(
+            f"{'format':<26}{'bytes':>14}{'gzip bytes':>14}{'encode ms':>12}{'decode ms':>12}"
+        )
+
+        for name, encode, decode in formats:
+            started = time.perf_counter()
+            data = b"".join(encode())
+            encode_ms = (time.perf_counter() - started) * 1000
+
+            started = time.perf_counter()
+            decoded = decode(data)
+            decode_ms = (time.perf_counter() - started) * 1000
+
+            if len(decoded) != len(rows):
+                self.stderr.write(f"{name}: decoded {len(decoded)} of {len(rows)} rows")
+
+            self.stdout.write(
+                f"{name:<26}{len(data):>14,}{len(gzip.compress(data, 6)):>14,}"
+                f"{encode_ms:>12.1f}{decode_ms:>12.1f}"
+            )
@@ -1,5 +1,374 @@
+import base64
+import binascii
+import codecs
+import json
+import zlib
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from rest_framework.exceptions import ValidationError
+from apps.records.clusters import record_clusters
+from apps.records.models import Record as StoredRecord
+from apps.records.services import (
+    bump_erase_generation,
+    erase_all_records,
+    get_erase_generation,
+)
+from apps.records.spatial import grid_cell
+from . import binary
 from .models import Record
+from .serializers import RecordSerializer
+
+
+EXPORT_FIELDS = [field.attname for field in Record._meta.concrete_fields]
+RESTORE_UPDATE_FIELDS = [field for field in EXPORT_FIELDS if field != "id"] + ["grid_x", "grid_y"]
 
 
 def get_all_records():
     return Record.objects.all()
+
+
+class InvalidSnapshot(ValueError):
+    pass
+
+
+def make_token(generation, high_water):
+    raw = f"{generation}:{high_water}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def parse_token(token):
+    try:
+        padding = "=" * (-len(token) % 4)
+        generation, high_water = base64.urlsafe_b64decode(token + padding).decode().split(":")
+        return int(generation), int(high_water)
+    except (binascii.Error, UnicodeDecodeError, ValueError):
+        raise InvalidSnapshot("Invalid snapshot token")
+
+
+def get_watermark():
+    # Generation first: an erase landing in between then yields a token that
+    # is already stale instead of one that silently skips the erase.
+    generation = get_erase_generation()
+    high_water = Record.objects.order_by("-id").values_list("id", flat=True).first() or 0
+    return generation, high_water
+
+
+def iter_record_chunks(chunk_size=None, since_id=0, until_id=None):
+    chunk_size = chunk_size or getattr(settings, "SNAPSHOT_CHUNK_SIZE", 1000)
+    last_id = since_id
+
+    records = Record.objects.all()
+    if until_id is not None:
+        records = records.filter(id__lte=until_id)
+
+    # Keyset chunks keep memory flat on every backend, including MySQL where
+    # iterator() still buffers the whole result set client-side.
+    while True:
+        chunk = list(
+            records.filter(id__gt=last_id)
+            .order_by("id")
+            .values(*EXPORT_FIELDS)[:chunk_size]
+        )
+        if not chunk:
+            return
+
+        yield chunk
+        last_id = chunk[-1]["id"]
+
+
+def encode_ndjson(chunks, header=None):
+    # The header line lets restore check that concatenated diffs form a chain.
+    if header is not None:
+        yield (json.dumps({"snapshot": header}) + "\n").encode()
+
+    for chunk in chunks:
+        yield "".join(
+            json.dumps(row, ensure_ascii=False) + "\n" for row in chunk
+        ).encode()
+
+
+def encode_json_array(chunks):
+    separator = "[\n"
+    for chunk in chunks:
+        yield "".join(
+            (separator if i == 0 else ",\n") + json.dumps(row, ensure_ascii=False)
+            for i, row in enumerate(chunk)
+        ).encode()
+        separator = ",\n"
+
+    yield b"[]\n" if separator == "[\n" else b"\n]\n"
+
+
+def stream_records_ndjson(chunk_size=None, since_id=0, until_id=None, header=None):
+    return encode_ndjson(iter_record_chunks(chunk_size, since_id, until_id), header)
+
+
+def stream_records_json(chunk_size=None, since_id=0, until_id=None, header=None):
+    return encode_json_array(iter_record_chunks(chunk_size, since_id, until_id))
+
+
+def stream_records_binary(chunk_size=None, since_id=0, until_id=None, header=None):
+    return binary.encode_records(
+        iter_record_chunks(chunk_size, since_id, until_id), meta=header
+    )
+
+
+def gzip_stream(chunks):
+    compressor = zlib.compressobj(wbits=31)
+
+    for chunk in chunks:
+        # Sync flush so every chunk reaches the client as soon as it is produced.
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+
+    yield compressor.flush()
+
+
+RESTORE_MODES = ("append", "upsert", "replace")
+READ_SIZE = 64 * 1024
+MAX_ERRORS_PER_CHUNK = 20
+WHITESPACE = " \t\r\n"
+
+
+def _iter_text(stream, read_size=READ_SIZE):
+    decoder = codecs.getincrementaldecoder("utf-8")()
+
+    while True:
+        data = stream.read(read_size)
+        text = decoder.decode(data or b"", final=not data)
+        if text:
+            yield text
+        if not data:
+            return
+
+
+def iter_ndjson(stream, read_size=READ_SIZE):
+    buffer = ""
+
+    for text in _iter_text(stream, read_size):
+        buffer += text
+        *lines, buffer = buffer.split("\n")
+        for line in lines:
+            if line.strip():
+                yield _loads(line)
+
+    if buffer.strip():
+        yield _loads(buffer)
+
+
+def _loads(line):
+    try:
+        return json.loads(line)
+    except json.JSONDecodeError as e:
+        raise InvalidSnapshot(f"Invalid JSON: {e}")
+
+
+def iter_json_array(stream, read_size=READ_SIZE):
+    texts = _iter_text(stream, read_size)
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = "", 0, False
+    state = "start"
+
+    def more():
+        nonlocal buffer, pos, eof
+        text = next(texts, None)
+        if text is None:
+            eof = True
+            return False
+        buffer, pos = buffer[pos:] + text, 0
+        return True
+
+    while True:
+        while pos < len(buffer) and buffer[pos] in WHITESPACE:
+            pos += 1
+
+        if pos == len(buffer):
+            if more():
+                continue
+            if state == "end":
+                return
+            raise InvalidSnapshot("Unexpected end of JSON")
+
+        char = buffer[pos]
+
+        if state == "start":
+            if char != "[":
+                raise InvalidSnapshot("Expected a list of records")
+            pos += 1
+            state = "first"
+
+        elif state in ("first", "after") and char == "]":
+            pos += 1
+            state = "end"
+
+        elif state == "after":
+            if char != ",":
+                raise InvalidSnapshot("Expected ',' or ']' between records")
+            pos += 1
+            state = "value"
+
+        elif state == "end":
+            raise InvalidSnapshot("Unexpected data after the list of records")
+
+        else:
+            try:
+                value, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError as e:
+                # The value may just be cut at the read boundary.
+                if not eof and more():
+                    continue
+                raise InvalidSnapshot(f"Invalid JSON: {e}")
+
+            if end == len(buffer) and not eof and more():
+                continue
+
+            pos = end
+            state = "after"
+            yield value
+
+
+def iter_binary(stream):
+    try:
+        yield from binary.decode_records(stream)
+    except (binary.BinarySnapshotError, UnicodeDecodeError, ValueError) as e:
+        raise InvalidSnapshot(str(e))
+
+
+def iter_batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def follow_snapshot_chain(rows, report):
+    for row in rows:
+        if not (isinstance(row, dict) and set(row) == {"snapshot"}):
+            yield row
+            continue
+
+        header = row["snapshot"]
+        base = header.get("base")
+
+        if report["token"] is not None and base != report["token"]:
+            raise InvalidSnapshot(
+                f"Diff chain is broken: expected a diff since {report['token']}, got one since {base}"
+            )
+        report["token"] = header.get("token")
+
+
+def _validate_batch(batch, offset, mode):
+    serializer = RecordSerializer()
+    valid, errors = [], []
+
+    for index, row in enumerate(batch, start=offset):
+        try:
+            data = serializer.run_validation(row)
+        except ValidationError as e:
+            errors.append({"index": index, "errors": e.detail})
+            continue
+
+        record = StoredRecord(**data, **grid_cell(data["x"], data["y"]))
+
+        if mode != "append":
+            record_id = row.get("id")
+            if not isinstance(record_id, int) or isinstance(record_id, bool) or record_id < 1:
+                errors.append({"index": index, "errors": {"id": ["A positive integer id is required."]}})
+                continue
+            record.id = record_id
+
+        valid.append(record)
+
+    return valid, errors
+
+
+def _write_batch(records, mode):
+    if mode == "upsert":
+        # Last occurrence wins when an id repeats inside one batch.
+        records = list({record.id: record for record in records}.values())
+
+        # MySQL has no conflict target: ON DUPLICATE KEY UPDATE matches any
+        # unique key and rejects unique_fields outright.
+        conflict_target = {}
+        if connection.features.supports_update_conflicts_with_target:
+            conflict_target["unique_fields"] = ["id"]
+
+        StoredRecord.objects.bulk_create(
+            records,
+            update_conflicts=True,
+            update_fields=RESTORE_UPDATE_FIELDS,
+            **conflict_target,
+        )
+    else:
+        StoredRecord.objects.bulk_create(records)
+    return len(records)
+
+
+def restore_records(rows, mode="append", chunk_size=None):
+    if mode not in RESTORE_MODES:
+        raise InvalidSnapshot(f"Unknown restore mode, expected one of: {', '.join(RESTORE_MODES)}")
+
+    chunk_size = chunk_size or getattr(settings, "SNAPSHOT_CHUNK_SIZE", 1000)
+    report = {"mode": mode, "received": 0, "written": 0, "failed": 0, "token": None, "chunks": []}
+
+    if mode == "upsert":
+        bump_erase_generation()
+
+    # Replace clears the table only once a chunk has parsed and validated, in
+    # the same transaction as its rows, so an unreadable upload leaves the
+    # existing records alone.
+    erase_pending = mode == "replace"
+
+    try:
+        for number, batch in enumerate(
+            iter_batches(follow_snapshot_chain(rows, report), chunk_size)
+        ):
+            offset = report["received"]
+            report["received"] += len(batch)
+
+            records, errors = _validate_batch(batch, offset, mode)
+            written = 0
+
+            if records:
+                try:
+                    with transaction.atomic():
+                        if erase_pending:
+                            erase_all_records()
+                        written = _write_batch(records, mode)
+                    erase_pending = False
+                except DatabaseError as e:
+                    errors.append({"index": offset, "errors": f"Chunk rejected by the database: {e}"})
+
+            failed = len(batch) - written
+            report["written"] += written
+            report["failed"] += failed
+            report["chunks"].append({
+                "chunk": number,
+                "received": len(batch),
+                "written": written,
+                "failed": failed,
+                "errors": errors[:MAX_ERRORS_PER_CHUNK],
+            })
+
+        # An empty upload replaces the table with nothing.
+        if erase_pending and not report["received"]:
+            erase_all_records()
+            erase_pending = False
+
+    except InvalidSnapshot as e:
+        # Chunks before the bad input are already committed; say how far it got.
+        e.report = report
+        raise
+    finally:
+        # Rewritten chunks commit one by one, so a token taken between them
+        # must not pass for the finished restore.
+        if mode == "upsert" or (mode == "replace" and not erase_pending):
+            bump_erase_generation()
+        record_clusters.invalidate()
+
+    return report
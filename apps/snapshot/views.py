@@ -1,14 +1,43 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from django.http import HttpResponse
+from django.http import HttpResponse, StreamingHttpResponse
 from .models import Record
 from .serializers import RecordSerializer
-from .services import get_all_records
+from .services import (
+    RESTORE_MODES,
+    InvalidSnapshot,
+    get_all_records,
+    get_watermark,
+    gzip_stream,
+    iter_binary,
+    iter_json_array,
+    iter_ndjson,
+    make_token,
+    parse_token,
+    restore_records,
+    stream_records_binary,
+    stream_records_json,
+    stream_records_ndjson,
+)
+from . import binary
+import gzip
 import json
 
+STREAM_FORMATS = {
+    "ndjson": (stream_records_ndjson, "application/x-ndjson", "records_backup.ndjson"),
+    "json": (stream_records_json, "application/json", "records_backup.json"),
+    "binary": (stream_records_binary, binary.CONTENT_TYPE, "records_backup.rsnp"),
+}
+
 class RecordsBackupView(APIView):
     def get(self, request):
+        since = request.query_params.get("since")
+        stream = request.query_params.get("stream") or ("ndjson" if since else None)
+        if stream:
+            return self.stream(request, stream, since)
+
+        token = make_token(*get_watermark())
         records = get_all_records()
 
         if not records.exists():
@@ -22,32 +51,103 @@ class RecordsBackupView(APIView):
 
         response = HttpResponse(json_data, content_type='application/json')
         response['Content-Disposition'] = 'attachment; filename="records_backup.json"'
+        response['X-Snapshot-Token'] = token
         return response
 
+    def stream(self, request, stream, since=None):
+        if stream not in STREAM_FORMATS:
+            return Response(
+                {"error": f"Unknown stream format, expected one of: {', '.join(STREAM_FORMATS)}"},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-class RecordsRestoreView(APIView):
-    def post(self, request):
-        
-        try:
-            data = request.data
-            if not isinstance(data, list):
+        generation, high_water = get_watermark()
+        token = make_token(generation, high_water)
+        since_id = 0
+
+        if since:
+            try:
+                since_generation, since_id = parse_token(since)
+            except InvalidSnapshot as e:
+                return Response({"error": str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+            if since_generation != generation:
                 return Response(
-                    {"error": "Expected a list of records"},
-                    status=status.HTTP_400_BAD_REQUEST
+                    {"error": "Records were erased or rewritten since this token, take a full snapshot"},
+                    status=status.HTTP_409_CONFLICT
                 )
-        except Exception:
+
+        elif not get_all_records().exists():
             return Response(
-                {"error": "Invalid JSON"},
+                {"error": "No records found"},
+                status=status.HTTP_404_NOT_FOUND
+            )
+
+        generate, content_type, filename = STREAM_FORMATS[stream]
+        chunks = generate(
+            since_id=since_id,
+            until_id=high_water,
+            header={"base": since, "token": token},
+        )
+
+        if since:
+            filename = filename.replace("records_backup", "records_diff")
+
+        if request.query_params.get("gzip") in ("1", "true"):
+            chunks = gzip_stream(chunks)
+            content_type = "application/gzip"
+            filename = f"{filename}.gz"
+
+        response = StreamingHttpResponse(chunks, content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="{filename}"'
+        response['X-Snapshot-Token'] = token
+        return response
+
+
+class RecordsRestoreView(APIView):
+    def post(self, request):
+        mode = request.query_params.get("mode", "append")
+        if mode not in RESTORE_MODES:
+            return Response(
+                {"error": f"Unknown restore mode, expected one of: {', '.join(RESTORE_MODES)}"},
                 status=status.HTTP_400_BAD_REQUEST
             )
 
-        
-        serializer = RecordSerializer(data=data, many=True)
-        if serializer.is_valid():
-            serializer.save() 
+        # Read the body as a stream; touching request.data would parse it whole.
+        stream = request.stream
+        if stream is None:
             return Response(
-                {"status": "Records restored successfully", "count": len(data)},
-                status=status.HTTP_201_CREATED
+                {"error": "Expected a list of records"},
+                status=status.HTTP_400_BAD_REQUEST
             )
+
+        if (
+            request.headers.get("Content-Encoding") == "gzip"
+            or request.query_params.get("gzip") in ("1", "true")
+        ):
+            stream = gzip.GzipFile(fileobj=stream, mode="rb")
+
+        if request.content_type.startswith(binary.CONTENT_TYPE):
+            rows = iter_binary(stream)
+        elif request.content_type.startswith("application/x-ndjson"):
+            rows = iter_ndjson(stream)
         else:
-            return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+            rows = iter_json_array(stream)
+
+        try:
+            report = restore_records(rows, mode=mode)
+        except (InvalidSnapshot, OSError, EOFError) as e:
+            return Response(
+                {"error": f"Invalid snapshot: {e}", **getattr(e, "report", {})},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+
+        notification = (
+            "Records restored successfully"
+            if not report["failed"]
+            else "Records restored with failures"
+        )
+        return Response(
+            {"status": notification, "count": report["written"], **report},
+            status=status.HTTP_201_CREATED
+        )
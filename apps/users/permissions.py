@@ -1,55 +1,38 @@
-import jwt
 from rest_framework.exceptions import PermissionDenied
 from rest_framework.permissions import BasePermission
-from django.conf import settings
-from .models import User
 from enums.roles import Role
 
 
+# These run after JWTAuthentication, which has already verified the token and
+# loaded request.user, so no permission check decodes or queries again.
 class IsGoldMason(BasePermission):
     def has_permission(self, request, view):
-        auth_header = request.headers.get("Authorization")
-
-        if not auth_header:
+        if not getattr(request.user, "is_authenticated", False):
             return False
 
-        try:
-            token = auth_header.split(" ")[1]
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            user = User.objects.get(id=payload["id"])
-
-            if user.role != Role.GOLD_MASON.value:
-                raise PermissionDenied("Only GoldMasons can access this endpoint")
-
-            return True
+        if request.user.role != Role.GOLD_MASON.value:
+            raise PermissionDenied("Only GoldMasons can access this endpoint")
 
-        except (jwt.DecodeError, jwt.ExpiredSignatureError, User.DoesNotExist):
-            raise PermissionDenied("Invalid or expired token")
+        return True
 
 
 class IsArchitect(BasePermission):
     def has_permission(self, request, view):
-        auth_header = request.headers.get("Authorization")
-
-        if not auth_header:
+        if not getattr(request.user, "is_authenticated", False):
             return False
 
-        try:
-            token = auth_header.split(" ")[1]
-            payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-            user = User.objects.get(id=payload["id"])
-
-            if user.role != Role.ARCHITECT.value:
-                raise PermissionDenied("Only Architects can access this endpoint")
+        if request.user.role != Role.ARCHITECT.value:
+            raise PermissionDenied("Only Architects can access this endpoint")
 
-            return True
-
-        except (jwt.DecodeError, jwt.ExpiredSignatureError, User.DoesNotExist):
-            raise PermissionDenied("Invalid or expired token")
+        return True
 
 
 class IsGoldMasonOrArchitect(BasePermission):
     def has_permission(self, request, view):
-        return IsGoldMason().has_permission(
-            request, view
-        ) or IsArchitect().has_permission(request, view)
+        if not getattr(request.user, "is_authenticated", False):
+            return False
+
+        if request.user.role not in (Role.GOLD_MASON.value, Role.ARCHITECT.value):
+            raise PermissionDenied("Only GoldMasons or Architects can access this endpoint")
+
+        return True
@@ -0,0 +1,7 @@
+from .role_population import RolePopulationCounter
+
+
+def hot_queries():
+    return [
+        ("users: population of roles", RolePopulationCounter.population_query, []),
+    ]
@@ -0,0 +1,115 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from enums.roles import Role
+
+
+CACHE_KEY = "role_population:{}"
+
+
+class RolePopulationCounter:
+
+    population_query = """
+        SELECT u.role, COUNT(u.id)
+        FROM users u
+        GROUP BY u.role;
+    """
+
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = None
+        self._loaded_at = 0.0
+
+
+    @property
+    def local_ttl(self):
+        return getattr(settings, "ROLE_POPULATION_LOCAL_TTL", 5)
+
+
+    @property
+    def reconcile_interval(self):
+        return getattr(settings, "ROLE_POPULATION_RECONCILE_INTERVAL", 300)
+
+
+    @staticmethod
+    def _keys():
+        return {role.value: CACHE_KEY.format(role.value) for role in Role}
+
+
+    def _store_local(self, counts):
+        with self._lock:
+            self._counts = dict(counts)
+            self._loaded_at = time.monotonic()
+
+
+    def get_counts(self):
+        with self._lock:
+            if self._counts is not None and time.monotonic() - self._loaded_at < self.local_ttl:
+                return dict(self._counts)
+
+        keys = self._keys()
+        cached = cache.get_many(keys.values())
+
+        if len(cached) != len(keys):
+            return self.reconcile()
+
+        counts = {role: cached[key] for role, key in keys.items()}
+        self._store_local(counts)
+
+        return counts
+
+
+    def get(self, role):
+        return self.get_counts().get(role, 0)
+
+
+    def reconcile(self):
+        with connection.cursor() as cursor:
+            cursor.execute(self.population_query)
+            rows = cursor.fetchall()
+
+        counts = {role.value: 0 for role in Role}
+        counts.update({role: count for role, count in rows})
+
+        # Expiry doubles as the periodic reconciliation against the users table.
+        keys = self._keys()
+        cache.set_many(
+            {keys[role]: count for role, count in counts.items() if role in keys},
+            timeout = self.reconcile_interval
+        )
+        self._store_local(counts)
+
+        return counts
+
+
+    def adjust(self, role, delta):
+        if not delta:
+            return
+
+        try:
+            cache.incr(CACHE_KEY.format(role), delta)
+        except ValueError:
+            # Counter expired or was never loaded: the next read reconciles it.
+            pass
+
+        with self._lock:
+            if self._counts is not None:
+                self._counts[role] = self._counts.get(role, 0) + delta
+
+
+    def move(self, old_role, new_role, count = 1):
+        self.adjust(old_role, -count)
+        self.adjust(new_role, count)
+
+
+    def invalidate(self):
+        cache.delete_many(list(self._keys().values()))
+
+        with self._lock:
+            self._counts = None
+
+
+role_population = RolePopulationCounter()
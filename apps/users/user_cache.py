@@ -0,0 +1,46 @@
+from django.conf import settings
+from django.core.cache import cache
+from core.cache import CacheGeneration
+from .models import User
+
+
+CACHE_KEY = "auth_user:{}:{}"
+FIELDS = ("id", "username", "email", "role", "is_inquisitor")
+
+
+class UserCache:
+
+    generation = CacheGeneration("auth_user:generation")
+
+
+    @property
+    def ttl(self):
+        return getattr(settings, "AUTH_USER_CACHE_TTL", 30)
+
+
+    def get(self, user_id):
+        key = CACHE_KEY.format(self.generation.get(), user_id)
+        fields = cache.get(key)
+
+        if fields is None:
+            fields = User.objects.filter(id = user_id).values(*FIELDS).first()
+
+            # Missing users are not cached, so a ban or deletion is never masked.
+            if fields is None:
+                return None
+
+            cache.set(key, fields, timeout = self.ttl)
+
+        return User(**fields)
+
+
+    def invalidate(self, *user_ids):
+        generation = self.generation.get()
+        cache.delete_many([CACHE_KEY.format(generation, user_id) for user_id in user_ids])
+
+
+    def invalidate_all(self):
+        self.generation.bump()
+
+
+user_cache = UserCache()
@@ -11,13 +11,15 @@ from .services import (
     invite_user,
 )
 from .permissions import IsGoldMason, IsGoldMasonOrArchitect
-import requests
+from apps.authentific.authentication import JWTAuthentication
+from apps.mail_outbox.services import enqueue_letter
 import logging
 
 logger = logging.getLogger(__name__)
 
 
 class UsersListView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [IsGoldMason]
 
     def get(self, request):
@@ -38,6 +40,7 @@ class UsersListView(APIView):
 
 
 class UserDetailView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [IsGoldMason]
 
     def get(self, request, user_id):
@@ -71,6 +74,7 @@ class EmailView(APIView):
 
 
 class InviteView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [IsGoldMasonOrArchitect]
 
     def post(self, request):
@@ -83,7 +87,7 @@ class InviteView(APIView):
         result = invite_user(email)
 
         if result["status"] == "success":
-            payload = {
+            letter = {
                 "topic": "Today's post: quick read",
                 "text": (
                     "Hello,\n\nToday's post is available at http://localhost:5173/. "
@@ -94,16 +98,7 @@ class InviteView(APIView):
                 "target_emails": [email],
             }
 
-            try:
-                response = requests.post(
-                    "http://docker_go:8080/send_letter",
-                    json=payload,
-                    timeout=3,
-                )
-                if response.status_code != 200:
-                    logger.error(f"Mailer error: {response.text}")
-            except Exception as e:
-                logger.exception(f"Failed to send mail via Go service: {e}")
+            enqueue_letter(**letter)
 
             return Response(
                 {"message": result["message"]}, status=status.HTTP_201_CREATED
@@ -0,0 +1,10 @@
+from django.apps import AppConfig
+
+
+class VotesConfig(AppConfig):
+    name = "apps.votes"
+
+    def ready(self):
+        from .tally import vote_tally
+
+        vote_tally.check_backend()
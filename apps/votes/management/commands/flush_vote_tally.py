@@ -0,0 +1,29 @@
+import time
+from django.core.management.base import BaseCommand
+from apps.votes.tally import vote_tally
+
+
+class Command(BaseCommand):
+    help = "Writes buffered write-behind ballots of every active vote, optionally on a timer"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--loop", action = "store_true", help = "Keep flushing every interval")
+        parser.add_argument("--interval", type = float, default = None, help = "Seconds between flushes")
+
+    def handle(self, *args, **options):
+        if not vote_tally.enabled:
+            self.stdout.write("VOTE_TALLY_MODE is not write_behind, nothing to flush")
+            return
+
+        interval = options["interval"] or vote_tally.flush_interval
+
+        while True:
+            deltas = vote_tally.flush_active()
+
+            if deltas:
+                self.stdout.write(self.style.SUCCESS(f"Flushed ballots of {len(deltas)} votes"))
+
+            if not options["loop"]:
+                return
+
+            time.sleep(interval)
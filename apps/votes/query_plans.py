@@ -0,0 +1,17 @@
+from django.utils import timezone
+from .services import VoteService, VoteCloseService
+
+
+def hot_queries():
+    return [
+        (
+            "votes: open votes of a user's vote types",
+            VoteService.open_votes_query.format(placeholders = "%s, %s"),
+            [1, "PROMOTE_TO_SILVER", "BAN_USER"],
+        ),
+        (
+            "votes: expired active votes",
+            VoteCloseService.expired_votes_query,
+            [timezone.now(), VoteCloseService().chunk_size],
+        ),
+    ]
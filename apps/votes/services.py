@@ -1,12 +1,56 @@
-from django.db import connection, transaction, OperationalError
+from django.conf import settings
+from django.db import connection, transaction, IntegrityError, OperationalError
 from .models import VoteTypes
 from datetime import datetime, timedelta, date
+import time
 from enums.rules import VoteRules, PromoteRules
-from enums.roles import Role
+from enums.roles import Role, VoteCastResult
+from apps.users.role_population import role_population
+from apps.users.user_cache import user_cache
+from apps.authentific.revocation import token_revocations
+from .tally import vote_tally
+
+
+DUPLICATE_KEY_ERRNO = 1062
+
+
+def is_duplicate_key(error):
+    if error.args and error.args[0] == DUPLICATE_KEY_ERRNO:
+        return True
+
+    # SQLite carries no error code and only names the violated constraint.
+    return "UNIQUE constraint failed" in str(error)
+
+
+def forget_users(user_ids):
+    # Drops cached rows and revokes tokens whose claims no longer hold.
+    user_cache.invalidate(*user_ids)
+    token_revocations.revoke(*user_ids)
 
 
 class VoteService:
 
+    # One grouped pass: every open vote of the user's vote types together with
+    # the number of participants per role, so eligibility is resolved in Python
+    # instead of issuing two COUNT queries per vote.
+    open_votes_query = """
+        SELECT v.id, v.name, v.vote_type, u.role, COUNT(vu.id)
+        FROM votes v
+        LEFT JOIN vote_users mine
+        ON v.id = mine.vote_id
+        AND mine.user_id = %s
+        LEFT JOIN vote_users vu
+        ON v.id = vu.vote_id
+        LEFT JOIN users u
+        ON u.id = vu.user_id
+        WHERE (mine.id IS NULL OR mine.is_voted = FALSE)
+        AND v.is_active = TRUE
+        AND v.vote_type IN ({placeholders})
+        GROUP BY v.id, v.name, v.vote_type, u.role
+        ORDER BY v.id;
+    """
+
+
     def __init__(self, user):
         self.user = user
 
@@ -32,191 +76,229 @@ class VoteService:
 
         placeholders = ','.join(['%s'] * len(vote_types))
 
-        query = f"""
-                SELECT v.id, v.name, v.vote_type
-                FROM votes v
-                LEFT JOIN vote_users vu
-                ON v.id = vu.vote_id
-                AND vu.user_id = %s
-                WHERE (vu.id IS NULL OR vu.is_voted = FALSE)
-                AND v.is_active = TRUE
-                AND v.vote_type IN ({placeholders});
-            """
+        query = self.open_votes_query.format(placeholders = placeholders)
 
         params = [self.user.id] + vote_types
 
         with connection.cursor() as cursor:
             cursor.execute(query, params)
             rows = cursor.fetchall()
-            params.clear()
 
+        if not rows:
+            return []
 
-        votes = []
+        users_by_role = role_population.get_counts()
 
-        for vote in rows:
+        votes = {}
 
-            user_roles = set()
-            for role in PromoteRules.new_rules.get(vote[2]):
-                user_roles.add(role)
+        for vote_id, name, vote_type, role, count in rows:
+            user_roles = PromoteRules.new_rules.get(vote_type, [])
 
-            placeholders = ','.join(['%s'] * len(user_roles))
+            vote = votes.setdefault(vote_id, {
+                'id': vote_id,
+                'name': name,
+                'count_of_all_users': sum(users_by_role.get(r, 0) for r in user_roles),
+                'count_of_voting_users': 0
+            })
 
-            query_total_count = f"""
-                                SELECT COUNT(u.id)
-                                FROM users u
-                                WHERE u.role in ({placeholders});
-                                """
+            if role in user_roles:
+                vote['count_of_voting_users'] += count
 
+        result = []
 
-            with connection.cursor() as cursor:
-                cursor.execute(query_total_count, list(user_roles))
-                count_of_all_users = cursor.fetchall()
+        for vote in votes.values():
+            percent = 0
 
-            query_already_voted = f"""
-                        SELECT COUNT(*)
-                        FROM users u
-                        JOIN vote_users vu
-                        ON u.id = vu.user_id
-                        WHERE u.role in ({placeholders})
-                        AND vu.vote_id = %s;
-            """
+            if vote['count_of_all_users']:
+                percent = int((vote['count_of_voting_users'] / vote['count_of_all_users']) * 100)
 
-            params = list(user_roles) + [vote[0]]
+            result.append({
+                'id': vote['id'],
+                'name': vote['name'],
+                'percent': percent
+            })
 
+        return result
 
-            with connection.cursor() as cursor:
-                cursor.execute(query_already_voted, params)
-                count_of_voting_users = cursor.fetchall()
 
-            votes.append({
-                'id': vote[0],
-                'name': vote[1],
-                'percent' : int((count_of_voting_users[0][0] / count_of_all_users[0][0]) * 100)
-            })
+    @staticmethod
+    def close_votes(date):
+        return VoteCloseService().close_expired(date)
+
 
-        return votes
+
+class VoteCloseService:
+
+    expired_votes_query = """
+        SELECT v.id, v.amount_of_agreed, v.amount_of_disagreed, v.user_in_question_id, v.vote_type
+        FROM votes v
+        WHERE v.date_of_end < %s AND v.is_active = TRUE
+        ORDER BY v.id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED;
+    """
+
+
+    def __init__(self, chunk_size = None):
+        self.chunk_size = chunk_size or getattr(settings, "VOTE_CLOSE_CHUNK_SIZE", 500)
 
 
     @staticmethod
-    def close_votes(date):
+    def is_accepted(count_of_agreed, count_of_disagreed):
+        total = count_of_agreed + count_of_disagreed
 
-        query_to_change = """   
-                    SELECT v.amount_of_agreed, v.amount_of_disagreed, v.user_in_question_id, v.vote_type
-                    FROM votes v
-                    WHERE v.date_of_end < %s AND v.is_active = TRUE;
-                    """
+        return total > 0 and (count_of_agreed / total) > 0.5
 
-        query_to_update = """
-                        UPDATE votes v
-                        SET v.is_active = False
-                        WHERE v.date_of_end < %s;
-                        """
 
-        params = [date]
+    def close_expired(self, date):
 
-        with connection.cursor() as cursor:
-            cursor.execute(query_to_change, params)
-            rows = cursor.fetchall()
-            cursor.execute(query_to_update, params)
+        # Votes are closed in bounded chunks, each in its own transaction, so a
+        # backlog of expired votes never holds row locks for the whole run and a
+        # rerun simply continues with whatever is still active.
+        started = time.monotonic()
 
-        list_of_users_to_promote = [
-            {
-                'count_of_agreed': v[0],
-                'count_of_disagreed': v[1],
-                'user_id' : v[2],
-                'vote_type' : v[3]
-            }
-            for v in rows
-            if v[3] in list(PromoteRules.rules.keys())
+        report = {
+            'chunks': 0,
+            'votes_closed': 0,
+            'users_promoted': 0,
+            'users_banned': 0,
+        }
 
-        ]
+        while True:
+            deltas = {}
 
-        list_of_users_to_ban = [
-            {
-                'count_of_agreed': v[0],
-                'count_of_disagreed': v[1],
-                'user_id': v[2]
-            }
-            for v in rows
-            if v[3] == 'BAN_USER'
-        ]
+            try:
+                with transaction.atomic():
+                    with connection.cursor() as cursor:
+                        cursor.execute(self.expired_votes_query, [date, self.chunk_size])
+                        rows = cursor.fetchall()
+
+                        if not rows:
+                            break
+
+                        vote_ids = [v[0] for v in rows]
+                        placeholders = ','.join(['%s'] * len(vote_ids))
+
+                        # Buffered ballots of these votes are written while they
+                        # are still active, so the final tallies are complete.
+                        if vote_tally.enabled:
+                            deltas = vote_tally.take(vote_ids)
+                            vote_tally.apply(cursor, deltas)
+
+                            rows = [
+                                (
+                                    v[0],
+                                    v[1] + deltas.get(v[0], {}).get('amount_of_agreed', 0),
+                                    v[2] + deltas.get(v[0], {}).get('amount_of_disagreed', 0),
+                                    v[3],
+                                    v[4]
+                                )
+                                for v in rows
+                            ]
 
-        UserPromoteService.promote_user(list_of_users_to_promote)
-        UserBanService.ban_user(list_of_users_to_ban)
+                        cursor.execute(
+                            f"""
+                            UPDATE votes v
+                            SET v.is_active = FALSE
+                            WHERE v.id IN ({placeholders});
+                            """,
+                            vote_ids
+                        )
 
-        return True
 
+                        list_of_users_to_promote = [
+                            {
+                                'user_id': v[3],
+                                'vote_type': v[4]
+                            }
+                            for v in rows
+                            if v[4] in PromoteRules.rules and self.is_accepted(v[1], v[2])
+                        ]
 
+                        list_of_users_to_ban = [
+                            v[3]
+                            for v in rows
+                            if v[4] == 'BAN_USER' and self.is_accepted(v[1], v[2])
+                        ]
 
-class SendVoteService:
+                        promotions = UserPromoteService.apply_promotions(cursor, list_of_users_to_promote)
+                        banned_roles = UserBanService.apply_bans(cursor, list_of_users_to_ban)
 
-    def user_already_voted(self, user_id, vote_id):
-        query = """
-                    SELECT is_voted 
-                    FROM vote_users 
-                    WHERE user_id = %s 
-                    AND vote_id = %s
-                """
+            except Exception:
+                vote_tally.restore(deltas)
+                raise
 
-        params = [user_id, vote_id]
-        with connection.cursor() as cursor:
-            cursor.execute(query, params)
-            rows = cursor.fetchall()
+            UserPromoteService.update_role_population(promotions)
+            UserBanService.update_role_population(banned_roles)
 
-        if rows is None or len(rows) == 0:
-            return False
+            report['chunks'] += 1
+            report['votes_closed'] += len(rows)
+            report['users_promoted'] += len(list_of_users_to_promote)
+            report['users_banned'] += sum(banned_roles.values())
 
-        else:
-            return True
+            if len(rows) < self.chunk_size:
+                break
 
+        report['elapsed_ms'] = round((time.monotonic() - started) * 1000, 2)
 
-    def commit_choice(self, user_id, vote_id, choice):
+        return report
 
-        if choice == "AGREE":
-            query = """
-            
-                    START TRANSACTION;
-    
-                    INSERT INTO vote_users(user_id, vote_id, is_voted) 
-                    VALUES (%s, %s, TRUE);
-                                            
-                    UPDATE votes v
-                    SET v.amount_of_agreed = v.amount_of_agreed + 1
-                    WHERE v.id = %s;
-                    
-                    COMMIT;
-                    """
 
-            params = [user_id, vote_id, vote_id]
 
-            with connection.cursor() as cursor:
-                cursor.execute(query, params)
+class SendVoteService:
 
-            return True
+    tally_columns = {
+        "AGREE": "amount_of_agreed",
+        "DISAGREE": "amount_of_disagreed"
+    }
+
+
+    def cast_vote(self, user_id, vote_id, choice):
 
+        column = self.tally_columns.get(choice)
 
-        elif choice == "DISAGREE":
-            query = """
-                    START TRANSACTION;
-        
+        if column is None:
+            return VoteCastResult.INVALID_CHOICE
+
+        # The unique (user_id, vote_id) key on vote_users is the duplicate check:
+        # a second ballot fails the INSERT and rolls the tally update back with it.
+        query_to_insert = """
                     INSERT INTO vote_users(user_id, vote_id, is_voted)
-                    VALUES (%s, %s, TRUE);
-        
-                    UPDATE votes v
-                    SET v.amount_of_disagreed = v.amount_of_disagreed + 1
-                    WHERE v.id = %s;
-        
-                    COMMIT;
+                    SELECT %s, v.id, TRUE
+                    FROM votes v
+                    WHERE v.id = %s
+                    AND v.is_active = TRUE;
                     """
 
-            params = [user_id, vote_id, vote_id]
+        query_to_update = f"""
+                    UPDATE votes
+                    SET {column} = {column} + 1
+                    WHERE id = %s;
+                    """
 
-            with connection.cursor() as cursor:
-                cursor.execute(query, params)
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(query_to_insert, [user_id, vote_id])
 
-            return True
+                    if cursor.rowcount == 0:
+                        return VoteCastResult.VOTE_CLOSED
 
-        return False
+                    if not vote_tally.enabled:
+                        cursor.execute(query_to_update, [vote_id])
+
+        except IntegrityError as e:
+            if is_duplicate_key(e):
+                return VoteCastResult.ALREADY_VOTED
+
+            # Any other constraint, such as the user foreign key, means the
+            # ballot points at a row that does not exist.
+            return VoteCastResult.NOT_FOUND
+
+        if vote_tally.enabled:
+            vote_tally.record(vote_id, column)
+
+        return VoteCastResult.OK
 
 
 
@@ -367,37 +449,76 @@ class UserPromoteService:
     @staticmethod
     def promote_user(values):
 
-        for value in values:
-            count_of_agreed = value.get('count_of_agreed')
-            count_of_disagreed = value.get('count_of_disagreed')
-
-            if (count_of_agreed / (count_of_disagreed + count_of_agreed)) > 0.5:
-                query = """
-                    START TRANSACTION;
-                        
-                    UPDATE users u
-                    SET u.role = %s 
-                    WHERE u.id = %s;
-                        
-                    UPDATE users_promotions up
-                    SET up.date_of_last_promotion = %s, 
-                    up.is_promote_requested = False
-                    WHERE up.user_id = %s;
-                        
-                    COMMIT;
-                    """
+        list_of_users_to_promote = [
+            value
+            for value in values
+            if VoteCloseService.is_accepted(value.get('count_of_agreed'), value.get('count_of_disagreed'))
+        ]
 
-                date_of_end = datetime.now() + timedelta(days = 42)
+        if not list_of_users_to_promote:
+            return True
 
-                new_user_role = PromoteRules.rules.get(value.get('vote_type')).value
-                params = [new_user_role, value.get('user_id'), date_of_end, value.get('user_id')]
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                promotions = UserPromoteService.apply_promotions(cursor, list_of_users_to_promote)
 
-                with connection.cursor() as cursor:
-                    cursor.execute(query, params)
+        UserPromoteService.update_role_population(promotions)
 
         return True
 
 
+    @staticmethod
+    def apply_promotions(cursor, values):
+
+        users_by_vote_type = {}
+
+        for value in values:
+            users_by_vote_type.setdefault(value.get('vote_type'), []).append(value.get('user_id'))
+
+        if not users_by_vote_type:
+            return {}
+
+        for vote_type, user_ids in users_by_vote_type.items():
+            placeholders = ','.join(['%s'] * len(user_ids))
+
+            cursor.execute(
+                f"""
+                UPDATE users u
+                SET u.role = %s
+                WHERE u.id IN ({placeholders});
+                """,
+                [PromoteRules.rules.get(vote_type).value] + user_ids
+            )
+
+        all_user_ids = [user_id for user_ids in users_by_vote_type.values() for user_id in user_ids]
+        placeholders = ','.join(['%s'] * len(all_user_ids))
+
+        transaction.on_commit(lambda: forget_users(all_user_ids))
+        date_of_end = datetime.now() + timedelta(days = 42)
+
+        cursor.execute(
+            f"""
+            UPDATE users_promotions up
+            SET up.date_of_last_promotion = %s,
+            up.is_promote_requested = FALSE
+            WHERE up.user_id IN ({placeholders});
+            """,
+            [date_of_end] + all_user_ids
+        )
+
+        return {vote_type: len(user_ids) for vote_type, user_ids in users_by_vote_type.items()}
+
+
+    @staticmethod
+    def update_role_population(promotions):
+
+        for vote_type, count in promotions.items():
+            previous_role = next(
+                role for role, next_vote_type in VoteRules.rules.items()
+                if next_vote_type == vote_type
+            )
+            role_population.move(previous_role, PromoteRules.rules.get(vote_type).value, count)
+
 
 
 class UserBanService:
@@ -426,78 +547,135 @@ class UserBanService:
     @staticmethod
     def ban_user(values):
 
-        for value in values:
-            count_of_agreed = value.get('count_of_agreed')
-            count_of_disagreed = value.get('count_of_disagreed')
+        list_of_users_to_ban = [
+            value.get('user_id')
+            for value in values
+            if VoteCloseService.is_accepted(value.get('count_of_agreed'), value.get('count_of_disagreed'))
+        ]
 
-            if (count_of_agreed / (count_of_disagreed + count_of_agreed)) > 0.5:
-                with transaction.atomic():
-                    with connection.cursor() as cursor:
-                        cursor.execute(
-                            """
-                            INSERT INTO prohibited_ip(ip_address)
-                            SELECT ip_address
-                            FROM users_ip
-                            WHERE user_id = %s;
-                            """,
-                            [value.get('user_id')]
-                        )
+        if not list_of_users_to_ban:
+            return True
 
-                        cursor.execute(
-                            "DELETE FROM users WHERE id=%s;",
-                            [value.get('user_id')]
-                        )
+        with transaction.atomic():
+            with connection.cursor() as cursor:
+                banned_roles = UserBanService.apply_bans(cursor, list_of_users_to_ban)
+
+        UserBanService.update_role_population(banned_roles)
 
         return True
 
 
+    @staticmethod
+    def apply_bans(cursor, user_ids):
+
+        if not user_ids:
+            return {}
+
+        placeholders = ','.join(['%s'] * len(user_ids))
+
+        cursor.execute(
+            f"""
+            SELECT u.role, COUNT(u.id)
+            FROM users u
+            WHERE u.id IN ({placeholders})
+            GROUP BY u.role;
+            """,
+            user_ids
+        )
+        banned_roles = {role: count for role, count in cursor.fetchall()}
+
+        cursor.execute(
+            f"""
+            INSERT INTO prohibited_ip(ip_address)
+            SELECT DISTINCT ui.ip_address
+            FROM users_ip ui
+            WHERE ui.user_id IN ({placeholders})
+            AND NOT EXISTS (
+                SELECT 1
+                FROM prohibited_ip p
+                WHERE p.ip_address = ui.ip_address
+            );
+            """,
+            user_ids
+        )
+
+        cursor.execute(
+            f"DELETE FROM users WHERE id IN ({placeholders});",
+            user_ids
+        )
+
+        transaction.on_commit(lambda: forget_users(user_ids))
+
+        return banned_roles
+
+
+    @staticmethod
+    def update_role_population(banned_roles):
+
+        for role, count in banned_roles.items():
+            role_population.adjust(role, -count)
+
+
 
 class InquisitorManagementService:
 
     def appoint_inquisitor_role(self):
-        query = """
+        select_query = """
+            SELECT u.id
+            FROM users u
+            ORDER BY RAND()
+            LIMIT 1
+            FOR UPDATE;
+        """
+
+        update_query = """
             UPDATE users u
             SET u.is_inquisitor = TRUE
-            WHERE u.id = (
-                SELECT id
-                FROM (
-                    SELECT id
-                    FROM users
-                    ORDER BY RAND()
-                    LIMIT 1
-                ) AS t
-            );
+            WHERE u.id IN ({placeholders});
         """
 
-        try:
-
-            with connection.cursor() as cursor:
-                cursor.execute(query)
-
-            return True
-
-        except OperationalError as e:
-            raise RuntimeError(f"Database problem connection or table lock: {e.args[0]}")
+        return self.change_inquisitors(select_query, update_query)
 
 
     def remove_inquisitor_role(self):
+        select_query = """
+            SELECT u.id
+            FROM users u
+            WHERE u.is_inquisitor = TRUE
+            FOR UPDATE;
+        """
 
-        query = """
+        update_query = """
             UPDATE users u
             SET u.is_inquisitor = FALSE
-            WHERE u.is_inquisitor = TRUE
+            WHERE u.id IN ({placeholders});
         """
 
+        return self.change_inquisitors(select_query, update_query)
+
+
+    @staticmethod
+    def change_inquisitors(select_query, update_query):
+
         try:
 
-            with connection.cursor() as cursor:
-                cursor.execute(query)
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    cursor.execute(select_query)
+                    user_ids = [row[0] for row in cursor.fetchall()]
 
-            return True
+                    if user_ids:
+                        placeholders = ','.join(['%s'] * len(user_ids))
+                        cursor.execute(update_query.format(placeholders = placeholders), user_ids)
 
         except OperationalError as e:
             raise RuntimeError(f"Database problem connection or table lock: {e.args[0]}")
 
+        # Only the users whose flag flipped carry stale claims.
+        forget_users(user_ids)
+
+        return True
+
 
 
 class UserArchitectService:
@@ -515,6 +693,9 @@ class UserArchitectService:
         with connection.cursor() as cursor:
             cursor.execute(query, params)
 
+        role_population.adjust(Role.ARCHITECT.value, -1)
+        forget_users([user_id])
+
 
     def delete_architect(self):
         query = """
@@ -0,0 +1,188 @@
+import threading
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+from core.cache import require_shared_cache
+
+
+TALLY_COLUMNS = ("amount_of_agreed", "amount_of_disagreed")
+CACHE_KEY = "vote_tally:{}:{}"
+
+
+class VoteTallyBuffer:
+
+    lock_query = """
+        SELECT id
+        FROM votes
+        WHERE id IN ({placeholders}) AND is_active = TRUE
+        ORDER BY id
+        {for_update};
+    """
+
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._dirty = set()
+        self._last_flush = time.monotonic()
+
+
+    @property
+    def enabled(self):
+        return getattr(settings, "VOTE_TALLY_MODE", "direct") == "write_behind"
+
+
+    @property
+    def flush_interval(self):
+        return getattr(settings, "VOTE_TALLY_FLUSH_INTERVAL", 5)
+
+
+    def check_backend(self):
+        # Buffered ballots have to be visible to whichever process flushes or
+        # closes the vote, so a per-process cache would lose them.
+        if self.enabled:
+            require_shared_cache("VOTE_TALLY_MODE = 'write_behind'")
+
+
+    def record(self, vote_id, column):
+        key = CACHE_KEY.format(vote_id, column)
+
+        cache.add(key, 0, timeout = None)
+        cache.incr(key)
+
+        with self._lock:
+            self._dirty.add(vote_id)
+
+        self.maybe_flush()
+
+
+    def take(self, vote_ids):
+        keys = {
+            CACHE_KEY.format(vote_id, column): (vote_id, column)
+            for vote_id in vote_ids
+            for column in TALLY_COLUMNS
+        }
+
+        deltas = {}
+
+        for key, count in cache.get_many(keys.keys()).items():
+            if not count:
+                continue
+
+            # Subtracting what was read keeps increments that land in between.
+            cache.decr(key, count)
+
+            vote_id, column = keys[key]
+            deltas.setdefault(vote_id, dict.fromkeys(TALLY_COLUMNS, 0))[column] = count
+
+        return deltas
+
+
+    def discard(self, vote_ids):
+        cache.delete_many([
+            CACHE_KEY.format(vote_id, column)
+            for vote_id in vote_ids
+            for column in TALLY_COLUMNS
+        ])
+
+
+    def lock_active(self, cursor, vote_ids):
+        placeholders = ','.join(['%s'] * len(vote_ids))
+        # SQLite has no row locks; its writers are serialised anyway.
+        for_update = "FOR UPDATE" if connection.features.has_select_for_update else ""
+
+        cursor.execute(
+            self.lock_query.format(placeholders = placeholders, for_update = for_update),
+            list(vote_ids)
+        )
+
+        return [row[0] for row in cursor.fetchall()]
+
+
+    def restore(self, deltas):
+        for vote_id, counts in deltas.items():
+            for column, count in counts.items():
+                if count:
+                    key = CACHE_KEY.format(vote_id, column)
+                    cache.add(key, 0, timeout = None)
+                    cache.incr(key, count)
+
+        with self._lock:
+            self._dirty.update(deltas.keys())
+
+
+    @staticmethod
+    def apply(cursor, deltas):
+        if not deltas:
+            return
+
+        # Ballots that arrive after a vote closed never change its outcome.
+        cursor.executemany(
+            """
+            UPDATE votes
+            SET amount_of_agreed = amount_of_agreed + %s,
+            amount_of_disagreed = amount_of_disagreed + %s
+            WHERE id = %s AND is_active = TRUE;
+            """,
+            [
+                [counts["amount_of_agreed"], counts["amount_of_disagreed"], vote_id]
+                for vote_id, counts in deltas.items()
+            ]
+        )
+
+
+    def flush(self, vote_ids = None):
+        with self._lock:
+            if vote_ids is None:
+                vote_ids = set(self._dirty)
+
+            self._dirty.difference_update(vote_ids)
+            self._last_flush = time.monotonic()
+
+        vote_ids = sorted(vote_ids)
+        if not vote_ids:
+            return {}
+
+        deltas = {}
+
+        try:
+            with transaction.atomic():
+                with connection.cursor() as cursor:
+                    # Counts are taken only once the rows are locked, so a flush
+                    # and a close of the same vote run one after the other, and
+                    # a vote closed in between keeps the ballots it was decided with.
+                    active_ids = self.lock_active(cursor, vote_ids)
+                    deltas = self.take(active_ids)
+                    self.apply(cursor, deltas)
+
+        except Exception:
+            self.restore(deltas)
+            raise
+
+        # Anything still buffered for a closed vote arrived after it was decided.
+        self.discard(set(vote_ids) - set(active_ids))
+
+        return deltas
+
+
+    def flush_active(self):
+        # The dirty set only knows this process's ballots; every active vote
+        # covers the ones buffered by other workers too.
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT id FROM votes WHERE is_active = TRUE;")
+            vote_ids = [row[0] for row in cursor.fetchall()]
+
+        return self.flush(vote_ids)
+
+
+    def maybe_flush(self):
+        with self._lock:
+            if time.monotonic() - self._last_flush < self.flush_interval:
+                return
+
+            self._last_flush = time.monotonic()
+
+        self.flush()
+
+
+vote_tally = VoteTallyBuffer()
@@ -1,15 +1,18 @@
 from rest_framework.views import APIView
 from rest_framework import status
 from rest_framework.response import Response
+from apps.authentific.authentication import JWTAuthentication
 from .permissions import HasValidToken
 from .services import VoteService,SendVoteService, PermissionService, UserPromoteService, UserBanService, \
 InquisitorManagementService, UserArchitectService
 from .serializers import VotesSerializer, SendVotesSerializer, CloseVotesSerializer, \
 UserBanSerializer
+from enums.roles import VoteCastResult
 
 
 
 class VotesTableView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [HasValidToken]
 
     def get(self, request):
@@ -30,6 +33,7 @@ class VotesTableView(APIView):
 
 
 class SendVoteView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [HasValidToken]
 
     def post(self, request):
@@ -41,7 +45,22 @@ class SendVoteView(APIView):
 
         send = SendVoteService()
 
-        if send.user_already_voted(user_id = user.id, vote_id = serializer.validated_data["id"]):
+        result = send.cast_vote(
+            user.id,
+            serializer.validated_data["id"],
+            serializer.validated_data["choice"]
+        )
+
+        if result == VoteCastResult.OK:
+            return Response(
+                {
+                    "status": "OK",
+                    "notification": "Vote was counted",
+                },
+                status = status.HTTP_200_OK
+            )
+
+        if result == VoteCastResult.ALREADY_VOTED:
             return Response(
                 {
                     "status": "ALREADY_VOTED",
@@ -50,22 +69,23 @@ class SendVoteView(APIView):
                 status = status.HTTP_400_BAD_REQUEST
             )
 
-        result = send.commit_choice(
-            user.id,
-            serializer.validated_data["id"],
-            serializer.validated_data["choice"]
-        )
-
-        if result:
-
+        if result == VoteCastResult.NOT_FOUND:
             return Response(
                 {
-                    "status": "OK",
-                    "notification": f"{result}",
+                    "status": "NOT_FOUND",
+                    "notification": "User or vote does not exist",
                 },
-                status = status.HTTP_200_OK
+                status = status.HTTP_404_NOT_FOUND
             )
 
+        if result == VoteCastResult.VOTE_CLOSED:
+            return Response(
+                {
+                    "status": "CONFLICT",
+                    "notification": "Vote is closed or does not exist",
+                },
+                status = status.HTTP_409_CONFLICT
+            )
 
         return Response(
             {
@@ -78,6 +98,7 @@ class SendVoteView(APIView):
 
 
 class PromotionPermissionView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [HasValidToken]
 
     def get(self, request):
@@ -104,6 +125,7 @@ class PromotionPermissionView(APIView):
 
 
 class BanPermissionView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [HasValidToken]
 
     def get(self, request):
@@ -133,6 +155,7 @@ class BanPermissionView(APIView):
 
 
 class UserPromoteView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [HasValidToken]
 
     def patch(self, request):
@@ -160,6 +183,7 @@ class UserPromoteView(APIView):
 
 
 class UserBanView(APIView):
+    authentication_classes = [JWTAuthentication]
     permission_classes = [HasValidToken]
 
     def patch(self, request):
@@ -195,32 +219,16 @@ class CloseActiveExpiredVotesView(APIView):
         serializer = CloseVotesSerializer(data = request.data)
         serializer.is_valid(raise_exception = True)
 
-        try:
-            if VoteService.close_votes(date = serializer.validated_data["date_of_end"]):
-                return Response(
-                    {
-                        "status": "OK",
-                        "notification": "All active votes was closed"
-                    },
-                    status=status.HTTP_200_OK
-                )
-
-            return Response(
-                {
-                    "status": "BAD_REQUEST",
-                    "notification": "Error to close votes"
-                },
-                status = status.HTTP_400_BAD_REQUEST
-            )
+        report = VoteService.close_votes(date = serializer.validated_data["date_of_end"])
 
-        except ZeroDivisionError:
-            return Response(
-                {
-                    "status": "OK",
-                    "notification": "No users votes"
-                },
-                status=status.HTTP_200_OK
-            )
+        return Response(
+            {
+                "status": "OK",
+                "notification": "All active votes was closed",
+                "data": report
+            },
+            status=status.HTTP_200_OK
+        )
 
 
 
@@ -0,0 +1,15 @@
+from django.apps import AppConfig
+from django.conf import settings
+
+
+class CoreConfig(AppConfig):
+    name = "core"
+
+    def ready(self):
+        from .cache import require_shared_cache
+
+        # Role counters, cached users, the entry password generation and
+        # cluster tiles are invalidated through the default cache, so every
+        # worker has to see the same one.
+        if getattr(settings, "CACHE_REQUIRE_SHARED", False):
+            require_shared_cache("CACHE_REQUIRE_SHARED")
@@ -0,0 +1,43 @@
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+
+
+PROCESS_LOCAL_BACKENDS = (
+    "django.core.cache.backends.locmem.LocMemCache",
+    "django.core.cache.backends.dummy.DummyCache",
+)
+
+
+def get_cache_backend():
+    return settings.CACHES.get("default", {}).get("BACKEND", "")
+
+
+def require_shared_cache(feature):
+    backend = get_cache_backend()
+
+    if backend in PROCESS_LOCAL_BACKENDS:
+        raise ImproperlyConfigured(f"{feature} needs a shared cache backend, not {backend}")
+
+
+class CacheGeneration:
+    # Entries keyed by the current generation are all dropped by one bump; the
+    # orphaned ones simply expire.
+
+    def __init__(self, key):
+        self.key = key
+
+    def get(self):
+        generation = cache.get(self.key)
+
+        if generation is None:
+            cache.add(self.key, 0, timeout=None)
+            generation = cache.get(self.key, 0)
+
+        return generation
+
+    def bump(self):
+        try:
+            cache.incr(self.key)
+        except ValueError:
+            cache.set(self.key, 1, timeout=None)
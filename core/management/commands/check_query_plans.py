@@ -0,0 +1,52 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from apps.records import query_plans as records_query_plans
+from apps.users import query_plans as users_query_plans
+from apps.votes import query_plans as votes_query_plans
+
+
+# Each app builds its entries from the SQL and querysets its services run, so
+# the check follows the code instead of a hand-kept copy.
+HOT_QUERY_SOURCES = [votes_query_plans, users_query_plans, records_query_plans]
+
+
+def get_hot_queries():
+    return [query for source in HOT_QUERY_SOURCES for query in source.hot_queries()]
+
+
+class Command(BaseCommand):
+    help = "Runs EXPLAIN on the hot queries of every app and fails on full table scans"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--ignore-below",
+            type = int,
+            default = 0,
+            help = "Tolerate full scans of tables the optimizer estimates below this many rows",
+        )
+
+
+    def handle(self, *args, **options):
+        if connection.vendor != "mysql":
+            raise CommandError("Query plans can only be checked against MySQL")
+
+        failures = []
+
+        with connection.cursor() as cursor:
+            for name, query, params in get_hot_queries():
+                cursor.execute(f"EXPLAIN {query.strip().rstrip(';')}", params)
+                columns = [column[0] for column in cursor.description]
+
+                for row in cursor.fetchall():
+                    plan = dict(zip(columns, row))
+                    estimated_rows = plan.get("rows") or 0
+
+                    if plan.get("type") == "ALL" and estimated_rows >= options["ignore_below"]:
+                        failures.append(f"{name}: full scan of {plan.get('table')} (~{estimated_rows} rows)")
+
+                self.stdout.write(f"checked {name}")
+
+        if failures:
+            raise CommandError("Full table scans found:\n" + "\n".join(failures))
+
+        self.stdout.write(self.style.SUCCESS("All hot queries use indexes"))
@@ -10,6 +10,10 @@ ALLOWED_HOSTS = ["*"]
 
 MEDIA_URL = "/media/"
 MEDIA_ROOT = os.path.join(BASE_DIR, "shared", "images")
+# Set one of these to let the front server stream media files: an internal
+# nginx location for X-Accel-Redirect, or a header name such as "X-Sendfile".
+MEDIA_ACCEL_REDIRECT_PREFIX = None
+MEDIA_SENDFILE_HEADER = None
 
 
 INSTALLED_APPS = [
@@ -20,6 +24,7 @@ INSTALLED_APPS = [
     "django.contrib.messages",
     "django.contrib.staticfiles",
     "rest_framework",
+    "core",
     "apps.authentific",
     "apps.entry_password",
     "apps.users",
@@ -28,6 +33,7 @@ INSTALLED_APPS = [
     "apps.votes",
     "tests",
     "apps.hall_of_fame",
+    "apps.mail_outbox",
 ]
 
 MIDDLEWARE = [
@@ -102,3 +108,87 @@ REST_FRAMEWORK = {
 }
 
 SECRET_ENTRY_PASSWORD = Config.SECRET_ENTRY_PASSWORD
+
+# Role counters, cached users, token revocations, the entry password
+# generation, cluster tiles and write-behind ballots are shared through the
+# default cache, so every worker process must talk to the same one. Startup
+# fails on a process-local backend while CACHE_REQUIRE_SHARED is set.
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.redis.RedisCache",
+        "LOCATION": Config.CACHE_URL,
+    }
+}
+CACHE_REQUIRE_SHARED = True
+
+ROLE_POPULATION_LOCAL_TTL = 5
+ROLE_POPULATION_RECONCILE_INTERVAL = 300
+
+VOTE_CLOSE_CHUNK_SIZE = 500
+
+# "direct" updates the votes row on every ballot; "write_behind" buffers ballot
+# counts in the cache and flushes them in batches. write_behind refuses to start
+# without a shared cache backend, and `manage.py flush_vote_tally --loop` has to
+# run so ballots are written even when no further ballot arrives.
+VOTE_TALLY_MODE = "direct"
+VOTE_TALLY_FLUSH_INTERVAL = 5
+
+RECORD_CLUSTERS_TTL = 300
+# Cluster requests may span at most this many cached tiles.
+RECORD_CLUSTERS_MAX_TILES = 256
+
+RECORD_IMAGE_MAX_BYTES = 10 * 1024 * 1024
+RECORD_IMAGE_WORKERS = 2
+
+RECORD_ERASE_CHUNK_SIZE = 1000
+RECORD_ERASE_WORKERS = 8
+RECORD_ERASE_STALE_AFTER = 60
+
+SNAPSHOT_CHUNK_SIZE = 1000
+
+AUTH_TOKEN_CACHE_SIZE = 10000
+AUTH_TOKEN_CACHE_TTL = 300
+AUTH_USER_CACHE_TTL = 30
+
+# "database" loads the user behind every token (through a short-lived cache);
+# "claims" trusts the signed role claims and rejects tokens issued before a
+# promotion, ban or inquisitor rotation revoked them; it refuses to start
+# without a shared cache backend.
+AUTH_ROLE_SOURCE = "database"
+AUTH_TOKEN_REVOCATION_TTL = 3600
+
+# bcrypt runs in a process pool so logins cannot starve the request threads;
+# PASSWORD_HASH_WORKERS = 0 hashes inline. Past PASSWORD_HASH_MAX_PENDING
+# queued operations, login, registration and entry checks answer 429.
+BCRYPT_ROUNDS = 12
+PASSWORD_HASH_WORKERS = 2
+PASSWORD_HASH_MAX_PENDING = 32
+PASSWORD_HASH_TIMEOUT = 10
+
+ENTRY_PASSWORD_GENERATION_TTL = 60
+ENTRY_PASSWORD_MEMO_TTL = 60
+ENTRY_PASSWORD_MEMO_SIZE = 1024
+
+# Go sidecar (mailer and entry password). Calls share one keep-alive pool of
+# SIDECAR_POOL_SIZE connections; retries stop after SIDECAR_DEADLINE seconds,
+# and SIDECAR_BREAKER_THRESHOLD consecutive failures fail calls fast for
+# SIDECAR_BREAKER_RESET_AFTER seconds.
+SIDECAR_URL = "http://docker_go:8080"
+SIDECAR_CONNECT_TIMEOUT = 0.5
+SIDECAR_READ_TIMEOUT = 2
+SIDECAR_RETRIES = 2
+SIDECAR_BACKOFF = 0.1
+SIDECAR_DEADLINE = 3
+SIDECAR_POOL_SIZE = 10
+SIDECAR_BREAKER_THRESHOLD = 5
+SIDECAR_BREAKER_RESET_AFTER = 30
+
+# Outgoing mail is queued in mail_outbox and sent by a dispatcher thread woken
+# on enqueue. Delayed retries and crashed dispatchers are picked up by
+# `manage.py dispatch_mail_outbox --loop`.
+MAIL_OUTBOX_BATCH_SIZE = 500
+MAIL_OUTBOX_MAX_RECIPIENTS = 100
+MAIL_OUTBOX_MAX_ATTEMPTS = 5
+MAIL_OUTBOX_RETRY_AFTER = 30
+MAIL_OUTBOX_STALE_AFTER = 300
+MAIL_OUTBOX_LINGER = 1
@@ -10,4 +10,5 @@ class Config:
     DATABASE_PASSWORD = os.getenv("DATABASE_PASSWORD", "")
     DATABASE_PORT = os.getenv("DATABASE_PORT", "")
     SECRET_KEY = os.getenv("SECRET_KEY", "")
-    SECRET_ENTRY_PASSWORD = os.getenv("SECRET_ENTRY_PASSWORD", "")
\ No newline at end of file
+    SECRET_ENTRY_PASSWORD = os.getenv("SECRET_ENTRY_PASSWORD", "")
+    CACHE_URL = os.getenv("CACHE_URL", "redis://redis:6379/0")
\ No newline at end of file
@@ -0,0 +1,155 @@
+import asyncio
+import random
+import threading
+import time
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+
+RETRY_STATUSES = {502, 503, 504}
+IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+
+
+class SidecarUnavailable(Exception):
+    pass
+
+
+class CircuitBreaker:
+    def __init__(self, threshold, reset_after):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = None
+        self._probing = False
+
+    @property
+    def state(self):
+        with self._lock:
+            if self._opened_at is None:
+                return "closed"
+            if time.monotonic() - self._opened_at >= self.reset_after:
+                return "half-open"
+            return "open"
+
+    def allow(self):
+        with self._lock:
+            if self._opened_at is None:
+                return True
+
+            # Once the cool-down passes, a single caller probes the sidecar
+            # while everyone else keeps failing fast.
+            if time.monotonic() - self._opened_at < self.reset_after or self._probing:
+                return False
+
+            self._probing = True
+            return True
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._opened_at = None
+            self._probing = False
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._probing or self._failures >= self.threshold:
+                self._opened_at = time.monotonic()
+            self._probing = False
+
+
+class SidecarClient:
+    def __init__(self, base_url=None):
+        base_url = base_url or getattr(settings, "SIDECAR_URL", "http://docker_go:8080")
+        self.base_url = base_url.rstrip("/")
+        self.connect_timeout = getattr(settings, "SIDECAR_CONNECT_TIMEOUT", 0.5)
+        self.read_timeout = getattr(settings, "SIDECAR_READ_TIMEOUT", 2)
+        self.retries = getattr(settings, "SIDECAR_RETRIES", 2)
+        self.deadline = getattr(settings, "SIDECAR_DEADLINE", 3)
+        self.backoff = getattr(settings, "SIDECAR_BACKOFF", 0.1)
+        self.breaker = CircuitBreaker(
+            getattr(settings, "SIDECAR_BREAKER_THRESHOLD", 5),
+            getattr(settings, "SIDECAR_BREAKER_RESET_AFTER", 30),
+        )
+
+        # One keep-alive pool shared by every thread of the process.
+        pool_size = getattr(settings, "SIDECAR_POOL_SIZE", 10)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _can_retry(self, method, error, attempt, started):
+        # Retries stop at the deadline so a slow sidecar bounds the caller too.
+        if attempt >= self.retries or time.monotonic() - started >= self.deadline:
+            return False
+
+        # A POST that timed out or got an answer may already have been acted
+        # on, so it is only retried on connection errors.
+        if method not in IDEMPOTENT_METHODS:
+            return isinstance(error, requests.ConnectionError)
+        return True
+
+    def request(self, method, path, **kwargs):
+        method = method.upper()
+        kwargs.setdefault("timeout", (self.connect_timeout, self.read_timeout))
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        started = time.monotonic()
+        attempt = 0
+
+        while True:
+            if not self.breaker.allow():
+                raise SidecarUnavailable(f"Sidecar circuit is open, skipped {method} {path}")
+
+            try:
+                response = self.session.request(method, url, **kwargs)
+                if response.status_code in RETRY_STATUSES:
+                    raise requests.HTTPError(
+                        f"Sidecar answered {response.status_code}", response=response
+                    )
+
+            except requests.RequestException as e:
+                self.breaker.record_failure()
+
+                if not self._can_retry(method, e, attempt, started):
+                    raise SidecarUnavailable(f"{method} {path} failed: {e}") from e
+
+                # Full jitter keeps retrying workers from hitting the sidecar in step.
+                time.sleep(random.uniform(0, self.backoff * 2**attempt))
+                attempt += 1
+                continue
+
+            except Exception:
+                self.breaker.record_failure()
+                raise
+
+            self.breaker.record_success()
+            return response
+
+    def get_json(self, path, **kwargs):
+        return self.request("GET", path, **kwargs).json()
+
+    def post_json(self, path, payload, **kwargs):
+        return self.request("POST", path, json=payload, **kwargs)
+
+    async def arequest(self, method, path, **kwargs):
+        # requests is blocking, so the async interface hands calls to a thread
+        # and keeps the shared pool, retries and breaker.
+        return await asyncio.to_thread(self.request, method, path, **kwargs)
+
+    async def aget_json(self, path, **kwargs):
+        response = await self.arequest("GET", path, **kwargs)
+        return response.json()
+
+    async def apost_json(self, path, payload, **kwargs):
+        return await self.arequest("POST", path, json=payload, **kwargs)
+
+    def get_entry_password(self):
+        return self.get_json("entry_password")
+
+    def close(self):
+        self.session.close()
+
+
+sidecar = SidecarClient()
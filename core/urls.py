@@ -1,12 +1,9 @@
 from django.contrib import admin
 from django.urls import path, include
-from django.conf import settings
-from django.conf.urls.static import static
+from apps.records.media import MediaView
 
 
 urlpatterns = [
     path("api/", include("api.urls")),
+    path("media/<str:name>", MediaView.as_view(), name="media"),
 ]
-
-if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
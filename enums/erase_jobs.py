@@ -0,0 +1,15 @@
+import enum
+
+
+class EraseJobStatus(enum.Enum):
+    PENDING = 'PENDING'
+    RUNNING = 'RUNNING'
+    DONE = 'DONE'
+    FAILED = 'FAILED'
+
+
+class EraseJobPhase(enum.Enum):
+    ROWS = 'ROWS'
+    FILES = 'FILES'
+    PASSWORD = 'PASSWORD'
+    DONE = 'DONE'
@@ -0,0 +1,8 @@
+import enum
+
+
+class OutboxStatus(enum.Enum):
+    PENDING = 'PENDING'
+    SENDING = 'SENDING'
+    SENT = 'SENT'
+    FAILED = 'FAILED'
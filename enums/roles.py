@@ -11,4 +11,12 @@ class Role(enum.Enum):
 class VoteEnum(enum.Enum):
     PROMOTE_TO_SILVER = 'PROMOTE_TO_SILVER'
     PROMOTE_TO_GOLDEN = 'PROMOTE_TO_GOLDEN'
-    PROMOTE_TO_ARCHITECT = 'PROMOTE_TO_ARCHITECT'
\ No newline at end of file
+    PROMOTE_TO_ARCHITECT = 'PROMOTE_TO_ARCHITECT'
+
+
+class VoteCastResult(enum.Enum):
+    OK = 'OK'
+    ALREADY_VOTED = 'ALREADY_VOTED'
+    VOTE_CLOSED = 'VOTE_CLOSED'
+    INVALID_CHOICE = 'INVALID_CHOICE'
+    NOT_FOUND = 'NOT_FOUND'
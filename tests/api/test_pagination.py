@@ -0,0 +1,73 @@
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase, RequestFactory
+from rest_framework.exceptions import NotFound
+from rest_framework.request import Request
+from api.pagination import KeysetPagination
+from apps.records.models import Record
+
+
+class KeysetPaginationTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Record)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(Record)
+
+    def setUp(self):
+        self.factory = RequestFactory()
+        for i in range(5):
+            Record.objects.create(
+                name=f"R{i}",
+                x=float(i),
+                y=float(i),
+                type="UFO",
+                description="desc",
+                img_path="/img.png",
+                additional_info="info",
+            )
+
+    def paginate(self, **params):
+        request = Request(self.factory.get("/records/all", params))
+        paginator = KeysetPagination()
+        page = paginator.paginate_queryset(Record.objects.all(), request)
+        return page, paginator.get_next_cursor()
+
+    def test_pages_follow_cursor(self):
+        first, cursor = self.paginate(limit=2)
+        second, cursor = self.paginate(limit=2, cursor=cursor)
+        third, cursor = self.paginate(limit=2, cursor=cursor)
+
+        names = [r.name for r in first + second + third]
+        self.assertEqual(names, ["R0", "R1", "R2", "R3", "R4"])
+        self.assertIsNone(cursor)
+
+    def test_limit_is_clamped(self):
+        paginator = KeysetPagination()
+
+        self.assertEqual(paginator.get_limit(Request(self.factory.get("/", {"limit": 0}))), 1)
+        self.assertEqual(
+            paginator.get_limit(Request(self.factory.get("/", {"limit": 10**6}))),
+            paginator.max_limit,
+        )
+        self.assertEqual(
+            paginator.get_limit(Request(self.factory.get("/", {"limit": "x"}))),
+            paginator.default_limit,
+        )
+
+    def test_invalid_cursor(self):
+        with self.assertRaises(NotFound):
+            self.paginate(cursor="not-a-cursor")
+
+    def test_unparameterised_request_is_capped(self):
+        with patch.object(KeysetPagination, "default_limit", 2):
+            page, cursor = self.paginate()
+
+        self.assertEqual([r.name for r in page], ["R0", "R1"])
+        self.assertIsNotNone(cursor)
@@ -0,0 +1,142 @@
+import time
+from unittest.mock import patch
+import jwt
+from django.conf import settings
+from django.test import TestCase, RequestFactory, override_settings
+from rest_framework import status
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from rest_framework.response import Response
+from rest_framework.views import APIView
+from apps.authentific.authentication import JWTAuthentication, VerifiedTokenCache, verified_tokens
+from apps.users.models import User
+from apps.users.permissions import IsGoldMasonOrArchitect
+
+
+def make_token(user_id = 1, exp = None):
+    payload = {"id": user_id, "exp": exp or int(time.time()) + 3600}
+    return jwt.encode(payload, settings.SECRET_KEY, algorithm = "HS256")
+
+
+class VerifiedTokenCacheTest(TestCase):
+
+    def test_verify_decodes_once(self):
+        tokens = VerifiedTokenCache()
+        token = make_token()
+
+        with patch("apps.authentific.authentication.jwt.decode", wraps = jwt.decode) as mock_decode:
+            tokens.verify(token)
+            payload = tokens.verify(token)
+
+        self.assertEqual(payload["id"], 1)
+        mock_decode.assert_called_once()
+
+
+    @override_settings(AUTH_TOKEN_CACHE_SIZE = 2)
+    def test_cache_is_bounded(self):
+        tokens = VerifiedTokenCache()
+
+        for user_id in range(1, 4):
+            tokens.verify(make_token(user_id))
+
+        self.assertEqual(len(tokens._entries), 2)
+        self.assertNotIn(make_token(1), tokens._entries)
+
+
+    def test_entry_expires_with_token(self):
+        tokens = VerifiedTokenCache()
+        token = make_token(exp = int(time.time()) + 1)
+        tokens.verify(token)
+
+        with patch("apps.authentific.authentication.time.time", return_value = time.time() + 5), \
+                patch("apps.authentific.authentication.jwt.decode", wraps = jwt.decode) as mock_decode:
+            tokens.verify(token)
+
+        mock_decode.assert_called_once()
+
+
+class JWTAuthenticationTest(TestCase):
+
+    def setUp(self):
+        verified_tokens.clear()
+        self.factory = RequestFactory()
+
+
+    def authenticate(self, header = None):
+        headers = {"HTTP_AUTHORIZATION": header} if header else {}
+        return JWTAuthentication().authenticate(Request(self.factory.get("/", **headers)))
+
+
+    def test_no_header_is_anonymous(self):
+        self.assertIsNone(self.authenticate())
+
+
+    @patch("apps.authentific.authentication.user_cache.get")
+    def test_valid_token_returns_cached_user(self, mock_get):
+        mock_get.return_value = User(id = 1, role = "Mason")
+
+        user, payload = self.authenticate(f"Bearer {make_token()}")
+
+        self.assertEqual(user.id, 1)
+        self.assertEqual(payload["id"], 1)
+        mock_get.assert_called_once_with(1)
+
+
+    def test_invalid_token_fails(self):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate("Bearer not-a-token")
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate("Bearer")
+
+
+    @patch("apps.authentific.authentication.user_cache.get", return_value = None)
+    def test_deleted_user_fails(self, mock_get):
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(f"Bearer {make_token()}")
+
+
+class ProtectedView(APIView):
+    authentication_classes = [JWTAuthentication]
+    permission_classes = [IsGoldMasonOrArchitect]
+
+    def get(self, request):
+        return Response({"id": request.user.id})
+
+
+class PermissionThroughAuthenticationTest(TestCase):
+
+    def setUp(self):
+        verified_tokens.clear()
+        self.factory = RequestFactory()
+        self.view = ProtectedView.as_view()
+
+
+    def get(self, header = None):
+        headers = {"HTTP_AUTHORIZATION": header} if header else {}
+        return self.view(self.factory.get("/", **headers))
+
+
+    @patch("apps.authentific.authentication.user_cache.get")
+    def test_architect_passes_either_role_check(self, mock_get):
+        mock_get.return_value = User(id = 7, role = "Architect")
+
+        response = self.get(f"Bearer {make_token(7)}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["id"], 7)
+
+
+    @patch("apps.authentific.authentication.user_cache.get")
+    def test_other_role_is_forbidden(self, mock_get):
+        mock_get.return_value = User(id = 7, role = "Mason")
+
+        response = self.get(f"Bearer {make_token(7)}")
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+
+
+    def test_missing_token_is_forbidden(self):
+        response = self.get()
+
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
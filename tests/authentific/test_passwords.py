@@ -0,0 +1,87 @@
+from concurrent.futures import TimeoutError
+from unittest.mock import patch
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.authentific.passwords import PasswordHasher, PasswordHasherBusy
+
+
+@override_settings(BCRYPT_ROUNDS = 4, PASSWORD_HASH_WORKERS = 0)
+class PasswordHasherTest(TestCase):
+
+    def setUp(self):
+        self.hasher = PasswordHasher()
+
+
+    def test_hash_and_check_inline(self):
+        hashed = self.hasher.hash("secret")
+
+        self.assertTrue(hashed.startswith("$2b$04$"))
+        self.assertTrue(self.hasher.check("secret", hashed))
+        self.assertFalse(self.hasher.check("wrong", hashed))
+
+        metrics = self.hasher.metrics()
+        self.assertEqual(metrics["hash"]["count"], 1)
+        self.assertEqual(metrics["check"]["count"], 2)
+        self.assertIsNotNone(metrics["check"]["work_p95_ms"])
+        self.assertEqual(metrics["pending"], 0)
+
+
+    @override_settings(PASSWORD_HASH_WORKERS = 1)
+    def test_hash_and_check_in_process_pool(self):
+        try:
+            hashed = self.hasher.hash("secret")
+
+            self.assertTrue(self.hasher.check("secret", hashed))
+            self.assertEqual(self.hasher.metrics()["pending"], 0)
+
+        finally:
+            self.hasher._reset_pool(self.hasher._pool)
+
+
+    @override_settings(PASSWORD_HASH_MAX_PENDING = 0)
+    def test_full_queue_is_rejected(self):
+        with self.assertRaises(PasswordHasherBusy):
+            self.hasher.hash("secret")
+
+        self.assertEqual(self.hasher.metrics()["hash"]["rejected"], 1)
+
+
+    def test_timeout_is_reported_as_busy(self):
+        with patch.object(self.hasher, "_call", side_effect = TimeoutError):
+            with self.assertRaises(PasswordHasherBusy) as raised:
+                self.hasher.check("secret", "hash")
+
+        self.assertEqual(raised.exception.retry_after, 10)
+        self.assertEqual(self.hasher.metrics()["check"]["errors"], 1)
+
+
+    @override_settings(PASSWORD_HASH_WORKERS = 1)
+    def test_failed_submit_gives_the_slot_back(self):
+        with patch.object(self.hasher, "_get_pool") as mock_get_pool:
+            mock_get_pool.return_value.submit.side_effect = RuntimeError("cannot schedule new futures after shutdown")
+
+            with self.assertRaises(RuntimeError):
+                self.hasher.hash("secret")
+
+        self.assertEqual(self.hasher.metrics()["pending"], 0)
+        mock_get_pool.return_value.shutdown.assert_not_called()
+
+
+class PasswordBackpressureViewTest(APITestCase):
+
+    @patch("apps.authentific.views.authenticate_user", side_effect = PasswordHasherBusy(retry_after = 3))
+    def test_login_answers_429(self, mock_authenticate):
+        response = self.client.post(reverse("login"), {"email": "a@example.com", "password": "secret"})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertEqual(response["Retry-After"], "3")
+        self.assertEqual(response.data["status"], "TOO_MANY_REQUESTS")
+
+
+    @patch("apps.authentific.views.entry_password_verifier.check", side_effect = PasswordHasherBusy())
+    def test_entry_answers_429(self, mock_check):
+        response = self.client.post(reverse("entry"), {"password": "secret"})
+
+        self.assertEqual(response.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
@@ -0,0 +1,105 @@
+import time
+from unittest.mock import patch
+import jwt
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, RequestFactory, override_settings
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.request import Request
+from apps.authentific.authentication import JWTAuthentication, verified_tokens
+from apps.authentific.revocation import TokenRevocations
+from apps.authentific.services import generate_jwt
+from apps.users.models import User
+
+
+class TokenRevocationsTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.revocations = TokenRevocations()
+
+
+    def tearDown(self):
+        cache.clear()
+
+
+    def test_nothing_revoked(self):
+        self.assertFalse(self.revocations.is_revoked({"id": 1, "iat": time.time()}))
+
+
+    def test_revoke_rejects_older_tokens_of_that_user(self):
+        issued = time.time()
+        self.revocations.revoke(1)
+
+        self.assertTrue(self.revocations.is_revoked({"id": 1, "iat": issued}))
+        self.assertFalse(self.revocations.is_revoked({"id": 2, "iat": issued}))
+        self.assertFalse(self.revocations.is_revoked({"id": 1, "iat": time.time()}))
+
+
+    def test_claims_mode_needs_shared_cache(self):
+        with override_settings(AUTH_ROLE_SOURCE = "claims"):
+            with self.assertRaises(ImproperlyConfigured):
+                self.revocations.check_backend()
+
+            with override_settings(CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}):
+                self.revocations.check_backend()
+
+        self.revocations.check_backend()
+
+
+    def test_token_without_iat_counts_as_oldest(self):
+        self.revocations.revoke(1)
+
+        self.assertTrue(self.revocations.is_revoked({"id": 1}))
+
+
+    def test_generated_token_carries_iat(self):
+        user = User(id = 1, username = "mason", email = "mason@example.com", role = "Mason")
+        self.revocations.revoke(1)
+
+        payload = jwt.decode(generate_jwt(user), settings.SECRET_KEY, algorithms = ["HS256"])
+
+        self.assertFalse(self.revocations.is_revoked(payload))
+
+
+@override_settings(AUTH_ROLE_SOURCE = "claims")
+class ClaimsAuthenticationTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        verified_tokens.clear()
+        self.factory = RequestFactory()
+        self.user = User(id = 5, username = "gold", email = "gold@example.com", role = "GoldMason", is_inquisitor = True)
+
+
+    def tearDown(self):
+        cache.clear()
+
+
+    def authenticate(self, token):
+        request = self.factory.get("/", HTTP_AUTHORIZATION = f"Bearer {token}")
+        return JWTAuthentication().authenticate(Request(request))
+
+
+    @patch("apps.authentific.authentication.user_cache.get")
+    def test_user_comes_from_claims(self, mock_get):
+        user, _ = self.authenticate(generate_jwt(self.user))
+
+        self.assertEqual(user.id, 5)
+        self.assertEqual(user.role, "GoldMason")
+        self.assertTrue(user.is_inquisitor)
+        mock_get.assert_not_called()
+
+
+    def test_revoked_token_fails(self):
+        token = generate_jwt(self.user)
+        self.authenticate(token)
+
+        TokenRevocations().revoke(5)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+        user, _ = self.authenticate(generate_jwt(self.user))
+        self.assertEqual(user.id, 5)
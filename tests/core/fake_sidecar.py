@@ -0,0 +1,93 @@
+import json
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+# Local stand-in for the Go sidecar, served over real sockets so pooling,
+# keep-alive and timeouts behave as they do against the real service.
+class FakeSidecar:
+    def __init__(self):
+        self.requests = []
+        self.client_ports = set()
+        self._responses = {}
+        self._lock = threading.Lock()
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), self._handler())
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def url(self):
+        host, port = self.server.server_address
+        return f"http://{host}:{port}"
+
+    def respond(self, method, path, status=200, body=None, delay=0, times=None):
+        # Queued answers are used first; the last one queued without `times`
+        # keeps answering.
+        answer = {"status": status, "body": body or {}, "delay": delay, "times": times}
+        with self._lock:
+            self._responses.setdefault((method, path), deque()).append(answer)
+
+    def _answer(self, method, path):
+        with self._lock:
+            answers = self._responses.get((method, path))
+            if not answers:
+                return {"status": 404, "body": {}, "delay": 0}
+
+            answer = answers[0]
+            if answer["times"] is not None:
+                answer["times"] -= 1
+                if answer["times"] <= 0 and len(answers) > 1:
+                    answers.popleft()
+            return answer
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def handle_one(self, method):
+                length = int(self.headers.get("Content-Length") or 0)
+                body = self.rfile.read(length) if length else b""
+
+                with fake._lock:
+                    fake.client_ports.add(self.client_address[1])
+                    fake.requests.append(
+                        (method, self.path, json.loads(body) if body else None)
+                    )
+
+                answer = fake._answer(method, self.path)
+                if answer["delay"]:
+                    time.sleep(answer["delay"])
+
+                payload = json.dumps(answer["body"]).encode()
+                try:
+                    self.send_response(answer["status"])
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+                except (BrokenPipeError, ConnectionResetError):
+                    # The client already gave up on a delayed answer.
+                    self.close_connection = True
+
+            def do_GET(self):
+                self.handle_one("GET")
+
+            def do_POST(self):
+                self.handle_one("POST")
+
+        return Handler
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
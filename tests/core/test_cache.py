@@ -0,0 +1,44 @@
+from django.apps import apps
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from core.cache import CacheGeneration, require_shared_cache
+
+REDIS = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}
+
+
+class RequireSharedCacheTest(SimpleTestCase):
+    def test_process_local_backend_is_rejected(self):
+        with self.assertRaises(ImproperlyConfigured):
+            require_shared_cache("Role counters")
+
+    @override_settings(CACHES=REDIS)
+    def test_shared_backend_is_accepted(self):
+        require_shared_cache("Role counters")
+
+    @override_settings(CACHE_REQUIRE_SHARED=True)
+    def test_startup_fails_without_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            apps.get_app_config("core").ready()
+
+    @override_settings(CACHE_REQUIRE_SHARED=True, CACHES=REDIS)
+    def test_startup_with_shared_cache(self):
+        apps.get_app_config("core").ready()
+
+
+class CacheGenerationTest(SimpleTestCase):
+    def tearDown(self):
+        cache.clear()
+
+    def test_bump_moves_to_a_new_generation(self):
+        generation = CacheGeneration("test:generation")
+
+        self.assertEqual(generation.get(), 0)
+        generation.bump()
+        self.assertEqual(generation.get(), 1)
+
+    def test_bump_after_eviction(self):
+        generation = CacheGeneration("test:generation")
+
+        generation.bump()
+        self.assertEqual(generation.get(), 1)
@@ -0,0 +1,68 @@
+from io import StringIO
+from unittest.mock import patch, MagicMock
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.test import SimpleTestCase
+from apps.votes.services import VoteCloseService
+from core.management.commands.check_query_plans import get_hot_queries
+
+
+class CheckQueryPlansCommandTest(SimpleTestCase):
+
+    def mock_explain(self, mock_connection, plans):
+        mock_cursor_instance = MagicMock()
+        mock_connection.vendor = "mysql"
+        mock_connection.cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.description = [("table",), ("type",), ("key",), ("rows",)]
+        mock_cursor_instance.fetchall.return_value = plans
+
+        return mock_cursor_instance
+
+
+    @patch("core.management.commands.check_query_plans.connection")
+    def test_indexed_plans_pass(self, mock_connection):
+        self.mock_explain(mock_connection, [("votes", "ref", "idx_votes_active_type_user", 12)])
+        out = StringIO()
+
+        call_command("check_query_plans", stdout = out)
+
+        self.assertIn("All hot queries use indexes", out.getvalue())
+
+
+    @patch("core.management.commands.check_query_plans.connection")
+    def test_full_scan_fails(self, mock_connection):
+        self.mock_explain(mock_connection, [("users", "ALL", None, 5000)])
+
+        with self.assertRaises(CommandError) as context:
+            call_command("check_query_plans", stdout = StringIO())
+
+        self.assertIn("full scan of users", str(context.exception))
+
+
+    @patch("core.management.commands.check_query_plans.connection")
+    def test_small_full_scan_can_be_ignored(self, mock_connection):
+        self.mock_explain(mock_connection, [("users", "ALL", None, 5)])
+        out = StringIO()
+
+        call_command("check_query_plans", "--ignore-below", "100", stdout = out)
+
+        self.assertIn("All hot queries use indexes", out.getvalue())
+
+
+    @patch("core.management.commands.check_query_plans.connection")
+    def test_requires_mysql(self, mock_connection):
+        mock_connection.vendor = "sqlite"
+
+        with self.assertRaises(CommandError):
+            call_command("check_query_plans", stdout = StringIO())
+
+
+
+class HotQueriesTest(SimpleTestCase):
+
+    def test_queries_come_from_the_services(self):
+        queries = {name: query for name, query, _ in get_hot_queries()}
+
+        self.assertIn(VoteCloseService.expired_votes_query, queries.values())
+        self.assertIn("grid_x", queries["records: records of a type in a viewport"])
+        self.assertNotIn("COUNT", queries["records: likes of a user on a page"])
@@ -0,0 +1,116 @@
+import asyncio
+import socket
+import time
+from django.test import SimpleTestCase, override_settings
+from core.sidecar import SidecarClient, SidecarUnavailable
+from tests.core.fake_sidecar import FakeSidecar
+
+
+def closed_port_url():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return f"http://127.0.0.1:{sock.getsockname()[1]}"
+
+
+@override_settings(SIDECAR_BACKOFF=0, SIDECAR_READ_TIMEOUT=0.3)
+class SidecarClientTest(SimpleTestCase):
+    def setUp(self):
+        self.fake = FakeSidecar().__enter__()
+        self.client = SidecarClient(self.fake.url)
+
+    def tearDown(self):
+        self.client.close()
+        self.fake.__exit__(None, None, None)
+
+    def test_requests_share_a_kept_alive_connection(self):
+        self.fake.respond("GET", "/entry_password", body={"entry_password": "value1"})
+
+        for _ in range(3):
+            payload = self.client.get_entry_password()
+
+        self.assertEqual(payload, {"entry_password": "value1"})
+        self.assertEqual(len(self.fake.requests), 3)
+        self.assertEqual(len(self.fake.client_ports), 1)
+
+    def test_get_is_retried_on_unavailable(self):
+        self.fake.respond("GET", "/entry_password", status=503, times=1)
+        self.fake.respond("GET", "/entry_password", body={"entry_password": "value1"})
+
+        self.assertEqual(self.client.get_entry_password(), {"entry_password": "value1"})
+        self.assertEqual(len(self.fake.requests), 2)
+
+    def test_get_gives_up_after_retries(self):
+        self.fake.respond("GET", "/entry_password", delay=0.5)
+
+        with self.assertRaises(SidecarUnavailable):
+            self.client.get_entry_password()
+
+        self.assertEqual(len(self.fake.requests), 3)
+
+    def test_post_with_an_answer_is_not_retried(self):
+        self.fake.respond("POST", "/send_letter", status=503)
+
+        with self.assertRaises(SidecarUnavailable):
+            self.client.post_json("send_letter", {"topic": "Topic"})
+
+        self.assertEqual(len(self.fake.requests), 1)
+
+    def test_post_json(self):
+        self.fake.respond("POST", "/send_letter")
+        payload = {"topic": "Topic", "text": "Text", "target_emails": ["a@example.com"]}
+
+        self.assertEqual(self.client.post_json("send_letter", payload).status_code, 200)
+        self.assertEqual(
+            self.fake.requests,
+            [
+                (
+                    "POST",
+                    "/send_letter",
+                    {"topic": "Topic", "text": "Text", "target_emails": ["a@example.com"]},
+                )
+            ],
+        )
+
+    def test_async_interface(self):
+        self.fake.respond("GET", "/entry_password", body={"entry_password": "value1"})
+
+        async def fetch():
+            return await asyncio.gather(
+                self.client.aget_json("entry_password"),
+                self.client.aget_json("entry_password"),
+            )
+
+        self.assertEqual(asyncio.run(fetch()), [{"entry_password": "value1"}] * 2)
+
+
+@override_settings(
+    SIDECAR_BACKOFF=0, SIDECAR_BREAKER_THRESHOLD=2, SIDECAR_BREAKER_RESET_AFTER=0.2
+)
+class CircuitBreakerTest(SimpleTestCase):
+    def test_breaker_opens_and_fails_fast(self):
+        client = SidecarClient(closed_port_url())
+
+        with self.assertRaises(SidecarUnavailable):
+            client.get_json("entry_password")
+        self.assertEqual(client.breaker.state, "open")
+
+        started = time.monotonic()
+        with self.assertRaisesRegex(SidecarUnavailable, "circuit is open"):
+            client.get_json("entry_password")
+        self.assertLess(time.monotonic() - started, 0.05)
+
+    def test_half_open_probe_closes_breaker(self):
+        with FakeSidecar() as fake:
+            fake.respond("GET", "/entry_password", body={"entry_password": "value1"})
+            client = SidecarClient(fake.url)
+            client.breaker.record_failure()
+            client.breaker.record_failure()
+
+            with self.assertRaises(SidecarUnavailable):
+                client.get_json("entry_password")
+
+            time.sleep(0.25)
+            self.assertEqual(client.breaker.state, "half-open")
+            self.assertEqual(client.get_json("entry_password"), {"entry_password": "value1"})
+            self.assertEqual(client.breaker.state, "closed")
+            client.close()
@@ -0,0 +1,88 @@
+from datetime import time
+from unittest.mock import patch
+import bcrypt
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase, override_settings
+from apps.entry_password.models import EntryPassword
+from apps.entry_password.verifier import EntryPasswordVerifier
+
+
+def make_hash(password):
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(4)).decode('utf-8')
+
+
+@override_settings(PASSWORD_HASH_WORKERS = 0)
+class EntryPasswordVerifierTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(EntryPassword)
+        super().setUpClass()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(EntryPassword)
+
+
+    def setUp(self):
+        cache.clear()
+        self.verifier = EntryPasswordVerifier()
+        self.row = EntryPassword.objects.create(entry_password = make_hash("open"), last_updated = time(12, 0))
+
+
+    def tearDown(self):
+        cache.clear()
+
+
+    def test_current_hash_is_loaded_once(self):
+        with self.assertNumQueries(1):
+            self.assertTrue(self.verifier.check("open"))
+            self.assertFalse(self.verifier.check("closed"))
+
+
+    def test_verified_password_skips_bcrypt(self):
+        self.assertTrue(self.verifier.check("open"))
+
+        with patch("apps.entry_password.verifier.check_password") as mock_check:
+            self.assertTrue(self.verifier.check("open"))
+            mock_check.assert_not_called()
+
+
+    def test_wrong_password_is_not_memoised(self):
+        self.verifier.check("closed")
+
+        with patch("apps.entry_password.verifier.check_password", return_value = False) as mock_check:
+            self.assertFalse(self.verifier.check("closed"))
+            mock_check.assert_called_once()
+
+
+    def test_rotation_in_another_process_is_picked_up(self):
+        self.assertTrue(self.verifier.check("open"))
+
+        EntryPassword.objects.filter(id = self.row.id).update(entry_password = make_hash("next"))
+        EntryPasswordVerifier().invalidate()
+
+        self.assertFalse(self.verifier.check("open"))
+        self.assertTrue(self.verifier.check("next"))
+
+
+    def test_rotation_at_same_time_of_day_changes_generation(self):
+        self.verifier.current()
+        EntryPassword.objects.filter(id = self.row.id).update(entry_password = make_hash("next"))
+
+        other_process = EntryPasswordVerifier()
+        other_process.invalidate()
+        other_process.current()
+
+        self.assertTrue(self.verifier.check("next"))
+
+
+    def test_missing_row_rejects(self):
+        EntryPassword.objects.all().delete()
+
+        self.assertFalse(self.verifier.check("open"))
@@ -0,0 +1,111 @@
+from datetime import timedelta
+from unittest.mock import patch
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from apps.mail_outbox.models import OutboxMessage
+from apps.mail_outbox.services import MailDispatcher, enqueue_letter
+from core.sidecar import SidecarClient
+from tests.core.fake_sidecar import FakeSidecar
+
+
+@override_settings(SIDECAR_BACKOFF=0, MAIL_OUTBOX_MAX_RECIPIENTS=2, MAIL_OUTBOX_MAX_ATTEMPTS=2)
+class MailDispatcherTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(OutboxMessage)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(OutboxMessage)
+
+    def setUp(self):
+        self.fake = FakeSidecar().__enter__()
+        self.client = SidecarClient(self.fake.url)
+        patcher = patch("apps.mail_outbox.services.sidecar", self.client)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.dispatcher = MailDispatcher()
+
+    def tearDown(self):
+        self.client.close()
+        self.fake.__exit__(None, None, None)
+
+    def statuses(self):
+        return dict(OutboxMessage.objects.values_list("email", "status"))
+
+    def test_enqueue_defers_sending_until_commit(self):
+        with self.captureOnCommitCallbacks() as callbacks:
+            enqueue_letter("Invite", "Hello", ["a@example.com", "a@example.com", "b@example.com"])
+
+        self.assertEqual(OutboxMessage.objects.count(), 2)
+        self.assertEqual(len(callbacks), 1)
+        self.assertEqual(self.fake.requests, [])
+
+    def test_messages_with_same_letter_share_calls(self):
+        self.fake.respond("POST", "/send_letter")
+        enqueue_letter("Invite", "Hello", ["a@example.com", "b@example.com", "c@example.com"])
+        enqueue_letter("Note", "Other", ["d@example.com"])
+
+        report = self.dispatcher.dispatch()
+
+        self.assertEqual(report["messages"], 4)
+        self.assertEqual(report["calls"], 3)
+        self.assertEqual(report["sent"], 4)
+        recipients = sorted(tuple(body["target_emails"]) for _, _, body in self.fake.requests)
+        self.assertEqual(
+            recipients,
+            [("a@example.com", "b@example.com"), ("c@example.com",), ("d@example.com",)],
+        )
+        self.assertEqual(set(self.statuses().values()), {"SENT"})
+
+    def test_failure_is_retried_later_then_marked_failed(self):
+        self.fake.respond("POST", "/send_letter", status=500)
+        enqueue_letter("Invite", "Hello", ["a@example.com"])
+
+        report = self.dispatcher.dispatch()
+
+        self.assertEqual(report["retried"], 1)
+        message = OutboxMessage.objects.get()
+        self.assertEqual(message.status, "PENDING")
+        self.assertGreater(message.next_attempt_at, timezone.now())
+        self.assertIn("500", message.last_error)
+
+        self.assertEqual(self.dispatcher.dispatch()["messages"], 0)
+
+        OutboxMessage.objects.update(next_attempt_at=timezone.now())
+        report = self.dispatcher.dispatch()
+
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(OutboxMessage.objects.get().status, "FAILED")
+
+    @override_settings(MAIL_OUTBOX_MAX_ATTEMPTS=5)
+    def test_retries_are_updated_per_attempt_count(self):
+        enqueue_letter("Invite", "Hello", ["a@example.com", "b@example.com", "c@example.com"])
+        messages = list(OutboxMessage.objects.order_by("id"))
+        for message, attempts in zip(messages, [1, 1, 2]):
+            message.attempts = attempts
+
+        with self.assertNumQueries(2):
+            retried, failed = self.dispatcher.mark_failed(messages, "boom")
+
+        self.assertEqual((retried, failed), (3, 0))
+        self.assertEqual(set(self.statuses().values()), {"PENDING"})
+        first, second, third = OutboxMessage.objects.order_by("id")
+        self.assertEqual(first.next_attempt_at, second.next_attempt_at)
+
+    def test_stale_claims_are_requeued(self):
+        self.fake.respond("POST", "/send_letter")
+        enqueue_letter("Invite", "Hello", ["a@example.com"])
+        OutboxMessage.objects.update(
+            status="SENDING", claimed_at=timezone.now() - timedelta(hours=1)
+        )
+
+        report = self.dispatcher.dispatch()
+
+        self.assertEqual(report["sent"], 1)
+        self.assertEqual(self.statuses(), {"a@example.com": "SENT"})
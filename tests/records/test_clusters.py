@@ -0,0 +1,131 @@
+from django.db import connection
+from unittest.mock import patch
+from django.core.cache import cache
+from django.test import TestCase
+from apps.records.clusters import (
+    MAX_ZOOM,
+    TILE_CELLS,
+    cell_of,
+    record_clusters,
+    tile_of,
+)
+from apps.records.models import Record, RecordActivityUser, RecordsState
+from apps.records.services import create_record, erase_all_records
+
+
+class RecordClusterIndexTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Record)
+            editor.create_model(RecordActivityUser)
+            editor.create_model(RecordsState)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(RecordsState)
+            editor.delete_model(RecordActivityUser)
+            editor.delete_model(Record)
+
+    def setUp(self):
+        record_clusters.invalidate()
+        self.create(49.8397, 24.0297, "UFO")
+        self.create(49.8420, 24.0325, "UFO")
+        self.create(49.8430, 24.0330, "Ghost")
+        self.create(-33.86, 151.2, "Ghost")
+
+    def tearDown(self):
+        cache.clear()
+
+    def create(self, x, y, record_type):
+        return create_record(
+            {
+                "name": "R",
+                "x": x,
+                "y": y,
+                "type": record_type,
+                "description": "desc",
+                "img_path": "/img.png",
+                "additional_info": "info",
+            }
+        )
+
+    def test_low_zoom_groups_nearby_records(self):
+        clusters = record_clusters.clusters(2)
+
+        self.assertEqual(sorted(c["count"] for c in clusters), [1, 3])
+        lviv = next(c for c in clusters if c["count"] == 3)
+        self.assertAlmostEqual(lviv["x"], (49.8397 + 49.8420 + 49.8430) / 3)
+        self.assertEqual(
+            lviv["top_types"],
+            [{"type": "UFO", "count": 2}, {"type": "Ghost", "count": 1}],
+        )
+
+    def test_bbox_limits_cells(self):
+        clusters = record_clusters.clusters(2, bbox=(40.0, 20.0, 55.0, 30.0))
+
+        self.assertEqual([c["count"] for c in clusters], [3])
+
+    def test_create_updates_cached_levels(self):
+        record_clusters.clusters(2)
+
+        self.create(49.84, 24.03, "UFO")
+        with self.assertNumQueries(0):
+            clusters = record_clusters.clusters(2)
+
+        self.assertEqual(sorted(c["count"] for c in clusters), [1, 4])
+
+    def test_incremental_matches_rebuild(self):
+        lviv = (49.0, 23.0, 50.0, 25.0)
+        record_clusters.clusters(12, bbox=lviv)
+        self.create(49.84, 24.03, "UFO")
+        incremental = record_clusters.clusters(12, bbox=lviv)
+
+        record_clusters.invalidate()
+        rebuilt = record_clusters.clusters(12, bbox=lviv)
+
+        self.assertEqual(len(rebuilt), len(incremental))
+        for expected, actual in zip(rebuilt, incremental):
+            self.assertEqual(actual["count"], expected["count"])
+            self.assertEqual(actual["top_types"], expected["top_types"])
+            self.assertAlmostEqual(actual["x"], expected["x"])
+            self.assertAlmostEqual(actual["y"], expected["y"])
+
+    def test_create_touches_one_tile_per_level(self):
+        record_clusters.clusters(12, bbox=(49.0, 23.0, 50.0, 25.0))
+
+        with patch.object(cache, "get_many", wraps=cache.get_many) as get_many:
+            self.create(49.84, 24.03, "UFO")
+
+        self.assertEqual(len(list(get_many.call_args.args[0])), MAX_ZOOM + 1)
+
+    def test_tiles_hold_only_their_cells(self):
+        record_clusters.clusters(12, bbox=(49.0, 23.0, 50.0, 25.0))
+        tile = tile_of(cell_of(49.8397, 24.0297, 12))
+
+        cells = record_clusters.build(12, [tile])[tile]
+
+        self.assertEqual(sum(cell[0] for cell in cells.values()), 3)
+        for cell_x, cell_y in cells:
+            self.assertEqual((cell_x // TILE_CELLS, cell_y // TILE_CELLS), tile)
+
+    def test_bbox_reads_only_overlapping_tiles(self):
+        record_clusters.clusters(12, bbox=(49.0, 23.0, 50.0, 25.0))
+
+        with self.assertNumQueries(0):
+            clusters = record_clusters.clusters(12, bbox=(49.83, 24.02, 49.85, 24.04))
+
+        self.assertEqual(sum(c["count"] for c in clusters), 3)
+
+    def test_too_many_tiles(self):
+        with self.assertRaises(ValueError):
+            record_clusters.clusters(MAX_ZOOM)
+
+    def test_erase_invalidates(self):
+        record_clusters.clusters(2)
+        erase_all_records()
+
+        self.assertEqual(record_clusters.clusters(2), [])
@@ -0,0 +1,94 @@
+import os
+import tempfile
+from django.test import SimpleTestCase
+from apps.records import derivatives
+from apps.records.derivatives import (
+    derivative_name,
+    generate_derivatives,
+    schedule_derivatives,
+)
+from apps.records.models import Record
+from apps.records.serializers import RecordSerializer
+
+
+class GenerateDerivativesTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def save(self, name, size, image_format):
+        derivatives.Image.new("RGB", size, "red").save(
+            os.path.join(self.image_dir, name), format=image_format
+        )
+
+    def dimensions(self, name):
+        with derivatives.Image.open(os.path.join(self.image_dir, name)) as image:
+            return image.size
+
+    def test_creates_each_size_keeping_aspect_ratio(self):
+        self.save("abc.jpg", (2000, 1000), "JPEG")
+
+        created = generate_derivatives("abc.jpg", self.image_dir)
+
+        self.assertEqual(created, ["abc-1024.jpg", "abc-256.jpg", "abc-64.jpg"])
+        self.assertEqual(self.dimensions("abc-1024.jpg"), (1024, 512))
+        self.assertEqual(self.dimensions("abc-256.jpg"), (256, 128))
+        self.assertEqual(self.dimensions("abc-64.jpg"), (64, 32))
+
+    def test_exif_orientation_is_applied(self):
+        exif = derivatives.Image.Exif()
+        exif[0x0112] = 6  # Orientation: rotate 90 degrees clockwise
+        derivatives.Image.new("RGB", (2000, 1000), "red").save(
+            os.path.join(self.image_dir, "phone.jpg"), format="JPEG", exif=exif
+        )
+
+        generate_derivatives("phone.jpg", self.image_dir)
+
+        self.assertEqual(self.dimensions("phone-1024.jpg"), (512, 1024))
+        self.assertEqual(self.dimensions("phone-64.jpg"), (32, 64))
+        with derivatives.Image.open(os.path.join(self.image_dir, "phone-256.jpg")) as image:
+            self.assertEqual(image.size, (128, 256))
+            self.assertNotIn(0x0112, image.getexif())
+
+    def test_small_images_are_not_upscaled(self):
+        self.save("small.png", (100, 50), "PNG")
+
+        generate_derivatives("small.png", self.image_dir)
+
+        self.assertEqual(self.dimensions("small-1024.png"), (100, 50))
+        self.assertEqual(self.dimensions("small-64.png"), (64, 32))
+
+    def test_existing_derivatives_are_skipped(self):
+        self.save("abc.png", (300, 300), "PNG")
+        generate_derivatives("abc.png", self.image_dir)
+
+        self.assertEqual(generate_derivatives("abc.png", self.image_dir), [])
+
+    def test_schedule_runs_in_worker_pool(self):
+        self.save("bg.png", (300, 300), "PNG")
+
+        schedule_derivatives("bg.png", self.image_dir).result(timeout=10)
+
+        self.assertTrue(
+            os.path.exists(os.path.join(self.image_dir, derivative_name("bg.png", 64)))
+        )
+
+
+class DerivativeUrlsTest(SimpleTestCase):
+    def test_serializer_exposes_derivatives_for_hashed_images(self):
+        record = Record(id=1, img_path="http://testserver/media/abc.png", img_hash="abc")
+
+        data = RecordSerializer(record).data
+
+        self.assertEqual(
+            data["img_derivatives"]["64"], "http://testserver/media/abc-64.png"
+        )
+        self.assertEqual(set(data["img_derivatives"]), {"64", "256", "1024"})
+
+    def test_legacy_records_have_no_derivatives(self):
+        record = Record(id=1, img_path="/path/img.png")
+
+        self.assertEqual(RecordSerializer(record).data["img_derivatives"], {})
@@ -0,0 +1,173 @@
+import os
+import tempfile
+import time
+from datetime import timedelta
+from unittest.mock import Mock, patch
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from rest_framework import status
+from django.utils import timezone
+from apps.records.erase import (
+    claim_erase_job,
+    create_erase_job,
+    get_erase_job,
+    run_erase_job,
+)
+from apps.records.erase import _save_progress
+from apps.records.models import EraseJob, Record, RecordActivityUser, RecordsState
+from apps.snapshot.services import get_watermark, make_token
+from enums.erase_jobs import EraseJobPhase, EraseJobStatus
+
+
+@override_settings(RECORD_ERASE_CHUNK_SIZE=2)
+@patch("apps.records.erase.save_new_entry_password")
+class EraseJobTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Record)
+            editor.create_model(RecordActivityUser)
+            editor.create_model(EraseJob)
+            editor.create_model(RecordsState)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(RecordsState)
+            editor.delete_model(EraseJob)
+            editor.delete_model(RecordActivityUser)
+            editor.delete_model(Record)
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image_dir = os.path.join(self.tmp.name, "shared", "images")
+        os.makedirs(self.image_dir)
+
+        override = override_settings(BASE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+        for i in range(5):
+            record = self.create_record()
+            RecordActivityUser.objects.create(user_id=1, record_id=record.id)
+            self.write_image(f"old-{i}.png", age=3600)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def create_record(self):
+        return Record.objects.create(
+            name="R",
+            x=1.0,
+            y=2.0,
+            type="UFO",
+            description="desc",
+            img_path="/img.png",
+            additional_info="info",
+        )
+
+    def write_image(self, name, age=0):
+        path = os.path.join(self.image_dir, name)
+        with open(path, "wb") as f:
+            f.write(b"image")
+        mtime = time.time() - age
+        os.utime(path, (mtime, mtime))
+
+    def test_erases_rows_and_files_that_existed_at_start(self, mock_password):
+        job = create_erase_job()
+        claim_erase_job(job)
+
+        newer = self.create_record()
+        self.write_image("new.png", age=-60)
+
+        job = run_erase_job(job)
+
+        self.assertEqual(job.status, EraseJobStatus.DONE.value)
+        self.assertEqual(job.phase, EraseJobPhase.DONE.value)
+        self.assertEqual(job.rows_deleted, 10)
+        self.assertEqual(job.files_deleted, 5)
+        self.assertEqual(list(Record.objects.values_list("id", flat=True)), [newer.id])
+        self.assertEqual(RecordActivityUser.objects.count(), 0)
+        self.assertEqual(os.listdir(self.image_dir), ["new.png"])
+        mock_password.assert_called_once()
+
+        stored = EraseJob.objects.get(id=job.id)
+        self.assertEqual(stored.status, EraseJobStatus.DONE.value)
+        self.assertEqual(stored.files_deleted, 5)
+
+    def test_resumes_from_stored_phase(self, mock_password):
+        job = create_erase_job()
+        job.phase = EraseJobPhase.FILES.value
+        job.save()
+
+        run_erase_job(job)
+
+        self.assertEqual(Record.objects.count(), 5)
+        self.assertEqual(os.listdir(self.image_dir), [])
+
+    def test_only_one_active_job(self, mock_password):
+        RecordsState.objects.create(id=1)
+        first = create_erase_job()
+
+        self.assertEqual(create_erase_job().id, first.id)
+        self.assertEqual(RecordsState.objects.get(id=1).erase_generation, 1)
+
+    def test_running_job_is_claimed_only_when_stale(self, mock_password):
+        job = create_erase_job()
+
+        self.assertTrue(claim_erase_job(job))
+        self.assertFalse(claim_erase_job(EraseJob.objects.get(id=job.id)))
+
+        EraseJob.objects.filter(id=job.id).update(
+            updated_at=timezone.now() - timedelta(minutes=10)
+        )
+        stale = EraseJob.objects.get(id=job.id)
+        self.assertTrue(claim_erase_job(stale))
+        self.assertFalse(claim_erase_job(EraseJob.objects.get(id=job.id)))
+
+    def test_token_taken_mid_erase_conflicts(self, mock_password):
+        RecordsState.objects.create(id=1)
+        job = create_erase_job()
+        claim_erase_job(job)
+        tokens = []
+
+        def save_progress(job, **counters):
+            _save_progress(job, **counters)
+            tokens.append(make_token(*get_watermark()))
+
+        with patch("apps.records.erase._save_progress", side_effect=save_progress):
+            run_erase_job(job)
+
+        response = self.client.get(reverse("records_backup"), {"since": tokens[0]})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    @patch("apps.records.erase.threading.Thread")
+    def test_polling_does_not_reclaim_stale_job(self, mock_thread, mock_password):
+        job = create_erase_job()
+        claim_erase_job(job)
+        stale_at = timezone.now() - timedelta(minutes=10)
+        EraseJob.objects.filter(id=job.id).update(updated_at=stale_at)
+
+        polled = get_erase_job(job.id)
+
+        self.assertEqual(polled.status, EraseJobStatus.RUNNING.value)
+        self.assertEqual(EraseJob.objects.get(id=job.id).updated_at, stale_at)
+        mock_thread.assert_not_called()
+
+    def test_failure_is_recorded(self, mock_password):
+        job = create_erase_job()
+
+        with patch.dict(
+            "apps.records.erase.PHASE_HANDLERS",
+            {EraseJobPhase.FILES.value: Mock(side_effect=RuntimeError("disk"))},
+        ):
+            job = run_erase_job(job)
+
+        stored = EraseJob.objects.get(id=job.id)
+        self.assertEqual(stored.status, EraseJobStatus.FAILED.value)
+        self.assertEqual(stored.phase, EraseJobPhase.FILES.value)
+        self.assertEqual(stored.error, "disk")
@@ -0,0 +1,73 @@
+import os
+import struct
+import tempfile
+import zlib
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import SimpleTestCase, override_settings
+from apps.records.images import InvalidImage, store_image
+
+
+def make_png(width, height, payload=b""):
+    ihdr = struct.pack(">IIBBBBB", width, height, 8, 2, 0, 0, 0)
+    chunk = b"IHDR" + ihdr
+    return (
+        b"\x89PNG\r\n\x1a\n"
+        + struct.pack(">I", len(ihdr))
+        + chunk
+        + struct.pack(">I", zlib.crc32(chunk))
+        + payload
+    )
+
+
+def make_jpeg(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc0" + struct.pack(">HBHHB", 11, 8, height, width, 1) + b"\x00" * 3
+    return b"\xff\xd8" + app0 + sof + b"\xff\xd9"
+
+
+class StoreImageTest(SimpleTestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image_dir = self.tmp.name
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def store(self, content, name="upload.bin"):
+        return store_image(SimpleUploadedFile(name, content), self.image_dir)
+
+    def test_png_is_stored_by_hash(self):
+        image = self.store(make_png(640, 480))
+
+        self.assertTrue(image["name"].endswith(".png"))
+        self.assertEqual(image["name"], f'{image["sha256"]}.png')
+        self.assertEqual((image["width"], image["height"]), (640, 480))
+        self.assertTrue(image["created"])
+        self.assertEqual(os.listdir(self.image_dir), [image["name"]])
+
+    def test_jpeg_dimensions(self):
+        image = self.store(make_jpeg(1024, 768))
+
+        self.assertTrue(image["name"].endswith(".jpg"))
+        self.assertEqual((image["width"], image["height"]), (1024, 768))
+
+    def test_duplicate_is_written_once(self):
+        first = self.store(make_png(10, 10), "a.png")
+        second = self.store(make_png(10, 10), "b.png")
+
+        self.assertEqual(first["name"], second["name"])
+        self.assertFalse(second["created"])
+        self.assertEqual(os.listdir(self.image_dir), [first["name"]])
+
+    def test_rejects_non_images_without_leftovers(self):
+        with self.assertRaises(InvalidImage):
+            self.store(b"fake image data")
+
+        self.assertEqual(os.listdir(self.image_dir), [])
+
+    @override_settings(RECORD_IMAGE_MAX_BYTES=100)
+    def test_rejects_oversized_upload(self):
+        with self.assertRaises(InvalidImage):
+            self.store(make_png(10, 10, payload=b"\x00" * 200))
+
+        self.assertEqual(os.listdir(self.image_dir), [])
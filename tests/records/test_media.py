@@ -0,0 +1,97 @@
+import os
+import tempfile
+from django.test import TestCase, override_settings
+from django.urls import reverse
+
+
+HASH = "a" * 64
+
+
+class MediaViewTest(TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.image_dir = os.path.join(self.tmp.name, "shared", "images")
+        os.makedirs(self.image_dir)
+
+        self.content = bytes(range(256)) * 4
+        with open(os.path.join(self.image_dir, f"{HASH}.png"), "wb") as f:
+            f.write(self.content)
+
+        override = override_settings(BASE_DIR=self.tmp.name)
+        override.enable()
+        self.addCleanup(override.disable)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def get(self, name, **headers):
+        return self.client.get(reverse("media", args=[name]), headers=headers)
+
+    def test_serves_file_with_cache_headers(self):
+        response = self.get(f"{HASH}.png")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["ETag"], f'"{HASH}"')
+        self.assertIn("immutable", response["Cache-Control"])
+        self.assertEqual(response["Accept-Ranges"], "bytes")
+        self.assertIn("Last-Modified", response)
+
+    def test_if_none_match_returns_304(self):
+        response = self.get(f"{HASH}.png", if_none_match=f'"{HASH}"')
+
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], f'"{HASH}"')
+
+    def test_if_modified_since_returns_304(self):
+        last_modified = self.get(f"{HASH}.png")["Last-Modified"]
+
+        response = self.get(f"{HASH}.png", if_modified_since=last_modified)
+
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_range(self):
+        response = self.get(f"{HASH}.png", range="bytes=10-19")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+        self.assertEqual(response["Content-Length"], "10")
+
+    def test_suffix_range(self):
+        response = self.get(f"{HASH}.png", range="bytes=-5")
+
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b"".join(response.streaming_content), self.content[-5:])
+
+    def test_unsatisfiable_range(self):
+        response = self.get(f"{HASH}.png", range="bytes=5000-")
+
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response["Content-Range"], f"bytes */{len(self.content)}")
+
+    def test_stale_if_range_serves_full_file(self):
+        response = self.get(f"{HASH}.png", range="bytes=0-9", if_range='"stale"')
+
+        self.assertEqual(response.status_code, 200)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT_PREFIX="/protected-media/")
+    def test_accel_redirect_offload(self):
+        response = self.get(f"{HASH}.png")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response["X-Accel-Redirect"], f"/protected-media/{HASH}.png")
+        self.assertEqual(response.content, b"")
+
+    def test_missing_derivative_falls_back_to_original(self):
+        response = self.get(f"{HASH}-64.png")
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertNotIn("immutable", response["Cache-Control"])
+
+    def test_missing_and_hidden_files_are_404(self):
+        open(os.path.join(self.image_dir, ".upload-x"), "wb").close()
+
+        self.assertEqual(self.get("missing.png").status_code, 404)
+        self.assertEqual(self.get(".upload-x").status_code, 404)
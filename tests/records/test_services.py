@@ -1,41 +1,63 @@
 from unittest.mock import patch, Mock
+from django.db import connection
 from django.test import TestCase
+from apps.records.models import Record, RecordActivityUser
 from apps.records.services import (
     get_all_records,
     erase_all_records,
     get_record_by_id,
     create_record,
+    like_record,
+    unlike_record,
+    reconcile_likes_count,
+    filter_records,
 )
+from apps.records.spatial import parse_bbox
 
 
 class GetAllRecordsTest(TestCase):
     @patch("apps.records.services.RecordActivityUser.objects")
     @patch("apps.records.services.Record.objects")
-    def test_get_all_records_calls_all(
+    def test_get_all_records_reads_likes_column(
         self, mock_record_objects, mock_activity_user_objects
     ):
         record1 = Mock()
         record1.id = 1
+        record1.likes_count = 5
         record2 = Mock()
         record2.id = 2
+        record2.likes_count = 7
         mock_record_objects.all.return_value = [record1, record2]
-        mock_activity_user_objects.filter.return_value.values.return_value.annotate.return_value = [
-            {"record_id": 1, "count": 5},
-            {"record_id": 2, "count": 7},
-        ]
 
         result = get_all_records()
 
         mock_record_objects.all.assert_called_once()
-        mock_activity_user_objects.filter.assert_called_once_with(like_status=True)
+        mock_activity_user_objects.filter.assert_not_called()
         self.assertEqual(record1.likes_count, 5)
-        self.assertEqual(record2.likes_count, 7)
+        self.assertFalse(record2.liked_by_user)
         self.assertEqual(result, [record1, record2])
 
+    @patch("apps.records.services.RecordActivityUser.objects")
+    def test_get_all_records_overlays_liked_ids(self, mock_activity_user_objects):
+        record1 = Mock(id=1)
+        record2 = Mock(id=2)
+        likes = mock_activity_user_objects.filter.return_value
+        likes.filter.return_value.values_list.return_value = [2]
+
+        result = get_all_records([record1, record2], user_id=7)
+
+        mock_activity_user_objects.filter.assert_called_once_with(
+            user_id=7, like_status=True
+        )
+        likes.filter.assert_called_once_with(record_id__in=[1, 2])
+        self.assertFalse(result[0].liked_by_user)
+        self.assertTrue(result[1].liked_by_user)
+
 
 class CreateRecordTest(TestCase):
+    @patch("apps.records.services.record_clusters")
     @patch("apps.records.services.Record.objects.create")
-    def test_create_record_calls_create_with_data(self, mock_create):
+    def test_create_record_calls_create_with_data(self, mock_create, mock_clusters):
         data = {
             "name": "New record",
             "x": 3.0,
@@ -50,7 +72,8 @@ class CreateRecordTest(TestCase):
 
         result = create_record(data)
 
-        mock_create.assert_called_once_with(**data)
+        mock_create.assert_called_once_with(**data, grid_x=300, grid_y=400)
+        mock_clusters.add.assert_called_once_with(mock_record)
         self.assertEqual(result, mock_record)
 
 
@@ -61,23 +84,25 @@ class GetRecordByIdTest(TestCase):
         self, mock_record_objects, mock_activity_user_objects
     ):
         mock_record = mock_record_objects.get.return_value
-        mock_activity_user_objects.filter.return_value.count.return_value = 3
 
-        result = get_record_by_id(5)
+        result = get_record_by_id(5, user_id=2)
 
         mock_record_objects.get.assert_called_once_with(id=5)
         mock_activity_user_objects.filter.assert_called_once_with(
-            record_id=5, like_status=True
+            record_id=5, user_id=2, like_status=True
         )
         self.assertEqual(result, mock_record)
 
+    @patch("apps.records.services.bump_erase_generation")
     @patch("apps.records.services.RecordActivityUser.objects")
     @patch("apps.records.services.Record.objects")
     def test_erase_all_records_deletes_all(
-        self, mock_record_objects, mock_activity_user_objects
+        self, mock_record_objects, mock_activity_user_objects, mock_bump
     ):
         erase_all_records()
 
+        mock_bump.assert_called_once()
+
         mock_record_objects.all.assert_called_once()
         mock_record_objects.all.return_value.delete.assert_called_once()
 
@@ -85,39 +110,140 @@ class GetRecordByIdTest(TestCase):
         mock_activity_user_objects.all.return_value.delete.assert_called_once()
 
 
-class LikeRecordTest(TestCase):
-    @patch("apps.records.services.RecordActivityUser.objects")
-    @patch("apps.records.services.Record.objects")
-    def test_like_record_creates_or_updates_like(
-        self, mock_record_objects, mock_activity_user_objects
-    ):
-        mock_record_objects.get.return_value = Mock()
-        mock_activity_user_objects.filter.return_value.count.return_value = 5
+class LikesCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Record)
+            editor.create_model(RecordActivityUser)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(RecordActivityUser)
+            editor.delete_model(Record)
+
+    def setUp(self):
+        self.record = Record.objects.create(
+            name="R1",
+            x=1.0,
+            y=2.0,
+            type="UFO",
+            description="desc",
+            img_path="/img.png",
+            additional_info="info",
+        )
+
+    def test_like_increments_once_per_user(self):
+        self.assertEqual(
+            like_record(user_id=1, record_id=self.record.id),
+            {"likes_count": 1, "liked_by_user": True},
+        )
+        self.assertEqual(
+            like_record(user_id=1, record_id=self.record.id),
+            {"likes_count": 1, "liked_by_user": True},
+        )
+        self.assertEqual(like_record(user_id=2, record_id=self.record.id)["likes_count"], 2)
 
-        from apps.records.services import like_record
+    def test_like_flips_inactive_activity(self):
+        RecordActivityUser.objects.create(
+            user_id=1, record_id=self.record.id, like_status=False
+        )
 
-        result = like_record(user_id=10, record_id=3)
+        result = like_record(user_id=1, record_id=self.record.id)
 
-        mock_record_objects.get.assert_called_once_with(id=3)
-        mock_activity_user_objects.update_or_create.assert_called_once_with(
-            user_id=10,
-            record_id=3,
-            defaults={"like_status": True},
+        self.assertEqual(result["likes_count"], 1)
+        self.assertTrue(
+            RecordActivityUser.objects.get(user_id=1, record_id=self.record.id).like_status
         )
-        self.assertEqual(result, {"likes_count": 5, "liked_by_user": True})
 
+    def test_like_missing_record(self):
+        self.assertIsNone(like_record(user_id=1, record_id=self.record.id + 1))
+        self.assertEqual(RecordActivityUser.objects.count(), 0)
 
-class UnlikeRecordTest(TestCase):
-    @patch("apps.records.services.RecordActivityUser.objects")
-    def test_unlike_record_deletes_and_returns_updated_count(
-        self, mock_activity_user_objects
-    ):
-        mock_activity_user_objects.filter.return_value.count.return_value = 2
+    def test_like_inserts_without_a_locking_read(self):
+        with patch("django.db.models.QuerySet.select_for_update") as mock_lock:
+            like_record(user_id=1, record_id=self.record.id)
+            like_record(user_id=1, record_id=self.record.id)
+
+        mock_lock.assert_not_called()
+        self.assertEqual(Record.objects.get(id=self.record.id).likes_count, 1)
+
+    def test_unlike_decrements_only_existing_like(self):
+        like_record(user_id=1, record_id=self.record.id)
+        like_record(user_id=2, record_id=self.record.id)
 
-        from apps.records.services import unlike_record
+        self.assertEqual(
+            unlike_record(user_id=1, record_id=self.record.id),
+            {"likes_count": 1, "liked_by_user": False},
+        )
+        self.assertEqual(unlike_record(user_id=1, record_id=self.record.id)["likes_count"], 1)
+
+    def test_reconcile_repairs_drift(self):
+        RecordActivityUser.objects.create(user_id=1, record_id=self.record.id)
+        RecordActivityUser.objects.create(user_id=2, record_id=self.record.id)
+        RecordActivityUser.objects.create(
+            user_id=3, record_id=self.record.id, like_status=False
+        )
+
+        self.assertEqual(reconcile_likes_count(), 1)
+        self.assertEqual(Record.objects.get(id=self.record.id).likes_count, 2)
+        self.assertEqual(reconcile_likes_count(), 0)
+
+
+class BboxFilterTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Record)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(Record)
+
+    def setUp(self):
+        for name, x, y in [
+            ("inside", 49.8397, 24.0297),
+            ("edge", 49.85, 24.04),
+            ("same_cell_outside", 49.8391, 24.0201),
+            ("far", 50.45, 30.52),
+            ("negative", -0.005, -0.005),
+        ]:
+            create_record(
+                {
+                    "name": name,
+                    "x": x,
+                    "y": y,
+                    "type": "UFO",
+                    "description": "desc",
+                    "img_path": "/img.png",
+                    "additional_info": "info",
+                }
+            )
+
+    def names(self, bbox):
+        return [r.name for r in filter_records(bbox=bbox)]
+
+    def test_returns_only_records_in_view(self):
+        self.assertEqual(
+            self.names((49.83, 24.025, 49.85, 24.04)), ["inside", "edge"]
+        )
+
+    def test_wide_bbox_falls_back_to_grid_range(self):
+        self.assertEqual(
+            self.names((-1.0, -1.0, 60.0, 60.0)),
+            ["inside", "edge", "same_cell_outside", "far", "negative"],
+        )
 
-        result = unlike_record(user_id=1, record_id=5)
+    def test_negative_coordinates(self):
+        self.assertEqual(self.names((-0.01, -0.01, 0.0, 0.0)), ["negative"])
 
-        mock_activity_user_objects.filter.assert_any_call(user_id=1, record_id=5)
-        mock_activity_user_objects.filter.return_value.delete.assert_called_once()
-        self.assertEqual(result, {"likes_count": 2, "liked_by_user": False})
+    def test_parse_bbox_rejects_bad_input(self):
+        for value in ["1,2,3", "a,b,c,d", "3,0,1,1", "nan,0,1,1"]:
+            with self.assertRaises(ValueError):
+                parse_bbox(value)
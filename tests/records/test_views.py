@@ -6,11 +6,15 @@ from io import BytesIO
 from django.conf import settings
 import tempfile
 import jwt
+from api.pagination import KeysetPagination
+from apps.records.models import EraseJob
+from tests.records.test_images import make_png
 
 
 class RecordListViewTest(APITestCase):
+    @patch("apps.records.views.filter_records")
     @patch("apps.records.views.get_all_records")
-    def test_get_records_success(self, mock_get_all_records):
+    def test_get_records_success(self, mock_get_all_records, mock_filter_records):
         mock_get_all_records.return_value = [
             type(
                 "Record",
@@ -35,10 +39,77 @@ class RecordListViewTest(APITestCase):
         self.assertEqual(response.data["status"], "OK")
         self.assertEqual(len(response.data["data"]), 1)
 
+    @patch("apps.records.views.filter_records")
+    @patch("apps.records.views.get_all_records")
+    def test_get_records_passes_token_user(self, mock_get_all_records, mock_filter_records):
+        mock_get_all_records.return_value = []
+        token = jwt.encode({"id": 7}, settings.SECRET_KEY, algorithm="HS256")
+
+        url = reverse("records-all")
+        response = self.client.get(url, HTTP_AUTHORIZATION=f"Bearer {token}")
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(mock_get_all_records.call_args.kwargs["user_id"], 7)
+
+    @patch("apps.records.views.filter_records")
+    @patch("apps.records.views.get_all_records")
+    def test_get_records_without_params_is_capped(self, mock_get_all_records, mock_filter_records):
+        mock_get_all_records.return_value = []
+        ordered = mock_filter_records.return_value.order_by.return_value
+
+        url = reverse("records-all")
+        response = self.client.get(url)
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["next"])
+        ordered.__getitem__.assert_called_once_with(
+            slice(None, KeysetPagination.default_limit + 1)
+        )
+
+    def test_get_records_invalid_bbox(self):
+        url = reverse("records-all")
+        response = self.client.get(url, {"bbox": "1,2,3"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["status"], "ERROR")
+
+
+class RecordClusterViewTest(APITestCase):
+    @patch("apps.records.views.record_clusters")
+    def test_get_clusters_success(self, mock_clusters):
+        mock_clusters.clusters.return_value = [
+            {"count": 2, "x": 1.0, "y": 2.0, "top_types": []}
+        ]
+
+        url = reverse("records-clusters")
+        response = self.client.get(url, {"zoom": 3, "bbox": "0,0,10,10"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"][0]["count"], 2)
+        mock_clusters.clusters.assert_called_once_with(3, bbox=(0.0, 0.0, 10.0, 10.0))
+
+    @patch("apps.records.views.record_clusters")
+    def test_get_clusters_bbox_too_large(self, mock_clusters):
+        mock_clusters.clusters.side_effect = ValueError("bbox is too large for zoom 20")
+
+        url = reverse("records-clusters")
+        response = self.client.get(url, {"zoom": 20})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["status"], "ERROR")
+
+    def test_get_clusters_invalid_zoom(self):
+        url = reverse("records-clusters")
+
+        for params in [{}, {"zoom": "a"}, {"zoom": 99}]:
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
 
 class RecordCreateViewTest(APITestCase):
+    @patch("apps.records.views.schedule_derivatives")
     @patch("apps.records.views.create_record")
-    def test_create_record_success(self, mock_create_record):
+    def test_create_record_success(self, mock_create_record, mock_schedule):
         settings.BASE_DIR = tempfile.gettempdir()
 
         mock_record = MagicMock()
@@ -52,7 +123,7 @@ class RecordCreateViewTest(APITestCase):
         mock_record.additional_info = "info"
         mock_create_record.return_value = mock_record
 
-        img = BytesIO(b"fake image data")
+        img = BytesIO(make_png(1, 1))
         img.name = "test.png"
 
         url = reverse("records-create")
@@ -73,6 +144,23 @@ class RecordCreateViewTest(APITestCase):
         self.assertEqual(
             response.data["notification"], "Record created successfully")
         mock_create_record.assert_called_once()
+        record_data = mock_create_record.call_args.args[0]
+        self.assertEqual((record_data["img_width"], record_data["img_height"]), (1, 1))
+        mock_schedule.assert_called_once()
+
+    def test_create_record_rejects_non_image(self):
+        settings.BASE_DIR = tempfile.gettempdir()
+
+        img = BytesIO(b"fake image data")
+        img.name = "test.png"
+
+        url = reverse("records-create")
+        data = {"name": "R1", "x": 1.0, "y": 2.0, "type": "UFO", "img": img}
+
+        response = self.client.post(url, data, format="multipart")
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["status"], "ERROR")
 
     def test_create_record_missing_image(self):
         settings.BASE_DIR = tempfile.gettempdir()
@@ -146,15 +234,41 @@ class RecordEraseViewTest(APITestCase):
             {"role": "GoldMason"}, settings.SECRET_KEY, algorithm="HS256"
         )
 
-    @patch("apps.records.views.erase_all_records")
-    def test_erase_records_success(self, mock_erase_all):
+    @patch("apps.records.views.start_erase_job")
+    def test_erase_records_starts_job(self, mock_start):
+        mock_start.return_value = EraseJob(id=3, status="PENDING", phase="ROWS")
+
         response = self.client.post(
             self.url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
 
-        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
         self.assertEqual(response.data["status"], "OK")
-        self.assertIn("All records erased", response.data["notification"])
-        mock_erase_all.assert_called_once()
+        self.assertEqual(response.data["data"]["id"], 3)
+        mock_start.assert_called_once()
+
+    @patch("apps.records.views.get_erase_job")
+    def test_erase_status(self, mock_get_job):
+        mock_get_job.return_value = EraseJob(
+            id=3, status="RUNNING", phase="FILES", files_deleted=7
+        )
+
+        response = self.client.get(
+            reverse("records-erase-status", args=[3]),
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["data"]["files_deleted"], 7)
+        mock_get_job.assert_called_once_with(3)
+
+    @patch("apps.records.views.get_erase_job", return_value=None)
+    def test_erase_status_not_found(self, mock_get_job):
+        response = self.client.get(
+            reverse("records-erase-status", args=[3]),
+            HTTP_AUTHORIZATION=f"Bearer {self.token}",
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
 
     def test_erase_records_missing_token(self):
         response = self.client.post(self.url)
@@ -180,6 +294,13 @@ class RecordEraseViewTest(APITestCase):
         self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
         self.assertIn("Token expired", response.data["notification"])
 
+    @patch("apps.records.views.token_revocations.is_revoked", return_value=True)
+    def test_erase_records_revoked_token(self, mock_is_revoked):
+        response = self.client.post(
+            self.url, HTTP_AUTHORIZATION=f"Bearer {self.token}")
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.assertIn("Token revoked", response.data["notification"])
+
     def test_erase_records_forbidden_role(self):
         token = jwt.encode(
             {"role": "WithoutRole"}, settings.SECRET_KEY, algorithm="HS256"
@@ -0,0 +1,78 @@
+import io
+from django.core.management import call_command
+from django.test import SimpleTestCase
+from apps.snapshot import binary
+from apps.snapshot.services import InvalidSnapshot, iter_binary
+
+
+def make_row(record_id, record_type="UFO", name="R"):
+    return {
+        "id": record_id,
+        "name": name,
+        "x": 49.8397 + record_id,
+        "y": -24.0297,
+        "type": record_type,
+        "description": "",
+        "img_path": "/img.png",
+        "additional_info": "info",
+    }
+
+
+class BinarySnapshotTest(SimpleTestCase):
+    def encode(self, chunks, meta=None):
+        return b"".join(binary.encode_records(chunks, meta=meta))
+
+    def decode(self, data):
+        return list(iter_binary(io.BytesIO(data)))
+
+    def test_round_trip(self):
+        chunks = [
+            [make_row(1, "UFO", "Запис"), make_row(2, "Ghost")],
+            [make_row(3, "UFO")],
+        ]
+
+        rows = self.decode(self.encode(chunks))
+
+        self.assertEqual(rows, [row for chunk in chunks for row in chunk])
+
+    def test_meta_becomes_a_snapshot_row(self):
+        rows = self.decode(self.encode([[make_row(1)]], meta={"base": None, "token": "t"}))
+
+        self.assertEqual(rows[0], {"snapshot": {"base": None, "token": "t"}})
+        self.assertEqual(rows[1]["id"], 1)
+
+    def test_empty_snapshot(self):
+        self.assertEqual(self.decode(self.encode([])), [])
+
+    def test_type_is_dictionary_encoded(self):
+        block = binary.encode_block([make_row(i, "Anomaly") for i in range(100)])
+
+        self.assertEqual(block.count(b"Anomaly"), 1)
+
+    def test_corruption_is_detected(self):
+        data = bytearray(self.encode([[make_row(1)]]))
+        data[40] ^= 0xFF
+
+        with self.assertRaises(InvalidSnapshot):
+            self.decode(bytes(data))
+
+    def test_rejects_other_files_and_truncation(self):
+        data = self.encode([[make_row(1)]])
+
+        for broken in [b"{}", data[:-3], data[:10]]:
+            with self.assertRaises(InvalidSnapshot):
+                self.decode(broken)
+
+    def test_rejects_unknown_version(self):
+        data = bytearray(self.encode([]))
+        data[4] = 9
+
+        with self.assertRaises(InvalidSnapshot):
+            self.decode(bytes(data))
+
+    def test_benchmark_command_runs(self):
+        out = io.StringIO()
+
+        call_command("benchmark_snapshot_formats", rows=50, stdout=out)
+
+        self.assertIn("binary", out.getvalue())
@@ -1,6 +1,27 @@
+import gzip
+import io
+import json
 from unittest.mock import patch
+from django.db import DatabaseError, connection
 from django.test import TestCase
-from apps.snapshot.services import get_all_records
+from apps.records.models import Record as StoredRecord, RecordActivityUser, RecordsState
+from apps.snapshot.models import Record
+from apps.snapshot.services import (
+    EXPORT_FIELDS,
+    InvalidSnapshot,
+    _write_batch,
+    get_watermark,
+    iter_json_array,
+    iter_ndjson,
+    make_token,
+    parse_token,
+    restore_records,
+    get_all_records,
+    gzip_stream,
+    iter_record_chunks,
+    stream_records_json,
+    stream_records_ndjson,
+)
 
 
 class GetAllRecordsTest(TestCase):
@@ -11,4 +32,272 @@ class GetAllRecordsTest(TestCase):
         result = get_all_records()
 
         mock_objects.all.assert_called_once()
-        self.assertEqual(result, mock_queryset)
\ No newline at end of file
+        self.assertEqual(result, mock_queryset)
+
+class StreamRecordsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(Record)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(Record)
+
+    def create_records(self, count):
+        for i in range(count):
+            Record.objects.create(
+                name=f"Запис {i}",
+                x=float(i),
+                y=2.0,
+                type="UFO",
+                description="desc",
+                img_path="/img.png",
+                additional_info="info",
+            )
+
+    def test_chunks_follow_id_order(self):
+        self.create_records(5)
+
+        chunks = list(iter_record_chunks(chunk_size=2))
+
+        self.assertEqual([len(chunk) for chunk in chunks], [2, 2, 1])
+        self.assertEqual(
+            [row["name"] for chunk in chunks for row in chunk],
+            [f"Запис {i}" for i in range(5)],
+        )
+
+    def test_ndjson_has_one_record_per_line(self):
+        self.create_records(3)
+
+        lines = b"".join(stream_records_ndjson(chunk_size=2)).decode().splitlines()
+
+        self.assertEqual(len(lines), 3)
+        self.assertEqual(json.loads(lines[2])["name"], "Запис 2")
+        self.assertEqual(set(json.loads(lines[0])), set(EXPORT_FIELDS))
+
+    def test_json_stream_is_a_valid_array(self):
+        self.create_records(3)
+
+        data = json.loads(b"".join(stream_records_json(chunk_size=2)))
+
+        self.assertEqual([row["x"] for row in data], [0.0, 1.0, 2.0])
+
+    def test_diff_covers_ids_between_tokens(self):
+        self.create_records(5)
+        ids = list(Record.objects.order_by("id").values_list("id", flat=True))
+
+        lines = b"".join(
+            stream_records_ndjson(
+                since_id=ids[1], until_id=ids[3], header={"base": "a", "token": "b"}
+            )
+        ).decode().splitlines()
+
+        self.assertEqual(json.loads(lines[0]), {"snapshot": {"base": "a", "token": "b"}})
+        self.assertEqual([json.loads(line)["id"] for line in lines[1:]], ids[2:4])
+
+    def test_token_round_trip(self):
+        self.assertEqual(parse_token(make_token(3, 120)), (3, 120))
+
+        with self.assertRaises(InvalidSnapshot):
+            parse_token("not a token")
+
+    def test_json_stream_of_empty_table(self):
+        self.assertEqual(json.loads(b"".join(stream_records_json())), [])
+
+    def test_gzip_stream_round_trips(self):
+        self.create_records(3)
+
+        compressed = b"".join(gzip_stream(stream_records_ndjson(chunk_size=1)))
+
+        self.assertEqual(
+            gzip.decompress(compressed), b"".join(stream_records_ndjson())
+        )
+
+
+class RestoreRecordsTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(StoredRecord)
+            editor.create_model(RecordActivityUser)
+            editor.create_model(RecordsState)
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(RecordsState)
+            editor.delete_model(RecordActivityUser)
+            editor.delete_model(StoredRecord)
+
+    def row(self, record_id=None, name="R", x=49.84, y=24.03):
+        row = {
+            "name": name,
+            "x": x,
+            "y": y,
+            "type": "UFO",
+            "description": "desc",
+            "img_path": "/img.png",
+            "additional_info": "info",
+        }
+        if record_id is not None:
+            row["id"] = record_id
+        return row
+
+    def test_append_writes_in_chunks_and_reports_failures(self):
+        rows = [self.row(name=f"R{i}") for i in range(5)]
+        rows[3] = {"name": "broken"}
+
+        report = restore_records(iter(rows), mode="append", chunk_size=2)
+
+        self.assertEqual(report["written"], 4)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual([c["written"] for c in report["chunks"]], [2, 1, 1])
+        self.assertEqual(report["chunks"][1]["errors"][0]["index"], 3)
+        self.assertEqual(StoredRecord.objects.count(), 4)
+
+        record = StoredRecord.objects.get(name="R0")
+        self.assertEqual((record.grid_x, record.grid_y), (4984, 2403))
+
+    def test_upsert_updates_existing_and_inserts_missing(self):
+        restore_records(iter([self.row(1, "old")]), mode="upsert")
+
+        report = restore_records(
+            iter([self.row(1, "new", x=1.0), self.row(2, "added")]), mode="upsert"
+        )
+
+        self.assertEqual(report["written"], 2)
+        self.assertEqual(
+            list(StoredRecord.objects.order_by("id").values_list("id", "name")),
+            [(1, "new"), (2, "added")],
+        )
+        self.assertEqual(StoredRecord.objects.get(id=1).grid_x, 100)
+
+    @patch("apps.snapshot.services.StoredRecord.objects.bulk_create")
+    @patch("apps.snapshot.services.connection")
+    def test_upsert_on_mysql_has_no_conflict_target(self, mock_connection, mock_bulk_create):
+        mock_connection.features.supports_update_conflicts_with_target = False
+
+        restore_records(iter([self.row(1)]), mode="upsert")
+
+        kwargs = mock_bulk_create.call_args.kwargs
+        self.assertTrue(kwargs["update_conflicts"])
+        self.assertNotIn("unique_fields", kwargs)
+        self.assertIn("name", kwargs["update_fields"])
+
+    def test_upsert_requires_ids(self):
+        report = restore_records(iter([self.row()]), mode="upsert")
+
+        self.assertEqual(report["failed"], 1)
+        self.assertIn("id", report["chunks"][0]["errors"][0]["errors"])
+
+    def test_replace_drops_existing_rows(self):
+        restore_records(iter([self.row(1), self.row(2)]), mode="upsert")
+        RecordActivityUser.objects.create(user_id=1, record_id=1)
+
+        restore_records(iter([self.row(5, "only")]), mode="replace")
+
+        self.assertEqual(list(StoredRecord.objects.values_list("id", flat=True)), [5])
+        self.assertEqual(RecordActivityUser.objects.count(), 0)
+
+    def test_malformed_replace_keeps_existing_rows(self):
+        restore_records(iter([self.row(1), self.row(2)]), mode="upsert")
+        RecordActivityUser.objects.create(user_id=1, record_id=1)
+        upload = io.BytesIO(json.dumps(self.row(5)).encode() + b"\n{not json\n")
+
+        with self.assertRaises(InvalidSnapshot):
+            restore_records(iter_ndjson(upload), mode="replace")
+
+        self.assertEqual(list(StoredRecord.objects.values_list("id", flat=True)), [1, 2])
+        self.assertEqual(RecordActivityUser.objects.count(), 1)
+
+    def test_rejected_replace_chunk_keeps_existing_rows(self):
+        restore_records(iter([self.row(1)]), mode="upsert")
+
+        with patch(
+            "apps.snapshot.services._write_batch", side_effect=DatabaseError("boom")
+        ):
+            report = restore_records(iter([self.row(5)]), mode="replace")
+
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(list(StoredRecord.objects.values_list("id", flat=True)), [1])
+
+    def test_unknown_mode(self):
+        with self.assertRaises(InvalidSnapshot):
+            restore_records(iter([]), mode="merge")
+
+    def test_rewrites_bump_the_erase_generation(self):
+        RecordsState.objects.create(id=1)
+
+        restore_records(iter([self.row(1)]), mode="upsert")
+        restore_records(iter([self.row(2)]), mode="replace")
+        restore_records(iter([self.row()]), mode="append")
+
+        # Upsert and replace each bump before and after their writes.
+        self.assertEqual(RecordsState.objects.get(id=1).erase_generation, 4)
+
+    def test_token_taken_between_upsert_chunks_goes_stale(self):
+        RecordsState.objects.create(id=1)
+        generations = []
+
+        def write_batch(records, mode):
+            written = _write_batch(records, mode)
+            generations.append(get_watermark()[0])
+            return written
+
+        with patch("apps.snapshot.services._write_batch", side_effect=write_batch):
+            restore_records(iter([self.row(1), self.row(2)]), mode="upsert", chunk_size=1)
+
+        self.assertNotEqual(get_watermark()[0], generations[0])
+
+    def test_applies_a_chain_of_diffs(self):
+        rows = [
+            {"snapshot": {"base": None, "token": "t1"}},
+            self.row(1),
+            {"snapshot": {"base": "t1", "token": "t2"}},
+            self.row(2),
+            {"snapshot": {"base": "t2", "token": "t3"}},
+        ]
+
+        report = restore_records(iter(rows), mode="upsert")
+
+        self.assertEqual(report["written"], 2)
+        self.assertEqual(report["token"], "t3")
+
+    def test_broken_chain_stops_the_restore(self):
+        rows = [
+            {"snapshot": {"base": None, "token": "t1"}},
+            self.row(1),
+            {"snapshot": {"base": "t2", "token": "t3"}},
+            self.row(2),
+        ]
+
+        with self.assertRaises(InvalidSnapshot) as ctx:
+            restore_records(iter(rows), mode="upsert", chunk_size=1)
+
+        self.assertEqual(ctx.exception.report["written"], 1)
+        self.assertEqual(list(StoredRecord.objects.values_list("id", flat=True)), [1])
+
+
+class StreamingParseTest(TestCase):
+    def test_json_array_across_read_boundaries(self):
+        data = json.dumps([{"name": "Запис", "x": 1.5}, {"name": "B"}], ensure_ascii=False)
+
+        for read_size in (1, 3, 7, 1024):
+            rows = list(iter_json_array(io.BytesIO(data.encode()), read_size))
+            self.assertEqual(rows, [{"name": "Запис", "x": 1.5}, {"name": "B"}])
+
+    def test_json_array_rejects_non_lists(self):
+        for data in [b'{"a": 1}', b"[1,", b"[1 2]", b"[1] x", b""]:
+            with self.assertRaises(InvalidSnapshot):
+                list(iter_json_array(io.BytesIO(data), 2))
+
+    def test_ndjson(self):
+        data = b'{"a": 1}\n\n{"b": 2}'
+
+        self.assertEqual(list(iter_ndjson(io.BytesIO(data), 3)), [{"a": 1}, {"b": 2}])
@@ -0,0 +1,157 @@
+import gzip
+import json
+from unittest.mock import Mock, patch
+from django.urls import reverse
+from rest_framework import status
+from rest_framework.test import APITestCase
+from apps.snapshot import binary
+from apps.snapshot.services import make_token
+
+
+class RecordsBackupViewTest(APITestCase):
+    def setUp(self):
+        self.url = reverse("records_backup")
+
+        watermark = patch("apps.snapshot.views.get_watermark", return_value=(2, 40))
+        watermark.start()
+        self.addCleanup(watermark.stop)
+
+    @patch("apps.snapshot.views.get_all_records")
+    @patch.dict(
+        "apps.snapshot.views.STREAM_FORMATS",
+        {"ndjson": (lambda **kwargs: iter([b'{"id": 1}\n']), "application/x-ndjson", "b.ndjson")},
+    )
+    def test_stream_ndjson(self, mock_get_all_records):
+        mock_get_all_records.return_value.exists.return_value = True
+
+        response = self.client.get(self.url, {"stream": "ndjson"})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(response.streaming)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        self.assertEqual(b"".join(response.streaming_content), b'{"id": 1}\n')
+
+    @patch("apps.snapshot.views.get_all_records")
+    @patch.dict(
+        "apps.snapshot.views.STREAM_FORMATS",
+        {"ndjson": (lambda **kwargs: iter([b'{"id": 1}\n']), "application/x-ndjson", "b.ndjson")},
+    )
+    def test_stream_gzip(self, mock_get_all_records):
+        mock_get_all_records.return_value.exists.return_value = True
+
+        response = self.client.get(self.url, {"stream": "ndjson", "gzip": "1"})
+
+        self.assertEqual(response["Content-Type"], "application/gzip")
+        self.assertIn("b.ndjson.gz", response["Content-Disposition"])
+        self.assertEqual(
+            gzip.decompress(b"".join(response.streaming_content)), b'{"id": 1}\n'
+        )
+
+    @patch("apps.snapshot.views.STREAM_FORMATS")
+    def test_since_streams_a_diff(self, mock_formats):
+        generate = Mock(return_value=iter([b"{}\n"]))
+        mock_formats.__contains__.return_value = True
+        mock_formats.__getitem__.return_value = (generate, "application/x-ndjson", "records_backup.ndjson")
+        since = make_token(2, 25)
+
+        response = self.client.get(self.url, {"since": since})
+
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response["X-Snapshot-Token"], make_token(2, 40))
+        self.assertIn("records_diff.ndjson", response["Content-Disposition"])
+        generate.assert_called_once_with(
+            since_id=25,
+            until_id=40,
+            header={"base": since, "token": make_token(2, 40)},
+        )
+        mock_formats.__getitem__.assert_called_once_with("ndjson")
+
+    def test_since_from_an_older_generation_conflicts(self):
+        response = self.client.get(self.url, {"since": make_token(1, 25)})
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+
+    def test_since_rejects_garbage(self):
+        response = self.client.get(self.url, {"since": "%%%"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_unknown_stream_format(self):
+        response = self.client.get(self.url, {"stream": "xml"})
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    @patch("apps.snapshot.views.get_all_records")
+    def test_stream_without_records(self, mock_get_all_records):
+        mock_get_all_records.return_value.exists.return_value = False
+
+        response = self.client.get(self.url, {"stream": "json"})
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+
+class RecordsRestoreViewTest(APITestCase):
+    def setUp(self):
+        self.url = reverse("records_restore")
+        self.report = {"mode": "append", "received": 1, "written": 1, "failed": 0, "chunks": []}
+
+    def rows_passed(self, mock_restore):
+        return list(mock_restore.call_args.args[0])
+
+    @patch("apps.snapshot.views.restore_records")
+    def test_restore_json_array(self, mock_restore):
+        mock_restore.return_value = self.report
+
+        response = self.client.post(
+            self.url, data=json.dumps([{"name": "R"}]), content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["count"], 1)
+        self.assertEqual(self.rows_passed(mock_restore), [{"name": "R"}])
+        self.assertEqual(mock_restore.call_args.kwargs["mode"], "append")
+
+    @patch("apps.snapshot.views.restore_records")
+    def test_restore_gzipped_ndjson_upsert(self, mock_restore):
+        mock_restore.return_value = self.report
+        body = gzip.compress(b'{"id": 1}\n{"id": 2}\n')
+
+        response = self.client.post(
+            f"{self.url}?mode=upsert",
+            data=body,
+            content_type="application/x-ndjson",
+            headers={"Content-Encoding": "gzip"},
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.rows_passed(mock_restore), [{"id": 1}, {"id": 2}])
+        self.assertEqual(mock_restore.call_args.kwargs["mode"], "upsert")
+
+    @patch("apps.snapshot.views.restore_records")
+    def test_restore_binary(self, mock_restore):
+        mock_restore.return_value = self.report
+        body = b"".join(binary.encode_records([[{
+            "id": 7, "name": "R", "x": 1.0, "y": 2.0, "type": "UFO",
+            "description": "d", "img_path": "/i.png", "additional_info": "a",
+        }]]))
+
+        response = self.client.post(
+            f"{self.url}?mode=upsert", data=body, content_type=binary.CONTENT_TYPE
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(self.rows_passed(mock_restore)[0]["id"], 7)
+
+    def test_restore_rejects_non_list(self):
+        response = self.client.post(
+            self.url, data=json.dumps({"name": "R"}), content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_restore_rejects_unknown_mode(self):
+        response = self.client.post(
+            f"{self.url}?mode=merge", data="[]", content_type="application/json"
+        )
+
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
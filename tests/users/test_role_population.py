@@ -0,0 +1,71 @@
+from unittest.mock import patch, MagicMock
+from django.core.cache import cache
+from django.test import TestCase
+from apps.users.role_population import RolePopulationCounter
+
+
+class RolePopulationCounterTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.counter = RolePopulationCounter()
+
+
+    def tearDown(self):
+        cache.clear()
+
+
+    @patch("apps.users.role_population.connection.cursor")
+    def test_get_counts_reconciles_once(self, mock_cursor):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [("Mason", 3), ("GoldMason", 1)]
+
+        counts = self.counter.get_counts()
+
+        self.assertEqual(counts["Mason"], 3)
+        self.assertEqual(counts["SilverMason"], 0)
+        self.assertEqual(counts["GoldMason"], 1)
+        self.assertEqual(counts["Architect"], 0)
+
+        self.counter.get_counts()
+        RolePopulationCounter().get_counts()
+
+        mock_cursor_instance.execute.assert_called_once()
+
+
+    @patch("apps.users.role_population.connection.cursor")
+    def test_adjust_and_move_are_shared(self, mock_cursor):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [("Mason", 3)]
+
+        self.counter.get_counts()
+        self.counter.adjust("Mason", 1)
+        self.counter.move("Mason", "SilverMason")
+
+        self.assertEqual(self.counter.get("Mason"), 3)
+        self.assertEqual(self.counter.get("SilverMason"), 1)
+
+        other_process = RolePopulationCounter()
+        self.assertEqual(other_process.get("SilverMason"), 1)
+        mock_cursor_instance.execute.assert_called_once()
+
+
+    @patch("apps.users.role_population.connection.cursor")
+    def test_invalidate_forces_reconcile(self, mock_cursor):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.side_effect = [[("Mason", 3)], [("Mason", 5)]]
+
+        self.counter.get_counts()
+        self.counter.invalidate()
+
+        self.assertEqual(self.counter.get("Mason"), 5)
+        self.assertEqual(mock_cursor_instance.execute.call_count, 2)
+
+
+    def test_adjust_without_loaded_counter_is_noop(self):
+        self.counter.adjust("Mason", 1)
+
+        self.assertIsNone(cache.get("role_population:Mason"))
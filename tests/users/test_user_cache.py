@@ -0,0 +1,81 @@
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from apps.users.models import User
+from apps.users.user_cache import UserCache
+
+
+class UserCacheTest(TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        with connection.schema_editor() as editor:
+            editor.create_model(User)
+        super().setUpClass()
+
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        with connection.schema_editor() as editor:
+            editor.delete_model(User)
+
+
+    def setUp(self):
+        cache.clear()
+        self.user_cache = UserCache()
+        self.user = User.objects.create(
+            username = "mason",
+            email = "mason@example.com",
+            password = "hash",
+            role = "Mason"
+        )
+
+
+    def tearDown(self):
+        cache.clear()
+
+
+    def test_get_loads_once(self):
+        with self.assertNumQueries(1):
+            self.user_cache.get(self.user.id)
+            user = UserCache().get(self.user.id)
+
+        self.assertEqual(user.id, self.user.id)
+        self.assertEqual(user.role, "Mason")
+        self.assertTrue(user.is_authenticated)
+
+
+    def test_missing_user_is_not_cached(self):
+        self.assertIsNone(self.user_cache.get(self.user.id + 1))
+
+        with self.assertNumQueries(1):
+            self.assertIsNone(self.user_cache.get(self.user.id + 1))
+
+
+    def test_invalidate_reloads_user(self):
+        self.user_cache.get(self.user.id)
+        User.objects.filter(id = self.user.id).update(role = "SilverMason")
+
+        self.assertEqual(self.user_cache.get(self.user.id).role, "Mason")
+
+        self.user_cache.invalidate(self.user.id)
+
+        self.assertEqual(self.user_cache.get(self.user.id).role, "SilverMason")
+
+
+    def test_invalidate_all_reloads_every_user(self):
+        self.user_cache.get(self.user.id)
+        User.objects.filter(id = self.user.id).update(is_inquisitor = True)
+
+        self.user_cache.invalidate_all()
+
+        self.assertTrue(self.user_cache.get(self.user.id).is_inquisitor)
+
+
+    def test_deleted_user_is_dropped_after_invalidate(self):
+        self.user_cache.get(self.user.id)
+        User.objects.filter(id = self.user.id).delete()
+        self.user_cache.invalidate(self.user.id)
+
+        self.assertIsNone(self.user_cache.get(self.user.id))
@@ -1,11 +1,17 @@
+from concurrent.futures import ThreadPoolExecutor
 from unittest.mock import patch, MagicMock
-from django.test import TestCase
+from django.db import connection, connections, IntegrityError
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase, override_settings
 from apps.votes.services import SendVoteService, VoteService, PermissionService, \
-    UserPromoteService, UserBanService, InquisitorManagementService, UserArchitectService
+    UserPromoteService, UserBanService, InquisitorManagementService, UserArchitectService, \
+    VoteCloseService
+from apps.votes.tally import vote_tally
 from datetime import date, datetime, timedelta
-from enums.roles import Role
+from enums.roles import Role, VoteCastResult
 from enums.rules import VoteRules
 from django.db import OperationalError
+import time
 
 
 
@@ -17,59 +23,179 @@ class SendVoteServiceTest(TestCase):
         self.user.role = "Mason"
 
 
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_user_already_voted_true(self, mock_cursor):
+    def test_cast_vote_agree(self, mock_cursor, mock_atomic):
         mock_cursor_instance = MagicMock()
+        mock_cursor_instance.rowcount = 1
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
-        mock_cursor_instance.fetchall.return_value = [(True,)]
 
-        service = SendVoteService()
+        result = SendVoteService().cast_vote(1, 2, "AGREE")
 
-        self.assertTrue(service.user_already_voted(1, 2))
-        mock_cursor_instance.execute.assert_called()
+        self.assertEqual(result, VoteCastResult.OK)
+        update_sql = mock_cursor_instance.execute.call_args_list[-1].args[0]
+        self.assertIn("amount_of_agreed = amount_of_agreed + 1", update_sql)
 
 
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_user_already_voted_false(self, mock_cursor):
+    def test_cast_vote_disagree(self, mock_cursor, mock_atomic):
         mock_cursor_instance = MagicMock()
+        mock_cursor_instance.rowcount = 1
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
-        mock_cursor_instance.fetchall.return_value = []
 
-        service = SendVoteService()
+        result = SendVoteService().cast_vote(1, 2, "DISAGREE")
 
-        self.assertFalse(service.user_already_voted(1, 2))
-        mock_cursor_instance.execute.assert_called()
+        self.assertEqual(result, VoteCastResult.OK)
+        update_sql = mock_cursor_instance.execute.call_args_list[-1].args[0]
+        self.assertIn("amount_of_disagreed = amount_of_disagreed + 1", update_sql)
 
 
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_commit_choice_agree(self, mock_cursor):
+    def test_cast_vote_already_voted(self, mock_cursor, mock_atomic):
         mock_cursor_instance = MagicMock()
+        mock_cursor_instance.execute.side_effect = IntegrityError(1062, "Duplicate entry '1-2' for key 'unique_user_vote'")
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
 
-        service = SendVoteService()
-        result = service.commit_choice(1, 2, "AGREE")
+        result = SendVoteService().cast_vote(1, 2, "AGREE")
 
-        self.assertTrue(result)
-        mock_cursor_instance.execute.assert_called()
+        self.assertEqual(result, VoteCastResult.ALREADY_VOTED)
 
 
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_commit_choice_disagree(self, mock_cursor):
+    def test_cast_vote_unknown_user(self, mock_cursor, mock_atomic):
         mock_cursor_instance = MagicMock()
+        mock_cursor_instance.execute.side_effect = IntegrityError(1452, "Cannot add or update a child row: a foreign key constraint fails")
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
 
-        service = SendVoteService()
-        result = service.commit_choice(1, 2, "DISAGREE")
+        result = SendVoteService().cast_vote(1, 2, "AGREE")
 
-        self.assertTrue(result)
-        mock_cursor_instance.execute.assert_called()
+        self.assertEqual(result, VoteCastResult.NOT_FOUND)
 
 
-    def test_commit_choice_invalid(self):
-        service = SendVoteService()
-        result = service.commit_choice(1, 2, "INVALID")
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_cast_vote_closed(self, mock_cursor, mock_atomic):
+        mock_cursor_instance = MagicMock()
+        mock_cursor_instance.rowcount = 0
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+
+        result = SendVoteService().cast_vote(1, 2, "AGREE")
+
+        self.assertEqual(result, VoteCastResult.VOTE_CLOSED)
+        mock_cursor_instance.execute.assert_called_once()
+
+
+    @patch("apps.votes.services.connection.cursor")
+    def test_cast_vote_invalid(self, mock_cursor):
+        result = SendVoteService().cast_vote(1, 2, "INVALID")
+
+        self.assertEqual(result, VoteCastResult.INVALID_CHOICE)
+        mock_cursor.assert_not_called()
+
+
+
+class CastVoteConcurrencyTest(TransactionTestCase):
+
+    VOTERS = 40
+    BALLOTS = 200
+
+    def setUp(self):
+        with connection.cursor() as cursor:
+            cursor.execute("""
+                CREATE TABLE votes (
+                    id INTEGER PRIMARY KEY,
+                    is_active BOOLEAN NOT NULL,
+                    amount_of_agreed BIGINT NOT NULL DEFAULT 0,
+                    amount_of_disagreed BIGINT NOT NULL DEFAULT 0
+                );
+            """)
+            cursor.execute("""
+                CREATE TABLE vote_users (
+                    id INTEGER PRIMARY KEY AUTOINCREMENT,
+                    user_id BIGINT NOT NULL,
+                    vote_id BIGINT NOT NULL,
+                    is_voted BOOLEAN NOT NULL,
+                    UNIQUE (user_id, vote_id)
+                );
+            """)
+            cursor.execute("INSERT INTO votes (id, is_active) VALUES (1, TRUE), (2, FALSE);")
+
+
+    def tearDown(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP TABLE vote_users;")
+            cursor.execute("DROP TABLE votes;")
 
-        self.assertFalse(result)
+
+    @staticmethod
+    def cast(ballot, vote_id):
+        user_id = ballot % CastVoteConcurrencyTest.VOTERS
+        choice = "AGREE" if user_id % 4 else "DISAGREE"
+
+        try:
+            while True:
+                try:
+                    return SendVoteService().cast_vote(user_id, vote_id, choice)
+
+                except OperationalError:
+                    # The shared in-memory SQLite database reports lock conflicts
+                    # instead of waiting; the rolled back ballot is simply resent.
+                    time.sleep(0.001)
+
+        finally:
+            connections.close_all()
+
+
+    def test_parallel_votes_are_counted_exactly_once(self):
+        with ThreadPoolExecutor(max_workers = 16) as pool:
+            results = list(pool.map(lambda ballot: self.cast(ballot, 1), range(self.BALLOTS)))
+
+        self.assertEqual(results.count(VoteCastResult.OK), self.VOTERS)
+        self.assertEqual(results.count(VoteCastResult.ALREADY_VOTED), self.BALLOTS - self.VOTERS)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount_of_agreed, amount_of_disagreed FROM votes WHERE id = 1;")
+            agreed, disagreed = cursor.fetchone()
+            cursor.execute("SELECT COUNT(*) FROM vote_users WHERE vote_id = 1;")
+            ballots = cursor.fetchone()[0]
+
+        self.assertEqual(agreed, 30)
+        self.assertEqual(disagreed, 10)
+        self.assertEqual(ballots, self.VOTERS)
+
+
+    @override_settings(VOTE_TALLY_MODE = "write_behind", VOTE_TALLY_FLUSH_INTERVAL = 60)
+    def test_parallel_write_behind_votes_are_flushed_exactly(self):
+        cache.clear()
+
+        with ThreadPoolExecutor(max_workers = 16) as pool:
+            results = list(pool.map(lambda ballot: self.cast(ballot, 1), range(self.BALLOTS)))
+
+        self.assertEqual(results.count(VoteCastResult.OK), self.VOTERS)
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount_of_agreed, amount_of_disagreed FROM votes WHERE id = 1;")
+            self.assertEqual(cursor.fetchone(), (0, 0))
+
+        vote_tally.flush([1])
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount_of_agreed, amount_of_disagreed FROM votes WHERE id = 1;")
+            self.assertEqual(cursor.fetchone(), (30, 10))
+
+
+    def test_parallel_votes_on_closed_vote_are_rejected(self):
+        with ThreadPoolExecutor(max_workers = 8) as pool:
+            results = list(pool.map(lambda ballot: self.cast(ballot, 2), range(self.VOTERS)))
+
+        self.assertEqual(set(results), {VoteCastResult.VOTE_CLOSED})
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT amount_of_agreed, amount_of_disagreed FROM votes WHERE id = 2;")
+            self.assertEqual(cursor.fetchone(), (0, 0))
 
 
 
@@ -92,6 +218,57 @@ class VoteServiceTest(TestCase):
         self.assertEqual(result[0]["id"], 1)
 
 
+    @patch("apps.votes.services.role_population")
+    @patch("apps.votes.services.connection.cursor")
+    @patch("apps.votes.services.VoteService.get_vote_role_raw",
+           return_value = ["PROMOTE_TO_SILVER", "PROMOTE_TO_ARCHITECT"])
+    def test_get_all_votes_grouped(self, mock_role, mock_cursor, mock_population):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_population.get_counts.return_value = {
+            "Mason": 4, "SilverMason": 2, "GoldMason": 2, "Architect": 1
+        }
+        mock_cursor_instance.fetchall.return_value = [
+            (1, "Promote a", "PROMOTE_TO_SILVER", "SilverMason", 1),
+            (1, "Promote a", "PROMOTE_TO_SILVER", "Mason", 3),
+            (2, "Promote b", "PROMOTE_TO_ARCHITECT", "Mason", 2),
+            (2, "Promote b", "PROMOTE_TO_ARCHITECT", "GoldMason", 1),
+            (3, "Promote c", "PROMOTE_TO_ARCHITECT", None, 0),
+        ]
+
+        result = VoteService(self.user).get_all_votes()
+
+        self.assertEqual(result, [
+            {"id": 1, "name": "Promote a", "percent": 50},
+            {"id": 2, "name": "Promote b", "percent": 37},
+            {"id": 3, "name": "Promote c", "percent": 0},
+        ])
+        mock_cursor_instance.execute.assert_called_once()
+
+
+    @patch("apps.votes.services.role_population")
+    @patch("apps.votes.services.connection.cursor")
+    @patch("apps.votes.services.VoteService.get_vote_role_raw", return_value = ["PROMOTE_TO_GOLDEN"])
+    def test_get_all_votes_no_eligible_users(self, mock_role, mock_cursor, mock_population):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(4, "Promote d", "PROMOTE_TO_GOLDEN", None, 0)]
+        mock_population.get_counts.return_value = {"Mason": 4}
+
+        result = VoteService(self.user).get_all_votes()
+
+        self.assertEqual(result, [{"id": 4, "name": "Promote d", "percent": 0}])
+
+
+    @patch("apps.votes.services.connection.cursor")
+    @patch("apps.votes.services.VoteService.get_vote_role_raw", return_value = [])
+    def test_get_all_votes_without_vote_types(self, mock_role, mock_cursor):
+        result = VoteService(self.user).get_all_votes()
+
+        self.assertEqual(result, [])
+        mock_cursor.assert_not_called()
+
+
     @patch("apps.votes.models.VoteTypes.objects")
     def test_get_vote_role_raw(self, mock_objects):
         mock_queryset = MagicMock()
@@ -106,6 +283,64 @@ class VoteServiceTest(TestCase):
 
 
 
+class VoteCloseServiceTest(TestCase):
+
+    @patch("apps.votes.services.role_population")
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_close_expired_in_chunks(self, mock_cursor, mock_atomic, mock_population):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.side_effect = [
+            [
+                (1, 8, 2, 10, "PROMOTE_TO_SILVER"),
+                (2, 6, 1, 11, "BAN_USER"),
+            ],
+            [("Mason", 1)],
+            [
+                (3, 0, 0, 12, "BAN_USER"),
+            ],
+        ]
+
+        report = VoteCloseService(chunk_size = 2).close_expired(datetime(2025, 1, 1))
+
+        self.assertEqual(report["chunks"], 2)
+        self.assertEqual(report["votes_closed"], 3)
+        self.assertEqual(report["users_promoted"], 1)
+        self.assertEqual(report["users_banned"], 1)
+        self.assertIn("elapsed_ms", report)
+        self.assertEqual(mock_atomic.call_count, 2)
+
+        statements = [call.args[0] for call in mock_cursor_instance.execute.call_args_list]
+        self.assertEqual(sum("DELETE FROM users" in sql for sql in statements), 1)
+        self.assertEqual(sum("INSERT INTO prohibited_ip" in sql for sql in statements), 1)
+        self.assertEqual(sum("UPDATE users_promotions" in sql for sql in statements), 1)
+
+        mock_population.move.assert_called_once_with("Mason", "SilverMason", 1)
+        mock_population.adjust.assert_called_once_with("Mason", -1)
+
+
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_close_expired_nothing_to_close(self, mock_cursor, mock_atomic):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = []
+
+        report = VoteCloseService(chunk_size = 2).close_expired(datetime(2025, 1, 1))
+
+        self.assertEqual(report["chunks"], 0)
+        self.assertEqual(report["votes_closed"], 0)
+        mock_cursor_instance.execute.assert_called_once()
+
+
+    def test_is_accepted(self):
+        self.assertTrue(VoteCloseService.is_accepted(6, 4))
+        self.assertFalse(VoteCloseService.is_accepted(5, 5))
+        self.assertFalse(VoteCloseService.is_accepted(0, 0))
+
+
+
 class PermissionServiceTest(TestCase):
 
     def setUp(self):
@@ -297,19 +532,26 @@ class InquisitorManagementServiceTest(TestCase):
         self.service = InquisitorManagementService()
 
 
+    @patch("apps.votes.services.forget_users")
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_appoint_inquisitor_role_success(self, mock_cursor):
+    def test_appoint_inquisitor_role_success(self, mock_cursor, mock_atomic, mock_forget):
         mock_cursor_instance = MagicMock()
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(4,)]
 
         result = self.service.appoint_inquisitor_role()
 
         self.assertTrue(result)
-        mock_cursor_instance.execute.assert_called_once()
+        self.assertEqual(mock_cursor_instance.execute.call_count, 2)
+        self.assertEqual(mock_cursor_instance.execute.call_args.args[1], [4])
+        mock_forget.assert_called_once_with([4])
 
 
+    @patch("apps.votes.services.forget_users")
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_appoint_inquisitor_role_operational_error(self, mock_cursor):
+    def test_appoint_inquisitor_role_operational_error(self, mock_cursor, mock_atomic, mock_forget):
         mock_cursor_instance = MagicMock()
         mock_cursor_instance.execute.side_effect = OperationalError("test error")
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
@@ -319,21 +561,43 @@ class InquisitorManagementServiceTest(TestCase):
 
         self.assertIn("Database problem connection or table lock", str(context.exception))
         mock_cursor_instance.execute.assert_called_once()
+        mock_forget.assert_not_called()
 
 
+    @patch("apps.votes.services.forget_users")
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_remove_inquisitor_role_success(self, mock_cursor):
+    def test_remove_inquisitor_role_success(self, mock_cursor, mock_atomic, mock_forget):
         mock_cursor_instance = MagicMock()
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(2,), (9,)]
 
         result = self.service.remove_inquisitor_role()
 
         self.assertTrue(result)
+        self.assertEqual(mock_cursor_instance.execute.call_count, 2)
+        self.assertEqual(mock_cursor_instance.execute.call_args.args[1], [2, 9])
+        mock_forget.assert_called_once_with([2, 9])
+
+
+    @patch("apps.votes.services.forget_users")
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_remove_inquisitor_role_without_inquisitors(self, mock_cursor, mock_atomic, mock_forget):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = []
+
+        self.assertTrue(self.service.remove_inquisitor_role())
+
         mock_cursor_instance.execute.assert_called_once()
+        mock_forget.assert_called_once_with([])
 
 
+    @patch("apps.votes.services.forget_users")
+    @patch("apps.votes.services.transaction.atomic")
     @patch("apps.votes.services.connection.cursor")
-    def test_remove_inquisitor_role_operational_error(self, mock_cursor):
+    def test_remove_inquisitor_role_operational_error(self, mock_cursor, mock_atomic, mock_forget):
         mock_cursor_instance = MagicMock()
         mock_cursor_instance.execute.side_effect = OperationalError("test error")
         mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
@@ -343,6 +607,7 @@ class InquisitorManagementServiceTest(TestCase):
 
         self.assertIn("Database problem connection or table lock", str(context.exception))
         mock_cursor_instance.execute.assert_called_once()
+        mock_forget.assert_not_called()
 
 
 
@@ -0,0 +1,190 @@
+from unittest.mock import patch, MagicMock
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import TestCase, override_settings
+from apps.votes.services import SendVoteService, VoteCloseService
+from apps.votes.tally import VoteTallyBuffer
+from enums.roles import VoteCastResult
+from datetime import datetime
+
+
+@override_settings(VOTE_TALLY_MODE = "write_behind", VOTE_TALLY_FLUSH_INTERVAL = 60)
+class VoteTallyBufferTest(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.buffer = VoteTallyBuffer()
+
+
+    def tearDown(self):
+        cache.clear()
+
+
+    def test_take_returns_and_clears_counts(self):
+        self.buffer.record(1, "amount_of_agreed")
+        self.buffer.record(1, "amount_of_agreed")
+        self.buffer.record(1, "amount_of_disagreed")
+        self.buffer.record(2, "amount_of_disagreed")
+
+        deltas = self.buffer.take([1, 2, 3])
+
+        self.assertEqual(deltas, {
+            1: {"amount_of_agreed": 2, "amount_of_disagreed": 1},
+            2: {"amount_of_agreed": 0, "amount_of_disagreed": 1},
+        })
+        self.assertEqual(self.buffer.take([1, 2]), {})
+
+
+    @patch("apps.votes.tally.transaction.atomic")
+    @patch("apps.votes.tally.connection.cursor")
+    def test_flush_writes_one_batch(self, mock_cursor, mock_atomic):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(1,), (2,)]
+
+        self.buffer.record(1, "amount_of_agreed")
+        self.buffer.record(2, "amount_of_disagreed")
+
+        with patch("apps.votes.tally.connection.features.has_select_for_update", True):
+            self.buffer.flush()
+
+        lock_query, lock_params = mock_cursor_instance.execute.call_args.args
+        self.assertIn("FOR UPDATE", lock_query)
+        self.assertEqual(lock_params, [1, 2])
+
+        mock_cursor_instance.executemany.assert_called_once()
+        params = sorted(mock_cursor_instance.executemany.call_args.args[1], key = lambda p: p[2])
+        self.assertEqual(params, [[1, 0, 1], [0, 1, 2]])
+        self.assertEqual(self.buffer.take([1, 2]), {})
+
+
+    @patch("apps.votes.tally.transaction.atomic")
+    @patch("apps.votes.tally.connection.cursor")
+    def test_failed_flush_keeps_counts(self, mock_cursor, mock_atomic):
+        mock_cursor_instance = MagicMock()
+        mock_cursor_instance.executemany.side_effect = RuntimeError("lock wait timeout")
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(1,)]
+
+        self.buffer.record(1, "amount_of_agreed")
+
+        with self.assertRaises(RuntimeError):
+            self.buffer.flush()
+
+        self.assertEqual(self.buffer.take([1]), {1: {"amount_of_agreed": 1, "amount_of_disagreed": 0}})
+
+
+    @patch("apps.votes.tally.transaction.atomic")
+    @patch("apps.votes.tally.connection.cursor")
+    def test_flush_skips_closed_votes(self, mock_cursor, mock_atomic):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(1,)]
+
+        self.buffer.record(1, "amount_of_agreed")
+        self.buffer.record(2, "amount_of_agreed")
+
+        deltas = self.buffer.flush()
+
+        self.assertEqual(deltas, {1: {"amount_of_agreed": 1, "amount_of_disagreed": 0}})
+        self.assertEqual(self.buffer.take([2]), {})
+
+
+    @patch("apps.votes.services.role_population")
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_close_during_flush_keeps_ballots(self, mock_cursor, mock_atomic, mock_population):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        report = {}
+        waiting = []
+
+        # The flusher asks for the row lock while a close already holds it: the
+        # close decides the vote first and the flusher then finds it inactive.
+        def fetchall():
+            if not waiting:
+                waiting.append(True)
+                report.update(VoteCloseService(chunk_size = 10).close_expired(datetime(2025, 1, 1)))
+                return []
+
+            return [(7, 1, 2, 10, "PROMOTE_TO_SILVER")]
+
+        mock_cursor_instance.fetchall.side_effect = fetchall
+
+        with patch("apps.votes.services.vote_tally", self.buffer):
+            for _ in range(3):
+                self.buffer.record(7, "amount_of_agreed")
+
+            deltas = self.buffer.flush()
+
+        self.assertEqual(deltas, {})
+        self.assertEqual(report["users_promoted"], 1)
+        mock_cursor_instance.executemany.assert_called_once()
+        self.assertEqual(mock_cursor_instance.executemany.call_args.args[1], [[3, 0, 7]])
+        self.assertEqual(self.buffer.take([7]), {})
+
+
+    @override_settings(VOTE_TALLY_FLUSH_INTERVAL = 0)
+    @patch.object(VoteTallyBuffer, "flush")
+    def test_record_flushes_when_interval_elapsed(self, mock_flush):
+        self.buffer.record(1, "amount_of_agreed")
+
+        mock_flush.assert_called_once()
+
+
+    @patch("apps.votes.services.vote_tally")
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_cast_vote_buffers_tally(self, mock_cursor, mock_atomic, mock_tally):
+        mock_cursor_instance = MagicMock()
+        mock_cursor_instance.rowcount = 1
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_tally.enabled = True
+
+        result = SendVoteService().cast_vote(1, 2, "AGREE")
+
+        self.assertEqual(result, VoteCastResult.OK)
+        mock_cursor_instance.execute.assert_called_once()
+        mock_tally.record.assert_called_once_with(2, "amount_of_agreed")
+
+
+    @patch("apps.votes.services.role_population")
+    @patch("apps.votes.services.transaction.atomic")
+    @patch("apps.votes.services.connection.cursor")
+    def test_close_votes_includes_buffered_ballots(self, mock_cursor, mock_atomic, mock_population):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(7, 1, 2, 10, "PROMOTE_TO_SILVER")]
+
+        with patch("apps.votes.services.vote_tally", self.buffer):
+            for _ in range(3):
+                self.buffer.record(7, "amount_of_agreed")
+
+            report = VoteCloseService(chunk_size = 10).close_expired(datetime(2025, 1, 1))
+
+        self.assertEqual(report["users_promoted"], 1)
+        mock_cursor_instance.executemany.assert_called_once()
+        self.assertEqual(mock_cursor_instance.executemany.call_args.args[1], [[3, 0, 7]])
+
+
+    @patch("apps.votes.tally.transaction.atomic")
+    @patch("apps.votes.tally.connection.cursor")
+    def test_flush_active_covers_other_processes(self, mock_cursor, mock_atomic):
+        mock_cursor_instance = MagicMock()
+        mock_cursor.return_value.__enter__.return_value = mock_cursor_instance
+        mock_cursor_instance.fetchall.return_value = [(1,), (2,)]
+
+        VoteTallyBuffer().record(1, "amount_of_agreed")
+
+        deltas = self.buffer.flush_active()
+
+        self.assertEqual(deltas, {1: {"amount_of_agreed": 1, "amount_of_disagreed": 0}})
+        self.assertEqual(mock_cursor_instance.executemany.call_args.args[1], [[1, 0, 1]])
+
+
+    def test_write_behind_needs_shared_cache(self):
+        with self.assertRaises(ImproperlyConfigured):
+            self.buffer.check_backend()
+
+        with override_settings(CACHES = {"default": {"BACKEND": "django.core.cache.backends.redis.RedisCache"}}):
+            self.buffer.check_backend()
@@ -3,6 +3,7 @@ from django.test import TestCase, RequestFactory
 from apps.votes.views import VotesTableView, SendVoteView, PromotionPermissionView, BanPermissionView, \
     UserPromoteView, UserBanView, CloseActiveExpiredVotesView, InquisitorManagementView
 from rest_framework import status
+from enums.roles import VoteCastResult
 
 
 class VoteTableViewTest(TestCase):
@@ -41,10 +42,7 @@ class SendVoteViewTest(TestCase):
         self.user.id = 1
 
 
-    @patch("apps.votes.views.HasValidToken.has_permission", return_value = True)
-    @patch("apps.votes.services.SendVoteService.commit_choice")
-    @patch("apps.votes.services.SendVoteService.user_already_voted", return_value = True)
-    def test_send_vote_already_voted(self, mock_already, mock_commit, _):
+    def post_vote(self):
         request = self.factory.post(
             "/votes/sendVote/",
             {"id": 1, "choice": "AGREE"},
@@ -52,53 +50,61 @@ class SendVoteViewTest(TestCase):
         )
         request.user = self.user
         view = SendVoteView.as_view()
-        response = view(request)
+
+        return view(request)
+
+
+    @patch("apps.votes.views.HasValidToken.has_permission", return_value = True)
+    @patch("apps.votes.services.SendVoteService.cast_vote", return_value = VoteCastResult.ALREADY_VOTED)
+    def test_send_vote_already_voted(self, mock_cast, _):
+        response = self.post_vote()
 
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertEqual(response.data["status"], "ALREADY_VOTED")
 
-        mock_already.assert_called_once()
-        mock_commit.assert_not_called()
+        mock_cast.assert_called_once()
 
 
     @patch("apps.votes.views.HasValidToken.has_permission", return_value = True)
-    @patch("apps.votes.services.SendVoteService.commit_choice", return_value = True)
-    @patch("apps.votes.services.SendVoteService.user_already_voted", return_value = False)
-    def test_send_success_vote(self, mock_already, mock_commit, _):
-        request = self.factory.post(
-            "/votes/sendVote/",
-            {"id": 1, "choice": "AGREE"},
-            content_type = "application/json"
-        )
-        request.user = self.user
-        view = SendVoteView.as_view()
-        response = view(request)
+    @patch("apps.votes.services.SendVoteService.cast_vote", return_value = VoteCastResult.OK)
+    def test_send_success_vote(self, mock_cast, _):
+        response = self.post_vote()
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["status"], "OK")
 
-        mock_already.assert_called_once()
-        mock_commit.assert_called_once()
+        mock_cast.assert_called_once()
 
 
     @patch("apps.votes.views.HasValidToken.has_permission", return_value = True)
-    @patch("apps.votes.services.SendVoteService.commit_choice", return_value = False)
-    @patch("apps.votes.services.SendVoteService.user_already_voted", return_value = False)
-    def test_invalid_vote_request(self, mock_already, mock_commit, _):
-        request = self.factory.post(
-            "/votes/sendVote/",
-            {"id": 1, "choice": "AGREE"},
-            content_type = "application/json"
-        )
-        request.user = self.user
-        view = SendVoteView.as_view()
-        response = view(request)
+    @patch("apps.votes.services.SendVoteService.cast_vote", return_value = VoteCastResult.VOTE_CLOSED)
+    def test_send_vote_closed(self, mock_cast, _):
+        response = self.post_vote()
 
         self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
         self.assertEqual(response.data["status"], "CONFLICT")
 
-        mock_already.assert_called_once()
-        mock_commit.assert_called_once()
+        mock_cast.assert_called_once()
+
+
+    @patch("apps.votes.views.HasValidToken.has_permission", return_value = True)
+    @patch("apps.votes.services.SendVoteService.cast_vote", return_value = VoteCastResult.NOT_FOUND)
+    def test_vote_for_missing_user(self, mock_cast, _):
+        response = self.post_vote()
+
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertEqual(response.data["status"], "NOT_FOUND")
+
+
+    @patch("apps.votes.views.HasValidToken.has_permission", return_value = True)
+    @patch("apps.votes.services.SendVoteService.cast_vote", return_value = VoteCastResult.INVALID_CHOICE)
+    def test_invalid_vote_request(self, mock_cast, _):
+        response = self.post_vote()
+
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual(response.data["notification"], "Invalid request")
+
+        mock_cast.assert_called_once()
 
 
 
@@ -283,7 +289,7 @@ class CloseActiveExpiredVotesViewTest(TestCase):
         self.user.role = "Mason"
 
 
-    @patch("apps.votes.services.VoteService.close_votes", return_value = True)
+    @patch("apps.votes.services.VoteService.close_votes", return_value = {"chunks": 0, "votes_closed": 0})
     def test_close_votes(self, mock_service):
         request = self.factory.patch(
             "/votes/vote_close/",
@@ -296,23 +302,7 @@ class CloseActiveExpiredVotesViewTest(TestCase):
 
         self.assertEqual(response.status_code, status.HTTP_200_OK)
         self.assertEqual(response.data["status"], "OK")
-
-        mock_service.assert_called_once()
-
-
-    @patch("apps.votes.services.VoteService.close_votes", return_value = False)
-    def test_failed_close_votes(self, mock_service):
-        request = self.factory.patch(
-            "/votes/vote_close/",
-            {"date_of_end": "2025-10-31 19:05:20"},
-            content_type = "application/json"
-        )
-        request.user = self.user
-
-        response = CloseActiveExpiredVotesView.as_view()(request)
-
-        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
-        self.assertEqual(response.data["status"], "BAD_REQUEST")
+        self.assertEqual(response.data["data"], {"chunks": 0, "votes_closed": 0})
 
         mock_service.assert_called_once()
 